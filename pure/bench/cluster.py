@@ -0,0 +1,75 @@
+import pure.insight.cluster as cluster
+import numpy as np
+import argparse, time
+
+"""
+Benchmarks the keypoint clustering backends on synthetic keypoint
+sets (gaussian blobs over uniform background noise) of increasing
+size. For each backend and size the best-of-N latency, the number
+of centers, the mean squared distance of clustered points to their
+center, the fraction of unclustered points, and whether a repeated
+run reproduced the same centers are reported, so a backend can be
+chosen by latency budget.
+
+Usage: python -m pure.bench.cluster [--sizes N ...] [--backends NAME ...]
+    [--repeats N] [--seed N] [--ccore]
+"""
+
+def run_benchmark(sizes, backends, repeats = 3, seed = 0, ccore = False) -> list:
+    results = []
+    for size in sizes:
+        points = get_synthetic_keypoints(size, seed = seed)
+
+        # time each backend
+        for name in backends:
+            params = {'ccore': ccore} if name == 'xmeans' else {}
+            backend = cluster.get_backend(name, seed = seed, **params)
+            times, runs = [], []
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                runs.append(backend.cluster(points))
+                times.append(time.perf_counter() - start_time)
+
+            # score clustering quality and reproducibility
+            centers, labels = runs[0]
+            labeled = labels >= 0
+            sq_dists = ((points[labeled] - centers[labels[labeled]]) ** 2).sum(axis = 1)
+            results.append({'backend': name, 'size': size, 'ms': 1000 * min(times), \
+                'centers': len(centers), 'mse': float(sq_dists.mean()) if len(sq_dists) else 0.0, \
+                'noise': float(1 - labeled.mean()), 'reproducible': all(np.array_equal( \
+                centers, run[0]) and np.array_equal(labels, run[1]) for run in runs[1:])})
+    return results
+
+def get_synthetic_keypoints(size, num_blobs = 20, noise = 0.2, extent = 500, seed = 0) \
+    -> np.ndarray:
+    rng = np.random.default_rng(seed)
+
+    # draw blob keypoints around random centers
+    num_noise = int(size * noise)
+    centers = rng.uniform(0, extent, (num_blobs, 2))
+    blob_points = centers[rng.integers(0, num_blobs, size - num_noise)] + \
+        rng.normal(0, extent / 50, (size - num_noise, 2))
+
+    # add uniform background keypoints
+    noise_points = rng.uniform(0, extent, (num_noise, 2))
+    return np.rint(np.concatenate([blob_points, noise_points])).clip(0, extent)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Keypoint clustering backend benchmark')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [250, 1000, 5000])
+    parser.add_argument('--backends', nargs = '+', default = list(cluster._backends))
+    parser.add_argument('--repeats', type = int, default = 3)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--ccore', action = 'store_true', \
+        help = 'run xmeans with the pyclustering C core (default: pure python)')
+    args = parser.parse_args()
+
+    # run benchmark and print results
+    results = run_benchmark(args.sizes, args.backends, args.repeats, args.seed, \
+        args.ccore)
+    for res in results:
+        print("{backend:<17} n={size:<7} {ms:9.2f} ms  centers {centers:>4}  " \
+            "mse {mse:9.2f}  noise {noise:5.1%}  reproducible {reproducible}".format(**res))
+
+if __name__ == '__main__':
+    main()
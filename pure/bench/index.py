@@ -0,0 +1,72 @@
+import pure.hash.index as index
+import pure.hash.packed as packed
+import numpy as np
+import argparse, time
+
+"""
+Benchmarks HashIndex radius queries against a vectorized linear
+scan over the same hashes. Random 64-bit hashes are bulk loaded
+along with planted near duplicates of each query hash, and the
+average per-query latency of both methods is reported for each
+radius (results are checked to agree).
+
+Usage: python -m pure.bench.index [--size N] [--queries Q]
+"""
+
+def run_benchmark(size, num_queries, radii, bands, seed = 0) -> list:
+    rng = np.random.default_rng(seed)
+
+    # generate hashes with planted near duplicates
+    hashes = rng.integers(0, 2 ** 64, size, dtype = np.uint64)
+    queries = hashes[rng.choice(size, num_queries, replace = False)]
+    flips = np.uint64(1) << rng.integers(0, 64, (num_queries, 4), dtype = np.uint64)
+    hashes[rng.choice(size, num_queries, replace = False)] = \
+        queries ^ np.bitwise_or.reduce(flips, axis = 1)
+    ids = list(range(size))
+
+    # build index
+    start_time = time.time()
+    hash_index = index.HashIndex(bands = bands)
+    hash_index.build(ids, hashes)
+    build_time = time.time() - start_time
+    print("Built index of {} hashes in {:.2f}s".format(size, build_time))
+
+    # time queries for each radius
+    results = []
+    for radius in radii:
+        start_time = time.time()
+        index_res = [hash_index.query(query, radius) for query in queries]
+        index_time = (time.time() - start_time) / num_queries
+
+        start_time = time.time()
+        scan_res = [linear_scan(hashes, query, radius) for query in queries]
+        scan_time = (time.time() - start_time) / num_queries
+
+        # check results agree
+        for i_res, s_res in zip(index_res, scan_res):
+            assert sorted(i_res) == sorted(s_res)
+        results.append({'radius': radius, 'index_ms': 1000 * index_time, \
+            'scan_ms': 1000 * scan_time, 'speedup': scan_time / index_time})
+    return results
+
+def linear_scan(hashes, query, radius) -> list:
+    dists = packed.popcount(hashes ^ query).astype(int)
+    matches = np.nonzero(dists <= radius)[0]
+    return list(zip(matches.tolist(), dists[matches].tolist()))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'HashIndex vs linear scan benchmark')
+    parser.add_argument('--size', type = int, default = 1000000)
+    parser.add_argument('--queries', type = int, default = 100)
+    parser.add_argument('--bands', type = int, default = 4)
+    parser.add_argument('--radii', type = int, nargs = '+', default = [0, 4, 8, 11])
+    args = parser.parse_args()
+
+    # run benchmark and print results
+    results = run_benchmark(args.size, args.queries, args.radii, args.bands)
+    for res in results:
+        print("Radius {radius:>2}: index {index_ms:8.3f} ms/query, " \
+            "scan {scan_ms:8.3f} ms/query, speedup {speedup:6.1f}x".format(**res))
+
+if __name__ == '__main__':
+    main()
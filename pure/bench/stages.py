@@ -0,0 +1,214 @@
+import pure.imaging.grid as grid
+import pure.imaging.graphics as graphics
+import pure.imaging.pyramid as pyramid
+import pure.hash.phash as phash
+import pure.hash.average as average
+import pure.hash.dct as dct
+import pure.insight.feature as feature
+import pure.insight.cluster as cluster
+from PIL import Image
+import numpy as np
+import argparse, json, os, platform, sys, tempfile, time, tracemalloc
+
+"""
+Benchmarks every pipeline stage (pixel grid load, pixel to variable
+grid conversion, grid reduction, average and DCT hashing, detector
+pyramid level resizing, every FEAlgorithms detector, xmeans
+clustering and graphics rendering) on
+each image in a samples directory and on synthetic images of
+increasing size. The best-of-N wall time and the peak traced (Python
+and NumPy) memory of each stage are reported. Every stage runs on its
+own, so a failing stage is reported as an error without hiding the
+others; detectors missing from the installed OpenCV build are marked
+as skipped. A run with errors exits with status 1 and is never saved
+as a baseline. Results can be saved as a JSON baseline, and a later
+run compared against a baseline flags stages whose time or peak
+memory regressed beyond a threshold, or that no longer ran (the exit
+status is 1 when any stage regressed).
+
+Usage: python -m pure.bench.stages [--samples DIR] [--sizes N ...]
+    [--repeats N] [--ccore] [--save FILE] [--baseline FILE] [--threshold X]
+"""
+
+def run_benchmark(images, repeats = 3, ccore = False) -> dict:
+    results = {}
+    for name, file_name in images:
+        results[name] = run_image_stages(file_name, repeats, ccore)
+    return results
+
+def run_image_stages(file_name, repeats = 3, ccore = False) -> dict:
+    stages, context = {}, {}
+
+    # time decoding and hashing stages
+    def load():
+        pixel_grid = grid.PixelGrid(file_name)
+        pixel_grid.load_pixel_grid()
+        context['pixel_grid'] = pixel_grid
+    stages['load'] = measure(load, repeats)
+    stages['convert_pixel_to_var'] = measure(lambda: context.update(var_grid = \
+        phash.convert_pixel_to_var(context['pixel_grid'])), repeats)
+    stages['reduce_grid'] = measure(lambda: phash.reduce_array( \
+        context['var_grid'].get_grid_array(), 32), repeats)
+    stages['average_hash'] = measure(lambda: average.AverageHash( \
+        context['var_grid']).compute_hash(), repeats)
+    stages['dct_hash'] = measure(lambda: dct.DCTHash(context['var_grid']).compute_hash(), \
+        repeats)
+
+    # time every available detector on the pre-processed image (keeping its features)
+    def resize_level():
+        context['level'] = pyramid.PyramidLevel(context['pixel_grid'], 500)
+        return context['level'].img_gs
+    stages['pyramid_level'] = measure(resize_level, repeats)
+    for detector in feature._fusion_detectors:
+        if not is_detector_available(detector):
+            stages['detector:' + detector] = {'skipped': 'unavailable in this OpenCV build'}
+            continue
+        stages['detector:' + detector] = measure(lambda: context.update({detector: \
+            feature._run_fusion_detector(context['level'].img_gs, context['level'].img_np, \
+            detector)}), repeats)
+
+    # time xmeans clustering of the ORB keypoints
+    backend = cluster.XMeansBackend(ccore = ccore)
+    stages['xmeans'] = measure(lambda: backend.cluster(context['ORB']), repeats)
+
+    # time graphics rendering of a fixed grid of markers
+    def render():
+        g_image = graphics.GraphicsImage(context['pixel_grid'])
+        g_image.draw_features(get_marker_positions(context['pixel_grid']), (10, 10), \
+            (0, 255, 0))
+        g_image.get_image_bytes('PNG')
+    stages['graphics'] = measure(render, repeats)
+    return stages
+
+def measure(stage, repeats = 3) -> dict:
+
+    # time untraced runs
+    times = []
+    try:
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            stage()
+            times.append(time.perf_counter() - start_time)
+    except Exception as e:
+        return {'error': '{}: {}'.format(type(e).__name__, str(e).strip().splitlines()[0])}
+
+    # trace peak memory of one more run
+    tracemalloc.start()
+    try: stage()
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {'ms': 1000 * min(times), 'peak_kb': peak / 1024}
+
+def is_detector_available(detector) -> bool:
+
+    # detectors missing from the OpenCV build fail to construct
+    img_gs = np.zeros((64, 64), dtype = np.uint8)
+    try: feature._run_fusion_detector(img_gs, np.float32(img_gs), detector)
+    except AttributeError: return False
+    except Exception: pass
+    return True
+
+def get_marker_positions(pixel_grid, num_markers = 256) -> np.ndarray:
+    height, width = pixel_grid.get_grid_dimensions()
+    side = int(np.sqrt(num_markers))
+    rows, cols = np.meshgrid(np.linspace(0, height - 1, side), np.linspace(0, width - 1, side))
+    return np.rint(np.stack([rows.ravel(), cols.ravel()], axis = 1)).astype(int)
+
+def get_images(samples_dir, sizes, out_dir, seed = 0) -> list:
+    images = []
+    if samples_dir and os.path.isdir(samples_dir):
+        images.extend((name, os.path.join(samples_dir, name)) for name in \
+            sorted(os.listdir(samples_dir)))
+
+    # write synthetic images (smooth gradients with texture) of each size
+    rng = np.random.default_rng(seed)
+    for size in sizes:
+        rows, cols = np.mgrid[0:size, 0:size] / size
+        base = np.stack([rows, cols, (rows + cols) / 2], axis = 2) * 200
+        texture = rng.integers(0, 56, (size, size, 3))
+        file_name = os.path.join(out_dir, 'synthetic-{}.png'.format(size))
+        Image.fromarray((base + texture).astype(np.uint8)).save(file_name)
+        images.append(('synthetic-{}'.format(size), file_name))
+    return images
+
+def compare_results(results, baseline, threshold = 1.25, min_ms = 1.0, min_kb = 64.0) -> list:
+    regressions = []
+    for image, stages in baseline.get('results', {}).items():
+        for stage, base in stages.items():
+            res = results.get(image, {}).get(stage)
+            if 'ms' not in base or res is None: continue
+
+            # flag stages that no longer run
+            if 'ms' not in res:
+                regressions.append({'image': image, 'stage': stage, 'metric': 'missing', \
+                    'reason': res.get('error') or res.get('skipped')})
+                continue
+
+            # flag slower or larger stages (ignoring noise below the floors)
+            for metric, floor in (('ms', min_ms), ('peak_kb', min_kb)):
+                if res[metric] > max(base[metric], floor) * threshold:
+                    regressions.append({'image': image, 'stage': stage, 'metric': metric, \
+                        'baseline': base[metric], 'current': res[metric], \
+                        'ratio': res[metric] / max(base[metric], 1e-9)})
+    return regressions
+
+def get_errors(results) -> list:
+    return [(image, stage, res['error']) for image, stages in results.items() for \
+        stage, res in stages.items() if 'error' in res]
+
+def main(argv = None) -> None:
+    parser = argparse.ArgumentParser(description = 'Pipeline stage benchmark suite')
+    parser.add_argument('--samples', default = 'samples', help = 'directory of sample images')
+    parser.add_argument('--sizes', type = int, nargs = '*', default = [256, 1024, 4096], \
+        help = 'synthetic image sizes')
+    parser.add_argument('--repeats', type = int, default = 3)
+    parser.add_argument('--ccore', action = 'store_true', \
+        help = 'run xmeans with the pyclustering C core (default: pure python)')
+    parser.add_argument('--save', help = 'write results as a JSON baseline')
+    parser.add_argument('--baseline', help = 'JSON baseline to flag regressions against')
+    parser.add_argument('--threshold', type = float, default = 1.25, \
+        help = 'time/memory ratio over baseline counted as a regression')
+    args = parser.parse_args(argv)
+
+    # run stages over sample and synthetic images
+    with tempfile.TemporaryDirectory() as out_dir:
+        images = get_images(args.samples, args.sizes, out_dir)
+        results = run_benchmark(images, args.repeats, args.ccore)
+
+    # print results
+    for image, stages in results.items():
+        print(image)
+        for stage, res in stages.items():
+            if 'skipped' in res: print("  {:<24} skipped ({})".format(stage, res['skipped']))
+            elif 'error' in res: print("  {:<24} ERROR ({})".format(stage, res['error']))
+            else: print("  {:<24} {:10.2f} ms {:12.1f} KB peak".format(stage, res['ms'], \
+                res['peak_kb']))
+
+    # report failed stages (an incomplete run is never saved as a baseline)
+    errors = get_errors(results)
+    for image, stage, error in errors:
+        print("ERROR {} {}: {}".format(image, stage, error), file = sys.stderr)
+    if errors and args.save:
+        print("Not saving baseline: {} stages failed".format(len(errors)), file = sys.stderr)
+
+    # save baseline
+    report = {'meta': {'python': platform.python_version(), 'numpy': np.__version__, \
+        'platform': platform.platform(), 'repeats': args.repeats}, 'results': results}
+    if args.save and not errors:
+        with open(args.save, 'w') as f: json.dump(report, f, indent = 2)
+
+    # flag regressions against baseline
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        for reg in regressions:
+            if reg['metric'] == 'missing':
+                print("REGRESSION {image} {stage} no longer runs: {reason}".format(**reg))
+            else: print("REGRESSION {image} {stage} {metric}: {baseline:.2f} -> " \
+                "{current:.2f} ({ratio:.2f}x)".format(**reg))
+        if regressions: sys.exit(1)
+    if errors: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import pure.imaging.pimage as pimage
+import pure.hash.average as average
+import pure.hash.dct as dct
+import pure.db.cache as cache
+import pure.instrument as instrument
+import functools, argparse, glob, json, os, sys, time, uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+"""
+Command-line entry point for batch processing images. Input
+paths (directories, glob patterns, files, or a file list) are
+expanded to image files, which are loaded, hashed and optionally
+run through feature extraction (keypoints and their cluster
+centroids) in a process pool. One JSON result per image is
+streamed out as JSONL, and a throughput summary is written to
+stderr at the end of the run. Images whose worker process dies
+(e.g. on a crash in native code) are retried one at a time, so
+only the image that kills its worker is reported as failed. With a cache
+file, results are looked up by file content digest first, so
+repeated files skip decoding and recomputation. With a trace file,
+every worker appends its stage spans and counters to it as JSONL.
+
+Usage: python pure-image.py [paths ...] [--file-list FILE] [--workers N]
+    [--chunk-size N] [--features] [--output FILE] [--cache FILE]
+    [--cache-size MB] [--trace FILE] [--backend NAME] [--ccore]
+"""
+
+def main(argv = None) -> None:
+    args = parse_args(argv)
+
+    # expand input paths
+    files = expand_paths(args.paths, args.file_list)
+    if not files:
+        print("Error: no image files found", file = sys.stderr)
+        sys.exit(1)
+
+    # process images and stream results
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try: summary = run_batch(files, out, args.workers, args.chunk_size, args.features, \
+        args.cache, args.cache_size, args.trace, args.backend, args.ccore)
+    finally:
+        if args.output: out.close()
+
+    # output throughput summary
+    print_summary(summary, file = sys.stderr)
+
+def parse_args(argv = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description = 'Batch hash and feature extraction')
+    parser.add_argument('paths', nargs = '*', help = 'image files, directories or glob patterns')
+    parser.add_argument('--file-list', help = 'file containing one image path per line')
+    parser.add_argument('--workers', type = int, default = os.cpu_count(), \
+        help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type = int, default = 4, \
+        help = 'number of images handed to a worker at a time')
+    parser.add_argument('--features', action = 'store_true', \
+        help = 'run feature extraction in addition to hashing')
+    parser.add_argument('--backend', default = 'xmeans', choices = _cluster_backends, \
+        help = 'keypoint clustering backend for feature extraction')
+    parser.add_argument('--ccore', action = 'store_true', \
+        help = 'run the xmeans backend with the pyclustering C core (default: pure python)')
+    parser.add_argument('--output', help = 'JSONL output file (default: stdout)')
+    parser.add_argument('--cache', help = 'on-disk result cache file shared by workers')
+    parser.add_argument('--cache-size', type = int, default = 1024, \
+        help = 'result cache size cap in MB (least recently used entries are evicted)')
+    parser.add_argument('--trace', help = 'JSONL file receiving stage spans and counters')
+    return parser.parse_args(argv)
+
+def expand_paths(paths, file_list = None) -> list:
+    paths = list(paths)
+    if file_list:
+        with open(file_list) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    # expand directories and glob patterns
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) \
+                    if os.path.splitext(name)[1].lower() in _image_extensions)
+        elif os.path.isfile(path): files.append(path)
+        else: files.extend(sorted(glob.glob(path, recursive = True)))
+    return files
+
+def run_batch(files, out, workers, chunk_size, features = False, cache_path = None, \
+    cache_size = 1024, trace_path = None, backend = 'xmeans', ccore = False) -> dict:
+    process = functools.partial(process_images, features = features, \
+        cache_path = cache_path, cache_size = cache_size, trace_path = trace_path, \
+        backend = backend, ccore = ccore)
+    if trace_path: open(trace_path, 'w').close()
+    summary = {'images': 0, 'errors': 0, 'stages': {}, 'cache_hits': 0, 'cache_misses': 0}
+    start_time = time.perf_counter()
+
+    # stream results from process pool (chunks lost with a dead worker are kept)
+    chunk_size = max(chunk_size, 1)
+    chunks = [files[idx:idx + chunk_size] for idx in range(0, len(files), chunk_size)]
+    lost = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(process, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try: results = future.result()
+            except BrokenProcessPool:
+                lost.extend(futures[future])
+                continue
+            for result in results: write_result(out, summary, result)
+
+    # retry lost images one at a time, so only an image killing its worker fails
+    pool = None
+    for file_name in lost:
+        if pool is None: pool = ProcessPoolExecutor(1)
+        try: result, = pool.submit(process, [file_name]).result()
+        except BrokenProcessPool as e:
+            result = {'file': file_name, 'id': str(uuid.uuid1()), 'timings': {}, \
+                'error': '{}: {}'.format(type(e).__name__, e)}
+            pool.shutdown()
+            pool = None
+        write_result(out, summary, result)
+    if pool is not None: pool.shutdown()
+
+    # set run totals
+    summary['wall_time'] = time.perf_counter() - start_time
+    summary['workers'] = workers
+    return summary
+
+def write_result(out, summary, result) -> None:
+    out.write(json.dumps(result) + '\n')
+
+    # add result to run totals
+    summary['images'] += 1
+    if 'error' in result: summary['errors'] += 1
+    for stage, elapsed in result['timings'].items():
+        summary['stages'][stage] = summary['stages'].get(stage, 0.0) + elapsed
+    summary['cache_hits'] += len(result.get('cached', []))
+    summary['cache_misses'] += len(result.get('computed', []))
+
+def process_images(file_names, **params) -> list:
+    return [process_image(file_name, **params) for file_name in file_names]
+
+def process_image(file_name, features = False, cache_path = None, cache_size = 1024, \
+    trace_path = None, backend = 'xmeans', ccore = False) -> dict:
+    result = {'file': file_name, 'id': str(uuid.uuid1()), 'timings': {}}
+    timings = result['timings']
+    if trace_path: _get_worker_trace(trace_path)
+    try:
+
+        # fetch cached results by file content digest
+        results, keys = {}, {}
+        if cache_path:
+            start_time = time.perf_counter()
+            result_cache = _get_worker_cache(cache_path, cache_size)
+            digest = cache.get_file_digest(file_name)
+            keys['hashes'] = cache.ResultCache.get_key(digest, 'hashes', \
+                {'load_size': pimage.HASH_LOAD_SIZE, 'reduction_sizes': (8, 32), \
+                'low_freq_only': True})
+            if features: keys['features'] = cache.ResultCache.get_key(digest, 'features', \
+                dict(get_feature_params(backend, ccore), centroids = True))
+            for stage, key in keys.items():
+                value = result_cache.get(key)
+                if value is not None: results[stage] = value
+            result['cached'] = sorted(results)
+            timings['cache'] = time.perf_counter() - start_time
+
+        # compute missing results
+        stages = ['hashes'] + (['features'] if features else [])
+        missing = [stage for stage in stages if stage not in results]
+        if missing:
+            results.update(compute_results(file_name, result['id'], missing, \
+                timings, backend, ccore))
+            if cache_path:
+                for stage in missing: result_cache.put(keys[stage], results[stage])
+                result['computed'] = missing
+
+        # write buffered cache counters (workers are never closed, so each image flushes)
+        if cache_path: result_cache.flush()
+
+        # set results
+        result['hashes'] = results['hashes']
+        if features: result['features'] = results['features']
+
+    except Exception as e:
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    return result
+
+def compute_results(file_name, id, stages, timings = None, backend = 'xmeans', \
+    ccore = False) -> dict:
+    timings = {} if timings is None else timings
+    results = {}
+
+    # compute hashes (always from the reduced hash decode, so they do not depend
+    # on whether features are extracted)
+    if 'hashes' in stages:
+        start_time = time.perf_counter()
+        p_image = pimage.PImage(file_name, os.path.basename(file_name), id, \
+            graphics = False, hash_only = True)
+        timings['load'] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        var_grid = p_image.get_var_grid()
+        avg_hash = average.AverageHash(var_grid)
+        avg_hash.compute_hash()
+        dct_hash = dct.DCTHash(var_grid)
+        dct_hash.compute_hash(low_freq_only = True)
+        results['hashes'] = {'gs': avg_hash.get_packed_hash('gs').to_hex(), \
+            'lum': avg_hash.get_packed_hash('lum').to_hex(), \
+            'dct': dct_hash.get_packed_hash().to_hex()}
+        timings['hash'] = time.perf_counter() - start_time
+
+    # extract features and their cluster centroids
+    if 'features' in stages:
+        import pure.insight.feature as feature
+        start_time = time.perf_counter()
+        p_image = pimage.PImage(file_name, os.path.basename(file_name), id, \
+            graphics = False)
+        timings['load'] = timings.get('load', 0.0) + time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        extractor = feature.FeatureExtractor(p_image, backend = backend, \
+            **_get_backend_params(backend, ccore))
+        bulk_features = extractor.execute_feature_extraction_pipeline()
+        results['features'] = {'keypoints': [list(f) for f in bulk_features], \
+            'centroids': [list(c) for c in extractor.centroids]}
+        timings['features'] = time.perf_counter() - start_time
+    return results
+
+def get_feature_params(backend = 'xmeans', ccore = False) -> dict:
+    import pure.insight.feature as feature
+    return feature.FeatureExtractor.get_pipeline_params(backend = backend, \
+        **_get_backend_params(backend, ccore))
+
+def print_summary(summary, file = sys.stderr) -> None:
+    wall_time = summary['wall_time']
+    images = summary['images']
+
+    # output run totals
+    print("\nProcessed {} images ({} errors) in {:.2f}s with {} workers".format( \
+        images, summary['errors'], wall_time, summary['workers']), file = file)
+    print("Throughput: {:.2f} images/s".format(images / wall_time if wall_time else 0.0), \
+        file = file)
+
+    # output cache counters
+    if summary.get('cache_hits') or summary.get('cache_misses'):
+        print("Cache: {} hits, {} misses".format(summary['cache_hits'], \
+            summary['cache_misses']), file = file)
+
+    # output per-stage times (summed over workers)
+    for stage, elapsed in summary['stages'].items():
+        print("  {:<10} {:9.2f}s total  {:9.2f}ms/image".format(stage, elapsed, \
+            1000 * elapsed / max(images, 1)), file = file)
+
+"""
+Utility function for fetching the result cache opened by the
+current worker process (connections cannot be shared across
+processes, so each worker opens its own).
+"""
+def _get_worker_cache(cache_path, cache_size) -> cache.ResultCache:
+    if cache_path not in _worker_caches:
+        _worker_caches[cache_path] = cache.ResultCache(cache_path, \
+            max_bytes = cache_size << 20)
+    return _worker_caches[cache_path]
+
+"""
+Utility function for registering the trace file sink of the current
+worker process (once per process and path).
+"""
+def _get_worker_trace(trace_path) -> instrument.JSONSink:
+    if trace_path not in _worker_traces:
+        _worker_traces[trace_path] = instrument.add_sink(instrument.JSONSink(trace_path))
+    return _worker_traces[trace_path]
+
+"""
+Utility function for fetching the clustering backend parameters
+set from the command line (the C core flag only applies to xmeans).
+"""
+def _get_backend_params(backend, ccore) -> dict:
+    return {'ccore': ccore} if backend == 'xmeans' else {}
+
+_worker_caches = {}
+_cluster_backends = ['xmeans', 'minibatch_kmeans', 'grid_density']
+_worker_traces = {}
+_image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp'}
+
+if __name__ == '__main__':
+    main()
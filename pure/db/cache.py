@@ -0,0 +1,222 @@
+import sqlite3, pickle, hashlib, json, time
+
+class ResultCache:
+    """
+    Defines a content-addressed, size-capped cache of computed results
+    (hashes, keypoints, descriptors, centroids, ...) on local disk,
+    backed by a single SQLite file. Entries are keyed by the digest of
+    the image file contents plus the algorithm name and its parameters,
+    so re-uploaded or re-crawled copies of a file hit the same entries.
+    When the stored size exceeds 'max_bytes', the least recently used
+    entries are evicted. Every write runs in an immediate transaction
+    on a WAL-mode database, so several worker processes can share one
+    cache file safely. Lookups only read: hit/miss counters and entry
+    recency (refreshed at most once per 'touch_interval' seconds) are
+    buffered and written in one batch every 'flush_size' lookups, on
+    every put, and on flush/close, so concurrent readers never wait on
+    the write lock.
+
+    Attributes:
+        - path -> str : path to the SQLite cache file
+        - max_bytes -> int : maximum total size of stored values
+        - touch_interval -> float : minimum age (seconds) of an entry's
+            last access time before a hit refreshes it
+        - flush_size -> int : number of lookups buffered before their
+            counter and recency updates are written
+        - connection -> Connection : open SQLite connection
+        - hits -> int : number of cache hits through this object
+        - misses -> int : number of cache misses through this object
+        - evictions -> int : number of entries evicted by this object
+
+    Methods:
+        - get(key, default) -> object : fetches a cached value (marking
+            it recently used), or 'default' on a miss
+        - put(key, value) -> None : stores a value, evicting least
+            recently used entries beyond the size cap
+        - get_or_compute(key, compute) -> object : fetches a cached
+            value, or computes (and stores) it on a miss
+        - remove(key) -> bool : removes a cached value
+        - get_stats() -> dict : fetches hit/miss/eviction counters
+            summed over every process (as flushed so far), and entry/byte
+            totals
+        - flush() -> None : writes buffered counter and recency updates
+        - close() -> None : flushes and closes the cache connection
+
+    Static Methods:
+        - get_key(digest, algorithm, params) -> str : builds the cache
+            key for a content digest, algorithm name and parameters
+    """
+
+    def __init__(self, path, max_bytes = 1 << 30, timeout = 30.0, touch_interval = 60.0, \
+        flush_size = 64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.flush_size = flush_size
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self.__pending_touches, self.__pending_counters = {}, {'hits': 0, 'misses': 0}
+        self.__pending_lookups = 0
+        self.connection = sqlite3.connect(path, timeout = timeout, isolation_level = None)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+
+        # create tables
+        with _Transaction(self.connection):
+            self.__create_tables()
+
+    @staticmethod
+    def get_key(digest, algorithm, params = None) -> str:
+        spec = json.dumps({'digest': digest, 'algorithm': algorithm, \
+            'params': params or {}}, sort_keys = True, default = str)
+        return hashlib.sha256(spec.encode()).hexdigest()
+
+    def get(self, key, default = None) -> object:
+        row = self.connection.execute('SELECT value, last_access FROM entries WHERE key = ?', \
+            (key,)).fetchone()
+
+        # buffer miss, or hit and stale recency update
+        if row is None:
+            self.misses += 1
+            self.__pending_counters['misses'] += 1
+        else:
+            self.hits += 1
+            self.__pending_counters['hits'] += 1
+            now = time.time()
+            if now - row[1] >= self.touch_interval: self.__pending_touches[key] = now
+
+        # write buffered updates in batches
+        self.__pending_lookups += 1
+        if self.__pending_lookups >= self.flush_size: self.flush()
+        return default if row is None else pickle.loads(row[0])
+
+    def put(self, key, value) -> None:
+        data = pickle.dumps(value, protocol = pickle.HIGHEST_PROTOCOL)
+        with _Transaction(self.connection):
+            self.__write_pending()
+
+            # replace entry and update stored size
+            self.__delete_entry(key)
+            self.connection.execute('INSERT INTO entries (key, value, size, last_access) ' \
+                'VALUES (?, ?, ?, ?)', (key, data, len(data), time.time()))
+            self.__add_counter('bytes', len(data))
+
+            # evict least recently used entries beyond the size cap
+            self.__evict(key)
+
+    def get_or_compute(self, key, compute) -> object:
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def remove(self, key) -> bool:
+        with _Transaction(self.connection):
+            return self.__delete_entry(key)
+
+    def get_stats(self) -> dict:
+        self.flush()
+        stats = dict(self.connection.execute('SELECT name, value FROM counters'))
+        stats['entries'] = self.connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return stats
+
+    def flush(self) -> None:
+        if self.__pending_lookups == 0: return
+        with _Transaction(self.connection):
+            self.__write_pending()
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    def __write_pending(self) -> None:
+
+        # refresh recency of hit entries (never moving it backwards)
+        self.connection.executemany('UPDATE entries SET last_access = MAX(last_access, ?) ' \
+            'WHERE key = ?', [(now, key) for key, now in self.__pending_touches.items()])
+        for name, amount in self.__pending_counters.items():
+            if amount: self.__add_counter(name, amount)
+
+        # reset buffers
+        self.__pending_touches, self.__pending_counters = {}, {'hits': 0, 'misses': 0}
+        self.__pending_lookups = 0
+
+    def __delete_entry(self, key) -> bool:
+        row = self.connection.execute('SELECT size FROM entries WHERE key = ?', \
+            (key,)).fetchone()
+        if row is None: return False
+        self.connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+        self.__add_counter('bytes', -row[0])
+        return True
+
+    def __evict(self, keep_key) -> None:
+        total = self.connection.execute("SELECT value FROM counters WHERE name = 'bytes'") \
+            .fetchone()[0]
+        if total <= self.max_bytes: return
+
+        # delete oldest entries (never the one just stored)
+        rows = self.connection.execute('SELECT key, size FROM entries WHERE key != ? ' \
+            'ORDER BY last_access', (keep_key,))
+        evicted, freed = [], 0
+        for key, size in rows:
+            if total - freed <= self.max_bytes: break
+            evicted.append((key,))
+            freed += size
+        self.connection.executemany('DELETE FROM entries WHERE key = ?', evicted)
+        self.__add_counter('bytes', -freed)
+        self.__add_counter('evictions', len(evicted))
+        self.evictions += len(evicted)
+
+    def __add_counter(self, name, amount) -> None:
+        self.connection.execute('UPDATE counters SET value = value + ? WHERE name = ?', \
+            (amount, name))
+
+    def __create_tables(self) -> None:
+        self.connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, ' \
+            'value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON ' \
+            'entries (last_access)')
+
+        # create shared counters
+        self.connection.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, ' \
+            'value INTEGER NOT NULL)')
+        self.connection.executemany('INSERT OR IGNORE INTO counters (name, value) ' \
+            'VALUES (?, 0)', [(name,) for name in _counter_names])
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+class _Transaction:
+    """
+    Defines a context manager running its block in an immediate
+    SQLite transaction (taking the write lock up front, so concurrent
+    writers wait instead of failing mid-transaction), committed on
+    success and rolled back on error.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, *args) -> None:
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+"""
+Utility function for computing the content digest (SHA-256 hex)
+of a file, reading it in bounded chunks.
+"""
+def get_file_digest(file_name, chunk_size = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+_missing = object()
+_counter_names = ['hits', 'misses', 'evictions', 'bytes']
@@ -0,0 +1,180 @@
+import pure.hash.index as index
+import pure.hash.packed as packed
+import numpy as np
+import sqlite3, json
+
+class HashDatabase:
+    """
+    Defines a persistent, local store for PImage records, their
+    feature metadata and their 64-bit packed hashes (e.g. 'dct',
+    'gs', 'lum'), backed by a single SQLite file. Each hash is
+    stored as a signed 64-bit integer alongside its indexed band
+    values, so Hamming-radius queries use multi-index hashing (see
+    HashIndex) to probe only nearby band values instead of scanning
+    every row.
+
+    Attributes:
+        - path -> str : path to the SQLite database file (or ':memory:')
+        - bands -> int : number of indexed bands per hash
+        - band_bits -> int : number of bits per band
+        - connection -> Connection : open SQLite connection
+
+    Methods:
+        - insert_images(images) -> None : bulk inserts (id, file_name,
+            title, metadata) records in a single transaction
+        - insert_hashes(hashes) -> None : bulk inserts (image_id, kind,
+            hash) records in a single transaction
+        - add_pimage(pimage, hashes, metadata) -> None : inserts a
+            PImage record and a dict of its hashes in a single
+            transaction
+        - get_image(id) -> dict : fetches a PImage record by id
+        - get_hashes(id) -> dict : fetches every hash of a PImage by
+            id as PackedHash objects keyed by kind
+        - remove_image(id) -> None : removes a PImage record and its
+            hashes
+        - query_radius(kind, hash, radius) -> list : fetches (id,
+            distance) pairs for every stored hash of the given kind
+            within Hamming distance 'radius', sorted by distance
+        - close() -> None : closes the database connection
+    """
+
+    def __init__(self, path, bands = 4):
+        assert 64 % bands == 0
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+
+        # create tables and fetch stored band layout
+        with self.connection:
+            self.__create_tables(bands)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'bands'").fetchone()
+        self.bands = int(row[0])
+        self.band_bits = 64 // self.bands
+
+    def insert_images(self, images) -> None:
+        with self.connection:
+            self.__insert_images(images)
+
+    def insert_hashes(self, hashes) -> None:
+        with self.connection:
+            self.__insert_hashes(hashes)
+
+    def add_pimage(self, pimage, hashes, metadata = None) -> None:
+        with self.connection:
+            self.__insert_images([(pimage.id, pimage.file_name, pimage.title, metadata)])
+            self.__insert_hashes([(pimage.id, kind, hash) for kind, hash in hashes.items()])
+
+    def get_image(self, id) -> dict:
+        row = self.connection.execute('SELECT id, file_name, title, metadata ' \
+            'FROM images WHERE id = ?', (id,)).fetchone()
+        if row is None: return None
+        return {'id': row[0], 'file_name': row[1], 'title': row[2], \
+            'metadata': json.loads(row[3])}
+
+    def get_hashes(self, id) -> dict:
+        rows = self.connection.execute('SELECT kind, hash FROM hashes ' \
+            'WHERE image_id = ?', (id,)).fetchall()
+        return {kind: _to_packed_hash(signed) for kind, signed in rows}
+
+    def remove_image(self, id) -> None:
+        with self.connection:
+            self.connection.execute('DELETE FROM hashes WHERE image_id = ?', (id,))
+            self.connection.execute('DELETE FROM images WHERE id = ?', (id,))
+
+    def query_radius(self, kind, hash, radius) -> list:
+        word = np.array([_to_word(hash)], dtype = np.uint64)
+        band_vals = index.get_bands(word, self.bands, self.band_bits)[0]
+
+        # probe indexed band values within the pigeonhole sub-radius
+        flips = index.get_flip_masks(self.band_bits, radius // self.bands)
+        candidates = {}
+        for band in range(self.bands):
+            probes = (band_vals[band] ^ flips).astype(np.int64).tolist()
+            for start in range(0, len(probes), _max_probes):
+                chunk = probes[start:start + _max_probes]
+                rows = self.connection.execute('SELECT image_id, hash FROM hashes ' \
+                    'WHERE kind = ? AND band{} IN ({})'.format(band, \
+                    ', '.join('?' * len(chunk))), [kind] + chunk)
+                candidates.update(rows)
+        if not candidates: return []
+
+        # verify candidates
+        ids = list(candidates.keys())
+        words = np.array(list(candidates.values()), dtype = np.int64).view(np.uint64)
+        dists = packed.popcount(words ^ word[0]).astype(int).tolist()
+        return sorted([(id, dist) for id, dist in zip(ids, dists) if dist <= radius], \
+            key = lambda match: (match[1], match[0]))
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __insert_images(self, images) -> None:
+        rows = [(id, file_name, title, json.dumps(metadata or {})) for \
+            id, file_name, title, metadata in images]
+        self.connection.executemany('INSERT OR REPLACE INTO images ' \
+            '(id, file_name, title, metadata) VALUES (?, ?, ?, ?)', rows)
+
+    def __insert_hashes(self, hashes) -> None:
+        hashes = list(hashes)
+        if not hashes: return
+
+        # get signed words and band values
+        words = np.array([_to_word(hash) for _, _, hash in hashes], dtype = np.uint64)
+        band_vals = index.get_bands(words, self.bands, self.band_bits).astype(np.int64)
+        rows = [(image_id, kind, signed) + tuple(bands) for (image_id, kind, _), signed, \
+            bands in zip(hashes, words.view(np.int64).tolist(), band_vals.tolist())]
+
+        # insert rows
+        columns = ', '.join('band{}'.format(band) for band in range(self.bands))
+        params = ', '.join('?' * (3 + self.bands))
+        self.connection.executemany('INSERT OR REPLACE INTO hashes (image_id, ' \
+            'kind, hash, {}) VALUES ({})'.format(columns, params), rows)
+
+    def __create_tables(self, bands) -> None:
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, ' \
+            'value TEXT NOT NULL)')
+        self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('bands', ?)", \
+            (str(bands),))
+        stored_bands = int(self.connection.execute("SELECT value FROM meta " \
+            "WHERE key = 'bands'").fetchone()[0])
+
+        # create record tables
+        self.connection.execute('CREATE TABLE IF NOT EXISTS images (id TEXT PRIMARY KEY, ' \
+            'file_name TEXT, title TEXT, metadata TEXT)')
+        band_columns = ''.join(', band{} INTEGER NOT NULL'.format(band) for \
+            band in range(stored_bands))
+        self.connection.execute('CREATE TABLE IF NOT EXISTS hashes (image_id TEXT NOT NULL, ' \
+            'kind TEXT NOT NULL, hash INTEGER NOT NULL{}, PRIMARY KEY (image_id, kind))' \
+            .format(band_columns))
+
+        # index band values per hash kind
+        for band in range(stored_bands):
+            self.connection.execute('CREATE INDEX IF NOT EXISTS hashes_band{0} ON ' \
+                'hashes (kind, band{0})'.format(band))
+
+    def __enter__(self) -> 'HashDatabase':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+"""
+Utility function for converting a 64-bit PackedHash, integer
+or uint64 word to an unsigned integer word.
+"""
+def _to_word(hash) -> int:
+    if isinstance(hash, packed.PackedHash):
+        assert hash.length == 64
+        return int(hash.words[0])
+    return int(hash)
+
+"""
+Utility function for converting a signed 64-bit integer column
+value back to a PackedHash.
+"""
+def _to_packed_hash(signed) -> packed.PackedHash:
+    word = np.array([signed], dtype = np.int64).view(np.uint64)
+    return packed.PackedHash(word, 64)
+
+_max_probes = 900
@@ -1,5 +1,7 @@
 import pure.hash.phash as phash
-import math
+import pure.hash.packed as _packed
+import pure.instrument as instrument
+import numpy as np
 
 class AverageHash(phash.PerceptualHash):
     """
@@ -18,6 +20,9 @@ class AverageHash(phash.PerceptualHash):
 
     Methods:
         - (!) See parent class for overriden methods
+        - get_packed_hash(channel) -> PackedHash : fetches the hash
+            bits for a channel ('red', 'green', 'blue', 'gs' or 'lum')
+            packed into 64-bit words
     """
     
     def __init__(self, variable_grid, reduction_size = 8):
@@ -27,28 +32,22 @@ class AverageHash(phash.PerceptualHash):
         assert self.hash_flag == False
 
         # reduce grid
-        if verbose: print("Reducing grid...\n")
-        self.reduce_grid()
-        
-        # compute pixel mean
-        if verbose: print("Computing reduced grid mean...\n")
-        pixel_mean = self.__compute_mean()
+        with instrument.span('average_hash.reduce_grid'):
+            self.reduce_grid()
+            reduced = self.reduced_data.get_grid_array()[np.newaxis]
 
         # calculate bit hashes
-        if verbose: print("Computing bit hashes...\n")
-        self.gs_hash = self.__compute_gs_bit_hash(sum(pixel_mean) / 3, (1, 1, 1))
-        if not bw_only:
-            self.red_hash = self.__compute_bit_hash(pixel_mean[0], 0)
-            self.green_hash = self.__compute_bit_hash(pixel_mean[1], 1)
-            self.blue_hash = self.__compute_bit_hash(pixel_mean[2], 2)
-            self.lum_hash = self.__compute_gs_bit_hash(.2126 * pixel_mean[0] + .7152 * pixel_mean[1] + \
-                .0722 * pixel_mean[2], (.2126, .7152, .0722))
+        with instrument.span('average_hash.bit_hash'):
+            self.gs_hash = calc_bit_hash(reduced, 'gs')[0].tolist()
+            if not bw_only:
+                self.red_hash = calc_bit_hash(reduced, 'red')[0].tolist()
+                self.green_hash = calc_bit_hash(reduced, 'green')[0].tolist()
+                self.blue_hash = calc_bit_hash(reduced, 'blue')[0].tolist()
+                self.lum_hash = calc_bit_hash(reduced, 'lum')[0].tolist()
         self.hash_flag = True
 
         # publish results
-        if verbose:
-            print("Publishing results...\n")
-            self.publish_results(bw_only)
+        if verbose: self.publish_results(bw_only)
     
     def publish_results(self, bw_only) -> None:
         assert self.hash_flag == True
@@ -58,40 +57,51 @@ class AverageHash(phash.PerceptualHash):
             print("Blue hash: {}\n".format(self.__join_list_bits(self.blue_hash)))
             print("Luminosity hash: {}\n".format(self.__join_list_bits(self.lum_hash)))  
         print("Grayscale hash: {}\n".format(self.__join_list_bits(self.gs_hash)))
-        
-    def __compute_mean(self) -> tuple:
-        assert self.reduction_flag == True
-        pixel_sum = (0, 0, 0)
-
-        # iteratively compute pixel mean
-        for row in range(self.reduction_size):
-            for col in range(self.reduction_size):
-                pixel_val = self.reduced_data.read_grid_data((row, col))
-                pixel_sum = tuple(sum(x) for x in zip(pixel_sum, pixel_val))
-        
-        # normalize pixel sum
-        return tuple(x / (self.reduction_size ** 2) for x in pixel_sum)
 
-    def __compute_bit_hash(self, mean, key):
-        hash_res = []
-        
-        # iteratively calculate bit
-        for row in range(self.reduction_size):
-            for col in range(self.reduction_size):
-                hash_res.append(1 if self.reduced_data.read_grid_data((row, col))[key] \
-                    > mean else 0)
-        return hash_res
-    
-    def __compute_gs_bit_hash(self, mean, coef):
-        hash_res = []
-        
-        # iteratively calculate bit
-        for row in range(self.reduction_size):
-            for col in range(self.reduction_size):
-                pixel_val = self.reduced_data.read_grid_data((row, col))
-                hash_res.append(1 if (coef[0] * pixel_val[0] + coef[1] * pixel_val[1] + \
-                    coef[2] * pixel_val[2]) / (coef[0] + coef[1] + coef[2]) > mean else 0)
-        return hash_res  
+    def get_packed_hash(self, channel = 'gs') -> _packed.PackedHash:
+        assert self.hash_flag == True
+        return _packed.PackedHash.from_bits(getattr(self, channel + '_hash'))
 
     def __join_list_bits(self, hash) -> None:
-        return "".join([str(x) for x in hash])
\ No newline at end of file
+        return "".join([str(x) for x in hash])
+
+"""
+Utility function for computing the average hash bits of a
+batch of reduced (N, size, size, 3) RGB grids for a single
+channel ('red', 'green', 'blue', 'gs' or 'lum'). Each pixel 
+is weighted by the channel coefficients and compared against
+the equally weighted grid mean, giving an (N, size ** 2) 
+array of 0/1 bits.
+"""
+def calc_bit_hash(reduced, channel = 'gs') -> np.ndarray:
+    coef = np.array(_channel_coefs[channel])
+
+    # weight pixels and grid means
+    pixel_vals = (reduced @ coef) / coef.sum()
+    pixel_mean = reduced.mean(axis = (1, 2)) @ coef / coef.sum()
+
+    # threshold against mean
+    bits = pixel_vals > pixel_mean[:, np.newaxis, np.newaxis]
+    return bits.reshape(len(reduced), -1).astype(np.uint8)
+
+"""
+Utility function for computing the average hash of a batch
+of N images in a single pass. The batch is either an 
+(N, height, width, 3) array or a sequence of VariableGrid 
+objects, and the result is an (N, reduction_size ** 2) array 
+of 0/1 bits for the requested channel (or of uint64 words if 
+'packed' is set).
+"""
+def compute_batch_hash(grids, reduction_size = 8, channel = 'gs', \
+    packed = False) -> np.ndarray:
+    reduced = phash.reduce_batch(grids, reduction_size)
+    bits = calc_bit_hash(reduced, channel)
+    return _packed.pack_bits(bits) if packed else bits
+
+_channel_coefs = {
+    'red': (1, 0, 0),
+    'green': (0, 1, 0),
+    'blue': (0, 0, 1),
+    'gs': (1, 1, 1),
+    'lum': (.2126, .7152, .0722)
+}
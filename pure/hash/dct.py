@@ -1,4 +1,7 @@
 import pure.hash.phash as phash
+import pure.hash.packed as _packed
+import pure.instrument as instrument
+import numpy as np
 import math
 
 class DCTHash(phash.PerceptualHash):
@@ -10,9 +13,15 @@ class DCTHash(phash.PerceptualHash):
 
     Attributes:
         - (!) See parent class for foundation attributes
+        - dct_grid -> VariableGrid : DCT coefficients of the reduced
+            grayscale grid (only the low frequency 8x8 block if
+            'compute_hash' was run with 'low_freq_only')
+        - hash_res -> list : DCT hash bits reprented as list
 
     Methods:
         - (!) See parent class for overriden methods
+        - get_packed_hash() -> PackedHash : fetches the hash bits 
+            packed into 64-bit words
     """
 
     def __init__(self, variable_grid, reduction_size = 32):
@@ -22,102 +31,134 @@ class DCTHash(phash.PerceptualHash):
         # init dct grid params
         self.dct_flag = False
         self.dct_grid = phash.VariableGrid((self.reduction_size, \
-            self.reduction_size))
+            self.reduction_size), channels = 1, dtype = np.float64)
 
-    def compute_hash(self, verbose = False) -> None:
+    def compute_hash(self, low_freq_only = False, verbose = False) -> None:
         assert self.hash_flag == False
+        assert self.reduction_size >= 8
 
-        # reduce grid
-        if verbose: print("Reducing grid...\n")
-        self.reduce_grid()
-
-        # convert grid to gs
-        if verbose: print("Converting grid to grayscale...\n")
-        self.__convert_to_gs()
-
-        # iteratively calculate 2d dct 
-        if verbose: print("Calcuating 2D DCT...\n")
-        for row in range(self.reduction_size):
-            for col in range(self.reduction_size):
-                self.dct_grid.load_grid_data((row, col), \
-                    self.__calc_2d_dct(row, col))
+        # reduce grid and convert it to gs
+        with instrument.span('dct_hash.reduce_grid'):
+            self.reduce_grid()
+            self.__convert_to_gs()
 
-        # strip high frequency readings
-        if verbose: print("Stripping high frequency grid readings...\n")
-        assert self.reduction_size >= 8
-        mean_val = 0
-        high_freq_grid = phash.VariableGrid((8, 8))
-        for row in range(8):
-            for col in range(8):
-                if row == 0 and col == 0: continue
-                val = self.dct_grid.read_grid_data((row, col))
-                high_freq_grid.load_grid_data((row, col), val)
-                mean_val += val
-
-        # calculate mean reading value
-        if verbose: print("Calculating mean reading value...\n")
-        mean_val = mean_val / ((8 ** 2) - 1)
+        # calculate 2d dct (optionally only the low frequency block)
+        with instrument.span('dct_hash.dct'):
+            block_size = 8 if low_freq_only else None
+            dct_res = calc_2d_dct(self.reduced_data.get_grid_array(), block_size)
+            self.dct_grid = phash.VariableGrid.from_array(dct_res)
 
         # compute bit hash
-        if verbose: print("Computing bit hash...\n")
-        self.hash_res = self.__compute_bit_hash(mean_val, high_freq_grid)
+        with instrument.span('dct_hash.bit_hash'):
+            self.hash_res = calc_bit_hash(dct_res[np.newaxis])[0].tolist()
         self.dct_flag = True
 
         # publish results
-        if verbose:
-            print("Publishing results...\n")
-            self.publish_results()
+        if verbose: self.publish_results()
 
     def publish_results(self) -> None:
         assert self.dct_flag == True
         print("DCT hash: {}\n".format(self.__join_list_bits(self.hash_res)))
-    
-    def __compute_bit_hash(self, mean, high_freq_grid):
-        hash_res = []
-        
-        # iteratively calculate bit
-        for row in range(8):
-            for col in range(8):
-                hash_res.append(1 if high_freq_grid.read_grid_data((row, col)) \
-                    > mean else 0)
-        return hash_res
+
+    def get_packed_hash(self) -> _packed.PackedHash:
+        assert self.dct_flag == True
+        return _packed.PackedHash.from_bits(self.hash_res)
 
     def __convert_to_gs(self) -> None:
         assert self.reduction_flag == True
 
-        # iteratively convert to gs
-        for row in range(self.reduction_size):
-            for col in range(self.reduction_size):
-                pixel = self.reduced_data.read_grid_data((row, col))
-                self.reduced_data.load_grid_data((row, col), int(sum(pixel) / 3))
+        # convert to truncated channel mean
+        gs_data = convert_to_gs(self.reduced_data.get_grid_array())
+        self.reduced_data = phash.VariableGrid.from_array(gs_data)
         self.gs_flag = True
-
-    def __calc_2d_dct(self, u, v) -> float:
-        m_term = 2.0 / self.reduction_size
-        iter_sum = 0
-
-        # calculate sum term iteratively
-        assert self.gs_flag == True
-        for i in range(self.reduction_size):
-            for j in range(self.reduction_size):
-                lambda_term = self.__calc_lambda(i)
-                lambda_term *= self.__calc_lambda(j)
-                lambda_term *= self.__calc_cos(u, i)
-                lambda_term *= self.__calc_cos(v, j)
-                lambda_term *= self.reduced_data.read_grid_data((i, j))
-                iter_sum += lambda_term
-        
-        # return result
-        return m_term * iter_sum
-
-    def __calc_cos(self, left, right) -> float:
-        cos_term = (math.pi * left) / (2.0 * self.reduction_size)
-        cos_term *= 2 * right + 1
-        return math.cos(cos_term)
-
-    def __calc_lambda(self, xi) -> float:
-        if xi == 0: return 1.0 / math.sqrt(2.0)
-        else: return 1.0
     
     def __join_list_bits(self, hash) -> None:
-        return "".join([str(x) for x in hash])
\ No newline at end of file
+        return "".join([str(x) for x in hash])
+
+"""
+Utility function for fetching the (size x size) DCT basis
+matrix C, where C[u, i] = sqrt(2 / size) * lambda(i) * 
+cos(pi * u * (2i + 1) / (2 * size)). Basis matrices are 
+computed once per size and cached at module level.
+"""
+def get_dct_basis(size) -> np.ndarray:
+    if size not in _dct_basis_cache:
+
+        # build cosine terms
+        u = np.arange(size).reshape(-1, 1)
+        i = np.arange(size).reshape(1, -1)
+        basis = np.cos((math.pi * u * (2 * i + 1)) / (2.0 * size))
+
+        # apply lambda and normalization terms
+        basis[:, 0] /= math.sqrt(2.0)
+        basis *= math.sqrt(2.0 / size)
+        basis.flags.writeable = False
+        _dct_basis_cache[size] = basis
+    return _dct_basis_cache[size]
+
+"""
+Utility function for computing the 2D DCT of a square 
+grayscale array (or a stack of them over the leading axes)
+as the matrix product C * X * C^T. If 'block_size' is given, 
+only the top-left (block_size x block_size) low frequency 
+block is computed.
+"""
+def calc_2d_dct(array, block_size = None) -> np.ndarray:
+    size = array.shape[-1]
+    assert array.shape[-2] == size
+
+    # fetch (truncated) basis
+    basis = get_dct_basis(size)
+    if block_size is not None:
+        assert block_size <= size
+        basis = basis[:block_size]
+
+    # compute transform
+    return basis @ array @ basis.T
+
+"""
+Utility function for converting reduced RGB grids (with any
+leading batch axes) to grayscale as the truncated channel mean.
+"""
+def convert_to_gs(reduced) -> np.ndarray:
+    return np.floor(reduced.sum(axis = -1) / 3)
+
+"""
+Utility function for computing DCT hash bits from a batch of
+(N, 8+, 8+) DCT coefficient grids. The high frequency 8x8 
+block (with the DC term zeroed) is thresholded against its
+mean, giving an (N, 64) array of 0/1 bits.
+"""
+def calc_bit_hash(dct_res) -> np.ndarray:
+
+    # strip high frequency readings
+    high_freq_grid = dct_res[:, :8, :8].copy()
+    high_freq_grid[:, 0, 0] = 0
+
+    # calculate mean reading values
+    mean_val = high_freq_grid.sum(axis = (1, 2)) / ((8 ** 2) - 1)
+
+    # threshold against mean
+    bits = high_freq_grid > mean_val[:, np.newaxis, np.newaxis]
+    return bits.reshape(len(dct_res), -1).astype(np.uint8)
+
+"""
+Utility function for computing the DCT hash of a batch of
+N images in a single pass. The batch is either an (N, height,
+width, 3) array or a sequence of VariableGrid objects, and the
+result is an (N, 64) array of 0/1 bits (or an (N, 1) array of 
+uint64 words if 'packed' is set). Only the low frequency block 
+of each DCT is computed.
+"""
+def compute_batch_hash(grids, reduction_size = 32, packed = False) -> np.ndarray:
+    assert reduction_size >= 8
+
+    # reduce and convert batch to gs
+    reduced = phash.reduce_batch(grids, reduction_size)
+    gs_data = convert_to_gs(reduced)
+
+    # calculate low frequency dct and bit hashes
+    bits = calc_bit_hash(calc_2d_dct(gs_data, 8))
+    return _packed.pack_bits(bits) if packed else bits
+
+_dct_basis_cache = {}
@@ -0,0 +1,218 @@
+import pure.hash.packed as packed
+import numpy as np
+import itertools
+
+class HashIndex:
+    """
+    Defines an in-memory near-duplicate index over packed perceptual
+    hashes of up to 64 bits (e.g. DCT and 8x8 average hashes), using
+    multi-index hashing. Each hash is split into 'bands' equal bit
+    bands, and each band is stored in an exact-match table. Since two
+    hashes within Hamming distance r must share at least one band
+    within distance floor(r / bands), a radius query only probes
+    the table entries near each query band and verifies the (few)
+    candidates with a popcount, instead of scanning every hash.
+
+    Bulk loaded hashes are kept in sorted band tables that are probed
+    with vectorized lookups, incrementally inserted hashes are kept in
+    small per-band dicts, and removed hashes are masked out until the
+    next 'compact' call rebuilds the sorted tables.
+
+    Attributes:
+        - bits -> int : number of bits per hash
+        - bands -> int : number of bands each hash is split into
+        - band_bits -> int : number of bits per band
+        - hashes -> ndarray : uint64 hash words indexed by slot
+        - alive -> ndarray : boolean flags for occupied slots
+        - slot_ids -> list : stored id for each slot (None if removed)
+        - slots -> dict : slot for each stored id
+        - tables -> list(tuple) : sorted (band values, bucket offsets,
+            slots) tables, one per band
+        - inserted -> list(dict) : band value -> slot list tables for
+            hashes inserted since the last build, one per band
+
+    Methods:
+        - build(ids, hashes) -> None : bulk loads a list of ids and
+            their hashes into an empty index
+        - insert(id, hash) -> None : adds a single id and hash
+        - remove(id) -> None : removes a single id and its hash
+        - compact() -> None : rebuilds the sorted band tables from
+            every stored hash, dropping removed slots
+        - get_hash(id) -> int : fetches the stored hash word for an id
+        - query(hash, radius) -> list : fetches (id, distance) pairs
+            for every stored hash within Hamming distance 'radius',
+            sorted by distance
+    """
+
+    def __init__(self, bits = 64, bands = 4):
+        assert bits <= 64 and bits % bands == 0
+        self.bits = bits
+        self.bands = bands
+        self.band_bits = bits // bands
+
+        # init storage
+        self.hashes = np.zeros(0, dtype = np.uint64)
+        self.alive = np.zeros(0, dtype = bool)
+        self.slot_ids = []
+        self.slots = {}
+        self.__build_tables()
+
+    def build(self, ids, hashes) -> None:
+        assert len(self.slots) == 0
+        words = self.__to_words(hashes)
+        assert len(ids) == len(words)
+
+        # load slots
+        self.hashes = words.copy()
+        self.alive = np.ones(len(words), dtype = bool)
+        self.slot_ids = list(ids)
+        self.slots = {id: slot for slot, id in enumerate(self.slot_ids)}
+        assert len(self.slots) == len(words)
+        self.__build_tables()
+
+    def insert(self, id, hash) -> None:
+        assert id not in self.slots
+        word = self.__to_words([hash])
+
+        # grow storage as needed
+        slot = len(self.slot_ids)
+        if slot == len(self.hashes):
+            capacity = max(16, 2 * slot)
+            self.hashes = np.concatenate([self.hashes[:slot], \
+                np.zeros(capacity - slot, dtype = np.uint64)])
+            self.alive = np.concatenate([self.alive[:slot], \
+                np.zeros(capacity - slot, dtype = bool)])
+
+        # store hash
+        self.hashes[slot] = word[0]
+        self.alive[slot] = True
+        self.slot_ids.append(id)
+        self.slots[id] = slot
+
+        # add slot to inserted band tables
+        for band, key in enumerate(self.__get_bands(word)[0].tolist()):
+            self.inserted[band].setdefault(key, []).append(slot)
+
+    def remove(self, id) -> None:
+        slot = self.slots.pop(id)
+
+        # remove slot from inserted band tables
+        for band, key in enumerate(self.__get_bands(self.hashes[slot:slot + 1])[0].tolist()):
+            bucket = self.inserted[band].get(key)
+            if bucket is not None and slot in bucket:
+                bucket.remove(slot)
+                if not bucket: del self.inserted[band][key]
+
+        # release slot (masked in sorted tables until compacted)
+        self.alive[slot] = False
+        self.slot_ids[slot] = None
+
+    def compact(self) -> None:
+        ids = [id for id in self.slot_ids if id is not None]
+        words = self.hashes[:len(self.slot_ids)][self.alive[:len(self.slot_ids)]]
+
+        # reload remaining hashes
+        self.slots = {}
+        self.build(ids, words)
+
+    def get_hash(self, id) -> int:
+        return int(self.hashes[self.slots[id]])
+
+    def query(self, hash, radius) -> list:
+        word = self.__to_words([hash])
+        band_vals = self.__get_bands(word)[0]
+
+        # get band values within the pigeonhole sub-radius
+        flips = get_flip_masks(self.band_bits, radius // self.bands)
+        probes = band_vals[:, np.newaxis] ^ flips[np.newaxis, :]
+
+        # probe sorted and inserted tables
+        buckets = []
+        for band in range(self.bands):
+            buckets.append(self.__probe_table(self.tables[band], probes[band]))
+            if self.inserted[band]:
+                for key in probes[band].tolist():
+                    bucket = self.inserted[band].get(key)
+                    if bucket is not None: buckets.append(np.array(bucket))
+
+        # verify candidates (deduplicating slots found in several bands)
+        candidates = np.concatenate(buckets)
+        dists = packed.popcount(self.hashes[candidates] ^ word[0]).astype(int)
+        within = (dists <= radius) & self.alive[candidates]
+        matches = sorted(set(zip(dists[within].tolist(), candidates[within].tolist())))
+        return [(self.slot_ids[slot], dist) for dist, slot in matches]
+
+    def __build_tables(self) -> None:
+        band_vals = self.__get_bands(self.hashes[:len(self.slot_ids)])
+        self.tables, self.inserted = [], [{} for _ in range(self.bands)]
+
+        # sort slots by band value for each table
+        for band in range(self.bands):
+            order = np.argsort(band_vals[:, band], kind = 'stable')
+            keys, starts = np.unique(band_vals[order, band], return_index = True)
+            offsets = np.append(starts, len(order))
+            self.tables.append((keys, offsets, order))
+
+    def __probe_table(self, table, probes) -> np.ndarray:
+        keys, offsets, slots = table
+        if len(keys) == 0: return slots
+
+        # find probed keys present in table
+        pos = np.minimum(np.searchsorted(keys, probes), len(keys) - 1)
+        pos = pos[keys[pos] == probes]
+
+        # gather bucket slots for every matched key
+        starts, ends = offsets[pos], offsets[pos + 1]
+        lengths = ends - starts
+        cum_lengths = np.cumsum(lengths)
+        positions = np.arange(cum_lengths[-1] if len(pos) else 0) + \
+            np.repeat(starts - cum_lengths + lengths, lengths)
+        return slots[positions]
+
+    def __to_words(self, hashes) -> np.ndarray:
+        if isinstance(hashes, np.ndarray):
+            return hashes.astype(np.uint64).reshape(-1)
+
+        # convert packed hashes and ints to words
+        words = []
+        for hash in hashes:
+            if isinstance(hash, packed.PackedHash):
+                assert hash.length == self.bits
+                hash = hash.words[0]
+            words.append(hash)
+        return np.array(words, dtype = np.uint64).reshape(-1)
+
+    def __get_bands(self, words) -> np.ndarray:
+        return get_bands(words, self.bands, self.band_bits)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, id) -> bool:
+        return id in self.slots
+
+"""
+Utility function for splitting (N,) uint64 hash words into an
+(N, bands) array of 'band_bits' bit band values, starting from
+the most significant bit.
+"""
+def get_bands(words, bands, band_bits) -> np.ndarray:
+    shifts = 64 - band_bits * np.arange(1, bands + 1, dtype = np.uint64)
+    mask = np.uint64((1 << band_bits) - 1)
+    return (words[:, np.newaxis] >> shifts) & mask
+
+"""
+Utility function for fetching every XOR mask of 'band_bits'
+bits with at most 'radius' bits set (cached per parameter set).
+"""
+def get_flip_masks(band_bits, radius) -> np.ndarray:
+    key = (band_bits, radius)
+    if key not in _flip_mask_cache:
+        masks = [0]
+        for count in range(1, min(radius, band_bits) + 1):
+            for positions in itertools.combinations(range(band_bits), count):
+                masks.append(sum(1 << pos for pos in positions))
+        _flip_mask_cache[key] = np.array(masks, dtype = np.uint64)
+    return _flip_mask_cache[key]
+
+_flip_mask_cache = {}
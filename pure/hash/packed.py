@@ -0,0 +1,132 @@
+import numpy as np
+
+class PackedHash:
+    """
+    Defines a compact representation of a perceptual hash as
+    bits packed (most significant bit first) into 64-bit words.
+    A PackedHash object is typically constructed from a list or
+    array of 0/1 hash bits using 'from_bits', and supports hex and
+    bytes serialization and popcount-based comparisons.
+
+    Attributes:
+        - words -> ndarray : uint64 words holding the packed bits
+            (trailing bits of the final word are zero)
+        - length -> int : number of hash bits
+
+    Methods:
+        - to_bits() -> ndarray : unpacks the hash into 0/1 bits
+        - to_hex() -> str : serializes the hash words as hex
+        - to_bytes() -> bytes : serializes the hash words as
+            big-endian bytes
+        - hamming_distance(other) -> int : number of differing bits
+            between two hashes of the same length
+        - similarity(other) -> float : fraction of matching bits
+            between two hashes of the same length
+
+    Static Methods:
+        - from_bits(bits) -> PackedHash : packs a sequence of 0/1 bits
+        - from_hex(hex_str, length) -> PackedHash : parses a hex string
+        - from_bytes(data, length) -> PackedHash : parses big-endian bytes
+    """
+
+    def __init__(self, words, length):
+        self.words = np.ascontiguousarray(words, dtype = np.uint64).reshape(-1)
+        self.length = length
+
+        # validate word count
+        assert len(self.words) == -(-length // 64)
+
+    @staticmethod
+    def from_bits(bits) -> 'PackedHash':
+        bits = np.asarray(bits, dtype = np.uint8).reshape(-1)
+        return PackedHash(pack_bits(bits), len(bits))
+
+    @staticmethod
+    def from_hex(hex_str, length = None) -> 'PackedHash':
+        if length is None: length = 4 * len(hex_str)
+
+        # pad to whole words and parse
+        hex_str = hex_str.ljust(16 * -(-length // 64), '0')
+        return PackedHash.from_bytes(bytes.fromhex(hex_str), length)
+
+    @staticmethod
+    def from_bytes(data, length = None) -> 'PackedHash':
+        if length is None: length = 8 * len(data)
+
+        # pad to whole words and parse
+        data = data.ljust(8 * -(-length // 64), b'\x00')
+        return PackedHash(np.frombuffer(data, dtype = '>u8'), length)
+
+    def to_bits(self) -> np.ndarray:
+        bits = np.unpackbits(self.words.astype('>u8').view(np.uint8))
+        return bits[:self.length]
+
+    def to_hex(self) -> str:
+        return self.to_bytes().hex()
+
+    def to_bytes(self) -> bytes:
+        return self.words.astype('>u8').tobytes()
+
+    def hamming_distance(self, other) -> int:
+        assert self.length == other.length
+        return int(hamming_distance(self.words, other.words))
+
+    def similarity(self, other) -> float:
+        return 1.0 - self.hamming_distance(other) / self.length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PackedHash): return NotImplemented
+        return self.length == other.length and \
+            bool(np.array_equal(self.words, other.words))
+
+    def __hash__(self) -> int:
+        return hash((self.length, self.to_bytes()))
+
+    def __repr__(self) -> str:
+        return 'PackedHash({}, {})'.format(self.to_hex(), self.length)
+
+"""
+Utility function for packing 0/1 bits along the last axis of
+an (..., nbits) array into (..., ceil(nbits / 64)) uint64 words,
+most significant bit first.
+"""
+def pack_bits(bits) -> np.ndarray:
+    bits = np.asarray(bits, dtype = np.uint8)
+
+    # pad bits to whole words
+    nbits = bits.shape[-1]
+    padding = (-nbits) % 64
+    if padding:
+        pad_width = [(0, 0)] * (bits.ndim - 1) + [(0, padding)]
+        bits = np.pad(bits, pad_width)
+
+    # pack bytes and view as big-endian words
+    packed = np.ascontiguousarray(np.packbits(bits, axis = -1))
+    return packed.view('>u8').astype(np.uint64)
+
+"""
+Utility function for counting set bits in each element of an
+unsigned integer array.
+"""
+def popcount(array) -> np.ndarray:
+    array = np.asarray(array)
+    if hasattr(np, 'bitwise_count'): return np.bitwise_count(array)
+
+    # count bits per byte with a lookup table
+    counts = _byte_popcount[array.view(np.uint8)]
+    counts = counts.reshape(array.shape + (array.dtype.itemsize,))
+    return counts.sum(axis = -1, dtype = np.uint8)
+
+"""
+Utility function for computing Hamming distances between
+packed (..., words) uint64 hash arrays, broadcasting over the
+leading axes.
+"""
+def hamming_distance(words_a, words_b) -> np.ndarray:
+    diff = np.bitwise_xor(words_a, words_b)
+    return popcount(diff).sum(axis = -1, dtype = np.int64)
+
+_byte_popcount = np.array([bin(x).count('1') for x in range(256)], dtype = np.uint8)
@@ -1,30 +1,60 @@
 from abc import ABCMeta, abstractclassmethod
-import math
+import pure.instrument as instrument
+import numpy as np
 
 class VariableGrid:
     """
     Defines an encapsulation system for variable-sized 
     grids of pixel data. A VariableGrid object is instanitated
     using the intended dimensions of the container and then
-    loaded using manual function calls. 
+    loaded using manual function calls, or wrapped directly 
+    around an existing array with 'from_array'. Grid data is
+    backed by a contiguous numpy array of shape (height, width, 
+    channels), or (height, width) for single-channel grids.
 
     Attributes:
         - self.height -> int : grid height (number of rows)
         - self.width -> int : grid width (number of columns)
-        - self.grid -> list(list) : grid of pixel values represented
-            as list of list of tuples
+        - self.channels -> int : number of values per pixel (1 for
+            scalar grids)
+        - self.grid -> ndarray : grid of pixel values represented
+            as a numpy array
 
     Methods:
         - load_grid_data(location, data) -> None : load grid data
             for a single specified location and pixel value
         - read_grid_data(location) -> tuple : fetch grid data for
             a single specified location in the grid
+        - get_grid_array() -> ndarray : fetch the backing array 
+            for the entire grid
+        - load_grid_array(array) -> None : replace the backing array
+            for the entire grid
         - print_grid_data() -> None : output entire formatted grid
+
+    Static Methods:
+        - from_array(array) -> VariableGrid : wraps an existing 
+            (height, width[, channels]) array without copying it
     """
 
-    def __init__(self, size):
+    def __init__(self, size, channels = 3, dtype = np.float32):
         self.height, self.width = size
-        self.grid = [[0] * self.width for _ in range(self.height)]
+        self.channels = channels
+
+        # allocate backing array
+        shape = (self.height, self.width) if channels == 1 else \
+            (self.height, self.width, channels)
+        self.grid = np.zeros(shape, dtype = dtype)
+
+    @staticmethod
+    def from_array(array) -> 'VariableGrid':
+        assert array.ndim in (2, 3)
+
+        # wrap array without copying
+        var_grid = VariableGrid.__new__(VariableGrid)
+        var_grid.height, var_grid.width = array.shape[:2]
+        var_grid.channels = 1 if array.ndim == 2 else array.shape[2]
+        var_grid.grid = array
+        return var_grid
 
     def load_grid_data(self, location, data) -> None:
         row, col = location
@@ -33,8 +63,12 @@ class VariableGrid:
         assert row < self.height
         assert col < self.width
 
+        # detach read-only buffers before first write
+        if not self.grid.flags.writeable:
+            self.grid = self.grid.copy()
+
         # load data
-        self.grid[row][col] = data
+        self.grid[row, col] = data
 
     def read_grid_data(self, location) -> tuple:
         row, col = location 
@@ -44,7 +78,20 @@ class VariableGrid:
         assert col < self.width
 
         # fetch data
-        return self.grid[row][col]
+        if self.channels == 1: return self.grid[row, col].item()
+        return tuple(self.grid[row, col].tolist())
+
+    def get_grid_array(self) -> np.ndarray:
+        return self.grid
+
+    def load_grid_array(self, array) -> None:
+
+        # validate input data
+        assert array.shape[:2] == (self.height, self.width)
+        assert (array.ndim == 2) == (self.channels == 1)
+
+        # load data
+        self.grid = array
 
     def print_grid_data(self) -> None:
         for row in range(self.height):
@@ -105,84 +152,15 @@ class PerceptualHash:
 
     def reduce_grid(self) -> None:
         assert self.reduction_flag == False
-        self.reduced_data = VariableGrid((self.reduction_size, self.reduction_size))
 
         # assert minimum size constraints
         assert self.data.height >= self.reduction_size
         assert self.data.width >= self.reduction_size
 
-        # get vertical offset conversion sizes
-        if self.data.height % self.reduction_size == 0:
-            vertical_offset = math.floor(self.data.height / self.reduction_size)
-            vertical_compensation = self.reduction_size
-        else:
-            vertical_offset = math.floor(self.data.height / (self.reduction_size - 1))
-            vertical_overflow = self.data.height % (self.reduction_size - 1)
-            vertical_compensation = self.reduction_size - 1
-
-        # get horizontal offset conversion sizes
-        if self.data.width % self.reduction_size == 0:
-            horizontal_offset = math.floor(self.data.width / self.reduction_size)
-            horizontal_compensation = self.reduction_size
-        else:
-            horizontal_offset = math.floor(self.data.width / (self.reduction_size - 1))
-            horizontal_overflow = self.data.width % (self.reduction_size - 1)
-            horizontal_compensation = self.reduction_size - 1
-
         # compute mean pixel values
-        for row in range(vertical_compensation):
-            for col in range(horizontal_compensation):
-                pixel_sum = (0, 0, 0)
-
-                # sum pixels for quadrant
-                for p_row in range(row * vertical_offset, (row + 1) * vertical_offset):
-                    for p_col in range(col * horizontal_offset, (col + 1) * horizontal_offset):
-                        pixel_val = self.data.read_grid_data((p_row, p_col))
-                        pixel_sum = tuple(sum(x) for x in zip(pixel_sum, pixel_val))
-
-                # normalize pixel sum
-                pixel_res = tuple(x / (vertical_offset * horizontal_offset) for x in pixel_sum)
-                self.reduced_data.load_grid_data((row, col), pixel_res) 
-
-        # compute vertical offset pixel values
-        if vertical_compensation < self.reduction_size:
-            for col in range(horizontal_compensation):
-                pixel_sum = (0, 0, 0)
-
-                # sum pixels for quadrant
-                for p_row in range((self.reduction_size - 1) * vertical_offset, self.data.height):
-                    for p_col in range(col * horizontal_offset, (col + 1) * horizontal_offset):
-                        pixel_val = self.data.read_grid_data((p_row, p_col))
-                        pixel_sum = tuple(sum(x) for x in zip(pixel_sum, pixel_val))
-
-                # normalize pixel sum
-                pixel_res = tuple(x / (horizontal_offset * vertical_overflow) for x in pixel_sum)
-                self.reduced_data.load_grid_data((self.reduction_size - 1, col), pixel_res)
-
-        # compute horizontal offset pixel values
-        if horizontal_compensation < self.reduction_size:
-            for row in range(vertical_compensation):
-                pixel_sum = (0, 0, 0)
-
-                # sum pixels for quadrant
-                for p_row in range(row * vertical_offset, (row + 1) * vertical_offset):
-                    for p_col in range((self.reduction_size - 1) * horizontal_offset, self.data.width):
-                        pixel_val = self.data.read_grid_data((p_row, p_col))
-                        pixel_sum = tuple(sum(x) for x in zip(pixel_sum, pixel_val))
-
-                # normalize pixel sum
-                pixel_res = tuple(x / (vertical_offset * horizontal_overflow) for x in pixel_sum)
-                self.reduced_data.load_grid_data((row, self.reduction_size - 1), pixel_res)
-            
-        # compute corner offset pixel value
-        if vertical_compensation < self.reduction_size and horizontal_compensation < self.reduction_size:
-            pixel_sum = (0, 0, 0)
-            for p_row in range((self.reduction_size - 1) * vertical_offset, self.data.height):
-                for p_col in range((self.reduction_size - 1) * horizontal_offset, self.data.width):
-                    pixel_val = self.data.read_grid_data((p_row, p_col))
-                    pixel_sum = tuple(sum(x) for x in zip(pixel_sum, pixel_val))
-            pixel_res = tuple(x / (horizontal_overflow * vertical_overflow) for x in pixel_sum)
-            self.reduced_data.load_grid_data((self.reduction_size - 1, self.reduction_size - 1), pixel_res)
+        reduced = reduce_array(self.data.get_grid_array(), self.reduction_size)
+        self.reduced_data = VariableGrid.from_array(reduced)
+        instrument.count('pixels_reduced', self.data.height * self.data.width)
 
         # stamp reduction process
         self.reduction_flag = True
@@ -190,15 +168,88 @@ class PerceptualHash:
 """
 Utility function for converting a PixelGrid object
 to a VariableGrid object for portability between modules.
+The variable grid wraps the pixel grid's decoded buffer
+directly instead of copying it pixel by pixel.
 """
 def convert_pixel_to_var(pixel_grid) -> VariableGrid:
     assert pixel_grid.loaded == True
-    var_grid = VariableGrid(pixel_grid.get_grid_dimensions())
-    height, width = pixel_grid.get_grid_dimensions()
-
-    # iteratively copy and paste pixel data
-    for row in range(height):
-        for col in range(width):
-            pixel = pixel_grid.get_grid_pixel(row, col)
-            var_grid.load_grid_data((row, col), pixel)
-    return var_grid
\ No newline at end of file
+    return VariableGrid.from_array(pixel_grid.get_grid_array())
+
+
+"""
+Utility function for reducing an array of pixel data to a
+'size' by 'size' grid of area-averaged values over the two
+given axes. Axes whose length divides evenly are reduced 
+by summing one strided slice per offset within a block, and 
+all others are resampled with exact fractional pixel weights, 
+so every output cell covers the same area of the input.
+"""
+def reduce_array(array, size, axes = (0, 1)) -> np.ndarray:
+    assert array.shape[axes[0]] >= size
+    assert array.shape[axes[1]] >= size
+
+    # reduce each axis independently
+    reduced = _reduce_axis(array, size, axes[0])
+    return _reduce_axis(reduced, size, axes[1])
+
+def _reduce_axis(array, size, axis) -> np.ndarray:
+    length = array.shape[axis]
+
+    # take block means over evenly divided axis (summing strided slices)
+    if length % size == 0:
+        block, region = length // size, [slice(None)] * array.ndim
+        sums = np.zeros(array.shape[:axis] + (size,) + array.shape[axis + 1:])
+        for offset in range(block):
+            region[axis] = slice(offset, None, block)
+            sums += array[tuple(region)]
+        return sums / block
+
+    # get cell boundaries (in units of 1 / size pixels)
+    edges = np.arange(size + 1) * length
+    starts = edges[:-1] // size
+    span = (-(-edges[1:] // size) - starts).max()
+    weight_shape = [1] * array.ndim
+    weight_shape[axis] = -1
+
+    # sum pixels at each offset into their cells, weighted by overlap
+    sums = np.zeros(array.shape[:axis] + (size,) + array.shape[axis + 1:])
+    for offset in range(span):
+        pixels = starts + offset
+        overlap = np.minimum((pixels + 1) * size, edges[1:]) - \
+            np.maximum(pixels * size, edges[:-1])
+        weights = np.clip(overlap, 0, None) / size
+        sums += np.take(array, np.minimum(pixels, length - 1), axis = axis) * \
+            weights.reshape(weight_shape)
+
+    # normalize cell sums
+    return sums / (length / size)
+
+
+"""
+Utility function for reducing a batch of grids to a single
+(N, size, size, channels) array. The batch may be given as an
+(N, height, width, channels) array, or as a sequence of 
+VariableGrid objects or arrays, in which case grids sharing 
+a shape are stacked and reduced together.
+"""
+def reduce_batch(grids, size) -> np.ndarray:
+
+    # reduce stacked batch directly
+    if isinstance(grids, np.ndarray):
+        assert grids.ndim == 4
+        return reduce_array(grids, size, axes = (1, 2))
+
+    # group grids by shape
+    arrays = [g.get_grid_array() if isinstance(g, VariableGrid) else \
+        np.asarray(g) for g in grids]
+    groups = {}
+    for idx, array in enumerate(arrays):
+        groups.setdefault(array.shape, []).append(idx)
+
+    # reduce each group as a stacked batch
+    reduced = [None] * len(arrays)
+    for indices in groups.values():
+        stack = np.stack([arrays[idx] for idx in indices])
+        for idx, res in zip(indices, reduce_array(stack, size, axes = (1, 2))):
+            reduced[idx] = res
+    return np.stack(reduced)
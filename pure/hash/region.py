@@ -0,0 +1,167 @@
+import pure.hash.average as average
+import pure.hash.dct as dct
+import pure.hash.packed as _packed
+import pure.instrument as instrument
+import numpy as np
+
+class RegionHasher:
+    """
+    Defines a batched perceptual hash engine for many rectangular
+    regions of one image (e.g. every keypoint focal region of a
+    pimage feature set). A single summed-area table (integral image)
+    of the RGB buffer is built once, and the block means of every
+    region's reduced grid are read from it in O(1) per cell, so no
+    region is ever copied into its own VariableGrid. The integral
+    image is interpolated at fractional cell boundaries, which gives
+    the same overlap-weighted block means as 'reduce_array' (and also
+    supports regions smaller than the reduction size).
+
+    Attributes:
+        - pixel_grid -> PixelGrid : underlying pixel grid
+        - grid_dimensions -> tuple : height/width dimensions of the
+            pixel grid
+        - sat -> ndarray : (height + 1, width + 1, 3) float64 summed-area
+            table of the RGB buffer (built on first use)
+
+    Methods:
+        - get_region_grids(regions, size) -> ndarray : fetches the
+            (N, size, size, 3) block means of (top, left, height, width)
+            regions
+        - hash_regions(regions, kinds, packed) -> dict : computes every
+            requested hash kind ('gs', 'red', 'green', 'blue', 'lum'
+            average hashes, or 'dct') for a batch of regions
+        - hash_feature_set(feature_set, kinds, packed) -> dict : computes
+            the hashes of every feature focal region, keyed by feature id
+    """
+
+    def __init__(self, pixel_grid):
+        assert pixel_grid.loaded == True
+        self.pixel_grid = pixel_grid
+        self.grid_dimensions = pixel_grid.get_grid_dimensions()
+        self.__sat = None
+
+    @property
+    def sat(self) -> np.ndarray:
+
+        # build summed-area table on first use
+        if self.__sat is None:
+            with instrument.span('region_hasher.sat'):
+                height, width = self.grid_dimensions
+                sat = np.zeros((height + 1, width + 1, 3))
+                sat[1:, 1:] = self.pixel_grid.get_grid_array()
+                sat.cumsum(axis = 0, out = sat)
+                self.__sat = sat.cumsum(axis = 1, out = sat)
+        return self.__sat
+
+    def get_region_grids(self, regions, size) -> np.ndarray:
+        return self.__get_region_grids(regions, (size,))[size]
+
+    def hash_regions(self, regions, kinds = ('gs', 'dct'), packed = False) -> dict:
+
+        # reduce every region once (8x8 means reuse the 32x32 integral samples)
+        sizes = tuple(sorted({32 if kind == 'dct' else 8 for kind in kinds}, reverse = True))
+        with instrument.span('region_hasher.reduce'):
+            reduced = self.__get_region_grids(regions, sizes)
+
+        # compute batch bit hashes
+        hashes = {}
+        with instrument.span('region_hasher.bit_hash'):
+            for kind in kinds:
+                if kind == 'dct':
+                    gs_data = dct.convert_to_gs(reduced[32])
+                    bits = dct.calc_bit_hash(dct.calc_2d_dct(gs_data, 8))
+                else: bits = average.calc_bit_hash(reduced[8], kind)
+                hashes[kind] = _packed.pack_bits(bits) if packed else bits
+        instrument.count('regions_hashed', len(reduced[sizes[0]]))
+        return hashes
+
+    def hash_feature_set(self, feature_set, kinds = ('gs', 'dct'), packed = False) -> dict:
+        features = [feature for feature in feature_set if feature.position is not None]
+        if not features: return {}
+
+        # hash every focal region in one batch
+        regions = [get_focal_region(feature, self.grid_dimensions) for feature in features]
+        hashes = self.hash_regions(regions, kinds, packed)
+        return {feature.id: {kind: hashes[kind][idx] for kind in kinds} for \
+            idx, feature in enumerate(features)}
+
+    def __get_region_grids(self, regions, sizes) -> dict:
+        regions = np.asarray(regions, dtype = float).reshape(-1, 4)
+        grids = {size: np.empty((len(regions), size, size, 3)) for size in sizes}
+
+        # read region block means in bounded chunks
+        for start in range(0, len(regions), _region_chunk_size):
+            chunk = regions[start:start + _region_chunk_size]
+            for size, means in self.__get_block_means(chunk, sizes).items():
+                grids[size][start:start + len(chunk)] = means
+        return grids
+
+    def __get_block_means(self, regions, sizes) -> dict:
+        top, left, height, width = regions.T
+        max_size = sizes[0]
+        assert all(max_size % size == 0 for size in sizes)
+
+        # sample integral image at the finest fractional cell boundaries
+        steps = np.arange(max_size + 1) / max_size
+        rows = top[:, np.newaxis] + height[:, np.newaxis] * steps
+        cols = left[:, np.newaxis] + width[:, np.newaxis] * steps
+        integral = _interpolate_sat(self.sat, rows, cols)
+
+        # difference corners of every size into cell sums and normalize by cell area
+        means = {}
+        for size in sizes:
+            stride = max_size // size
+            corners = integral[:, ::stride, ::stride]
+            sums = corners[:, 1:, 1:] - corners[:, :-1, 1:] - corners[:, 1:, :-1] + \
+                corners[:, :-1, :-1]
+            areas = height * width / (size * size)
+            means[size] = sums / areas[:, np.newaxis, np.newaxis, np.newaxis]
+        return means
+
+"""
+Utility function for fetching the (top, left, height, width) bounds
+of a feature focal region, clipped to the pixel grid (the populated
+focal region bounds are used when available).
+"""
+def get_focal_region(feature, grid_dimensions) -> tuple:
+    if feature.populated:
+        return feature.top_left_boundary + feature.focal_dimensions
+
+    # clip region around feature position
+    row, col = feature.position
+    height, width = feature.size
+    grid_height, grid_width = grid_dimensions
+    top, left = max(0, row - height // 2), max(0, col - width // 2)
+    bottom = min(grid_height, row + height // 2 + 1)
+    right = min(grid_width, col + width // 2 + 1)
+    return (top, left, bottom - top, right - left)
+
+"""
+Utility function for evaluating the integral of the piecewise-
+constant image at fractional (row, col) positions. Within a pixel
+the integral is bilinear, so interpolating the summed-area table
+bilinearly is exact. 'rows' is (N, R) and 'cols' is (N, C), and the
+result is (N, R, C, channels).
+"""
+def _interpolate_sat(sat, rows, cols) -> np.ndarray:
+    height, width, channels = sat.shape[0] - 1, sat.shape[1] - 1, sat.shape[2]
+
+    # get pixel indices and fractional offsets
+    row_idx = np.clip(np.floor(rows).astype(np.int64), 0, height - 1)
+    col_idx = np.clip(np.floor(cols).astype(np.int64), 0, width - 1)
+    row_frac = (rows - row_idx)[:, :, np.newaxis, np.newaxis]
+    col_frac = (cols - col_idx)[:, np.newaxis, :, np.newaxis]
+
+    # gather table corners through flat indices
+    flat = sat.reshape(-1, channels)
+    idx = row_idx[:, :, np.newaxis] * (width + 1) + col_idx[:, np.newaxis, :]
+    s00, s01 = np.take(flat, idx, axis = 0), np.take(flat, idx + 1, axis = 0)
+    s10 = np.take(flat, idx + width + 1, axis = 0)
+    s11 = np.take(flat, idx + width + 2, axis = 0)
+
+    # interpolate along rows, then along columns
+    integral = s00 + row_frac * (s10 - s00)
+    integral += col_frac * (s01 + row_frac * (s11 - s01) - integral)
+    return integral
+
+_region_chunk_size = 256
@@ -1,43 +1,67 @@
 import pure.imaging.grid as grid
-from copy import deepcopy
-import math
+from PIL import Image
+import numpy as np
+import math, io, os
 
 class GraphicsImage:
     """
-    Defines the infrastructure for manually painting, printing, and 
+    Defines the infrastructure for manually painting, printing, and
     viewing graphic images. A GraphicsImage object is constructed
-    using a PixelGrid object (note: modifying the pixel grid attribute
-    of the PixelGrid object will not modify the PixelGrid object)
+    using a PixelGrid object (note: painting the graphics image will
+    not modify the PixelGrid object). The pixel grid is never copied;
+    instead, painted pixels are stored in a copy-on-write overlay of
+    square tiles that are copied from the pixel grid the first time
+    they are painted, so memory grows only with the painted area.
 
-    Attributes: 
-        - pixel_grid -> PixelGrid : pixel grid object to be modified 
-            with graphics utilities
+    Attributes:
+        - pixel_grid -> PixelGrid : underlying pixel grid object
+            read through by the graphics utilities
         - grid_dimensions -> tuple : height/width dimensions for associated
             pixel grid
+        - tile_size -> int : height/width of overlay tiles
+        - tiles -> dict : painted (tile row, tile col) -> RGB tile
+            array overlay
 
     Methods:
         - draw_pixel(position, color) -> None : layer specified
-            pixel on top of pixel grid 
-        - draw_square(position, size, color) -> None : uses draw_pixel to 
-            to layer square patern on top of pixel grid given by position
-            (top-left of square), size, and color parameters
-        - draw_feature_invert(position, size) -> None : draws a 
+            pixel on top of pixel grid
+        - draw_square(position, size, color) -> None : layers square
+            patern on top of pixel grid given by position (top-left of
+            square), size, and color parameters
+        - draw_feature_invert(position, size) -> None : draws a
             marker for image feature based on mean background pixel values
-        - draw_feature_color(position, color, size) -> None : draws a marker 
-            for image feature based on a specified color 
+        - draw_feature_color(position, color, size) -> None : draws a marker
+            for image feature based on a specified color
+        - draw_features(positions, sizes, colors) -> None : draws a batch
+            of feature markers, inverted or colored one by one in order,
+            or (when every marker shares one color) painted with a single
+            mask write per touched tile
         - replace_square_data(self, position, size, data) -> replaces values
-            in grid using provided data at position for specified size
+            in grid using provided (height, width, 3) data array at position
+            (top-left of square) for specified size
+        - get_region(position, size) -> ndarray : fetches the painted
+            RGB values of a region of the graphics image
+        - get_image() -> PIL Image : composes the painted graphics image
+        - save_image(fp, format) -> None : writes the painted graphics
+            image to a file path or file object (PNG for unnamed file
+            objects when no format is given)
+        - get_image_bytes(format) -> bytes : encodes the painted graphics
+            image into an in-memory buffer (e.g. PNG or JPEG)
         - output_image() -> None : prints pixel grid to console
     """
 
-    def __init__(self, pixel_grid):
+    def __init__(self, pixel_grid, tile_size = 64):
 
         # load graphics image
         assert pixel_grid.loaded == True
-        self.pixel_grid = deepcopy(pixel_grid)
+        self.pixel_grid = pixel_grid
         self.grid_dimensions = pixel_grid.get_grid_dimensions()
 
-    def draw_pixel(self, position, color) -> None: 
+        # init copy-on-write overlay
+        self.tile_size = tile_size
+        self.tiles = {}
+
+    def draw_pixel(self, position, color) -> None:
 
         # get tuple values
         row, col = position
@@ -47,15 +71,15 @@ class GraphicsImage:
         # assert RGB-value boundaries
         assert red >= 0 and red < 256
         assert green >= 0 and green < 256
-        assert blue >= 0 and blue < 256 
+        assert blue >= 0 and blue < 256
 
         # assert boundary values
-        assert row <= grid_height
-        assert col <= grid_width
+        assert row < grid_height
+        assert col < grid_width
 
         # place pixel on grid
-        self.pixel_grid.grid.putpixel((col, row), color)
-    
+        self.__write_region(row, col, np.array(color, dtype = np.uint8).reshape(1, 1, 3))
+
     def draw_square(self, position, size, color) -> None:
 
         # get tuple values
@@ -63,45 +87,48 @@ class GraphicsImage:
         height, width = size
         grid_height, grid_width = self.grid_dimensions
 
+        # assert RGB-value boundaries
+        assert all(c >= 0 and c < 256 for c in color)
+
+        # clip square to grid
+        row_max = min(row + height, grid_height)
+        col_max = min(col + width, grid_width)
+        if row_max <= row or col_max <= col: return
+
         # draw square pixels
-        for i in range(row, row + height):
-            if i > grid_height: break
-            for j in range(col, col + width):
-                if j > grid_width: break
-                self.draw_pixel((i, j), color)
- 
+        fill = np.empty((row_max - row, col_max - col, 3), dtype = np.uint8)
+        fill[:] = color
+        self.__write_region(row, col, fill)
+
     def draw_feature_invert(self, position, size = (30, 30)) -> None:
-        
+
         # get dimension values and position color
         row, col = position
         height, width = size
         grid_height, grid_width = self.grid_dimensions
-        mean_colors = [c for c in self.pixel_grid.get_grid_pixel(row, col)]
         height_slip_min = max(0, row - int(height / 2))
         width_slip_min = max(0, col - int(width / 2))
         height_slip_max = min(grid_height, row + int(height / 2) + 1)
         width_slip_max = min(grid_width, col + int(width / 2) + 1)
 
-        # calculate mean color around position
-        for i in range(height_slip_min, height_slip_max):
-            for j in range(width_slip_min, width_slip_max):
-                red, green, blue = self.pixel_grid.get_grid_pixel(i, j)
-                mean_colors[0] += red
-                mean_colors[1] += green
-                mean_colors[2] += blue
+        # calculate mean color around position (including position twice)
+        region = self.__read_region(height_slip_min, width_slip_min, \
+            height_slip_max, width_slip_max)
+        mean_colors = region.sum(axis = (0, 1), dtype = np.int64) + \
+            self.__read_region(row, col, row + 1, col + 1)[0, 0]
 
         # normalize results
         height_range = height_slip_max - height_slip_min
         width_range = width_slip_max - width_slip_min
         inverted_colors = tuple(int(255 - (c / ((height_range * width_range) \
-            + 1))) for c in mean_colors)
-        
+            + 1))) for c in mean_colors.tolist())
+
         # draw square
         self.draw_square((height_slip_min, width_slip_min), (height_range, \
             width_range), inverted_colors)
-    
+
     def draw_feature_color(self, position, color, size = (30, 30)) -> None:
-        
+
          # get dimension values and position color
         row, col = position
         height, width = size
@@ -117,19 +144,168 @@ class GraphicsImage:
         self.draw_square((height_slip_min, width_slip_min), (height_range, \
             width_range), color)
 
+    def draw_features(self, positions, sizes = (30, 30), colors = None) -> None:
+        positions = np.asarray(positions, dtype = np.int64).reshape(-1, 2)
+        if len(positions) == 0: return
+        grid_height, grid_width = self.grid_dimensions
+
+        # broadcast sizes and colors to every marker
+        sizes = np.broadcast_to(np.asarray(sizes, dtype = np.int64), positions.shape)
+        if colors is not None:
+            colors = np.broadcast_to(np.asarray(colors, dtype = np.int64), \
+                positions.shape[:1] + (3,))
+            assert ((colors >= 0) & (colors < 256)).all()
+
+        # compute clipped marker regions
+        half_sizes = sizes // 2
+        mins = np.maximum(0, positions - half_sizes)
+        maxs = np.minimum((grid_height, grid_width), positions + half_sizes + 1)
+        centers = np.clip(positions, 0, (grid_height - 1, grid_width - 1))
+        areas = np.prod(maxs - mins, axis = 1)
+
+        # paint markers sharing one color at once (their order does not matter)
+        if colors is not None and (colors == colors[0]).all():
+            visible = (maxs > mins).all(axis = 1)
+            self.__fill_regions(mins[visible], maxs[visible], colors[0])
+            return
+
+        # draw markers in order with slice means and slice assignment
+        for k, ((row_min, col_min), (row_max, col_max)) in \
+            enumerate(zip(mins.tolist(), maxs.tolist())):
+            if row_max <= row_min or col_max <= col_min: continue
+            if colors is None:
+                row, col = centers[k]
+                region = self.__read_region(row_min, col_min, row_max, col_max)
+                mean_colors = region.sum(axis = (0, 1), dtype = np.int64) + \
+                    self.__read_region(row, col, row + 1, col + 1)[0, 0]
+                color = np.trunc(255 - mean_colors / (areas[k] + 1))
+            else: color = colors[k]
+            fill = np.empty((row_max - row_min, col_max - col_min, 3), dtype = np.uint8)
+            fill[:] = color
+            self.__write_region(row_min, col_min, fill)
+
     def replace_square_data(self, position, size, data) -> None:
 
         # get tuple values and assert size parameters
         row, col = position
         height, width = size
-        assert len(data) == height * width
-        
-        # replace data iteratively
-        for i in range(row, row + height):
-            for j in range(col, col + width):
-                self.draw_pixel((i, j), data[i, j])
+        grid_height, grid_width = self.grid_dimensions
+        assert data.shape[:2] == (height, width)
+        assert row + height <= grid_height and col + width <= grid_width
+
+        # replace data with single slice assignment
+        self.__write_region(row, col, data)
+
+    def get_region(self, position, size) -> np.ndarray:
+        row, col = position
+        height, width = size
+        return self.__read_region(row, col, row + height, col + width)
+
+    def get_image(self) -> Image.Image:
+
+        # compose base grid with painted tiles
+        image = np.array(self.pixel_grid.get_grid_array())
+        for (tile_row, tile_col), tile in self.tiles.items():
+            row, col = tile_row * self.tile_size, tile_col * self.tile_size
+            image[row:row + tile.shape[0], col:col + tile.shape[1]] = tile
+        return Image.fromarray(image)
+
+    def save_image(self, fp, format = None, **params) -> None:
+
+        # default unnamed file objects (e.g. BytesIO) to PNG, as PIL infers
+        # formats from file names
+        if format is None and not isinstance(fp, (str, bytes, os.PathLike)) and \
+            not hasattr(fp, 'name'): format = 'PNG'
+        self.get_image().save(fp, format = format, **params)
+
+    def get_image_bytes(self, format = 'PNG', **params) -> bytes:
+        buffer = io.BytesIO()
+        self.save_image(buffer, format = format, **params)
+        return buffer.getvalue()
 
     def output_image(self) -> None:
 
         # output image
-        self.pixel_grid.grid.show()
+        self.get_image().show()
+
+    def __read_region(self, row_min, col_min, row_max, col_max) -> np.ndarray:
+
+        # copy base grid region
+        region = np.array(self.pixel_grid.get_grid_array()[row_min:row_max, col_min:col_max])
+
+        # layer painted tiles intersecting region
+        for tile_row, tile_col, t_slice, r_slice in self.__get_tile_slices(row_min, \
+            col_min, row_max, col_max):
+            tile = self.tiles.get((tile_row, tile_col))
+            if tile is not None: region[r_slice] = tile[t_slice]
+        return region
+
+    def __write_region(self, row_min, col_min, data) -> None:
+        row_max, col_max = row_min + data.shape[0], col_min + data.shape[1]
+
+        # write data into tiles
+        for tile_row, tile_col, t_slice, r_slice in self.__get_tile_slices(row_min, \
+            col_min, row_max, col_max):
+            self.__get_tile(tile_row, tile_col)[t_slice] = data[r_slice]
+
+    def __fill_regions(self, mins, maxs, color) -> None:
+        if len(mins) == 0: return
+        size = self.tile_size
+
+        # pair every (row_min, col_min, row_max, col_max) region with each tile it overlaps
+        tile_mins, tile_maxs = mins // size, (maxs - 1) // size
+        spans = tile_maxs - tile_mins + 1
+        counts = np.prod(spans, axis = 1)
+        regions = np.repeat(np.arange(len(mins)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tiles = tile_mins[regions] + np.stack([offsets // spans[regions, 1], \
+            offsets % spans[regions, 1]], axis = 1)
+
+        # clip regions to tile-local bounds and group them by tile
+        local_mins = np.clip(mins[regions] - tiles * size, 0, size)
+        local_maxs = np.clip(maxs[regions] - tiles * size, 0, size)
+        keys, tile_index = np.unique(tiles, axis = 0, return_inverse = True)
+        order = np.argsort(tile_index.reshape(-1), kind = 'stable')
+        bounds = np.searchsorted(tile_index.reshape(-1)[order], np.arange(len(keys) + 1))
+
+        # paint each tile with one mask built from summed region corners
+        fill = np.asarray(color, dtype = np.uint8)
+        for k, (tile_row, tile_col) in enumerate(keys.tolist()):
+            group = order[bounds[k]:bounds[k + 1]]
+            (top, left), (bottom, right) = local_mins[group].T, local_maxs[group].T
+            corners = np.zeros((size + 1, size + 1), dtype = np.int32)
+            np.add.at(corners, (top, left), 1)
+            np.add.at(corners, (top, right), -1)
+            np.add.at(corners, (bottom, left), -1)
+            np.add.at(corners, (bottom, right), 1)
+            tile = self.__get_tile(tile_row, tile_col)
+            mask = corners.cumsum(axis = 0).cumsum(axis = 1)[:tile.shape[0], :tile.shape[1]] > 0
+            tile[mask] = fill
+
+    def __get_tile(self, tile_row, tile_col) -> np.ndarray:
+
+        # copy untouched tiles from base grid on first write
+        tile = self.tiles.get((tile_row, tile_col))
+        if tile is None:
+            row, col = tile_row * self.tile_size, tile_col * self.tile_size
+            tile = np.array(self.pixel_grid.get_grid_array()[row:row + self.tile_size, \
+                col:col + self.tile_size])
+            self.tiles[tile_row, tile_col] = tile
+        return tile
+
+    def __get_tile_slices(self, row_min, col_min, row_max, col_max) -> list:
+        size = self.tile_size
+        tile_slices = []
+
+        # find overlap of each tile with region
+        for tile_row in range(row_min // size, math.ceil(row_max / size)):
+            for tile_col in range(col_min // size, math.ceil(col_max / size)):
+                top, left = max(row_min, tile_row * size), max(col_min, tile_col * size)
+                bottom = min(row_max, (tile_row + 1) * size)
+                right = min(col_max, (tile_col + 1) * size)
+                t_slice = (slice(top - tile_row * size, bottom - tile_row * size), \
+                    slice(left - tile_col * size, right - tile_col * size))
+                r_slice = (slice(top - row_min, bottom - row_min), \
+                    slice(left - col_min, right - col_min))
+                tile_slices.append((tile_row, tile_col, t_slice, r_slice))
+        return tile_slices
@@ -1,30 +1,50 @@
-import imghdr
+import numpy as np
 from PIL import Image
 import pure.hash.phash as phash
+import pure.instrument as instrument
 
 class PixelGrid:
     """
     Defines the infrastructure for manually handling an 
     image as a grid of pixels. A PixelGrid object is 
     constructed from a valid image file, which is always 
-    filtered into RGB format. 
+    filtered into RGB format. Only the file header is read on
+    construction (it identifies the image type, and the file is
+    closed again so unloaded grids hold no file handles); the
+    file is decoded once on load, and every RGB and grayscale
+    view is derived from that buffer.
+    When only a small version of the image is needed (e.g. for
+    hashing), JPEG files can be decoded directly at a reduced
+    scale through DCT-domain scaling (PIL draft mode).
 
     Attributes: 
         - file_name -> str : absolute path for image file
         - file_type -> str : type of image file
-        - grid -> PIL Image : PIL object for image
+        - grid -> PIL Image : PIL object for image (built on demand
+            from 'grid_array')
+        - grid_array -> ndarray : decoded (height, width, 3) uint8 RGB
+            pixel buffer for image
+        - gs_array -> ndarray : (height, width) uint8 grayscale view of
+            'grid_array' (computed on first use)
         - loaded -> bool : flag for whether the grid has been
             loaded yet
         - height -> int : image height in number of pixels
         - width -> int : image width in number of pixels
+        - source_dimensions -> tuple : height/width dimensions of the
+            image file (before any decode-time downscaling)
 
     Methods:
-        - load_pixel_grid() -> None : loads pixel grid attribute
-            from file name attribute 
+        - load_pixel_grid(min_size) -> None : loads pixel grid attribute
+            from file name attribute, optionally decoding at the smallest
+            scale whose height and width both cover 'min_size'
         - get_grid_dimensions() -> tuple : returns the grid dimensions
             in a consistent order
         - get_grid_pixel(row, col) -> tuple : fetches RGB-tuple values 
             for pixel at coordinate (row, col)
+        - get_grid_array() -> ndarray : fetches the decoded image as a 
+            read-only (height, width, 3) uint8 array
+        - get_gs_array() -> ndarray : fetches the decoded image as a
+            read-only (height, width) uint8 grayscale array
         - print_pixel_grid() -> None : prints entire pixel grid by 
             iterating over the pixel for each row/col
         - output_image() -> None : prints pixel grid to console
@@ -34,39 +54,60 @@ class PixelGrid:
 
     def __init__(self, file_name):
         
-        # fetch correct image type
+        # read image header and fetch correct image type
         try: 
-            self.file_type = imghdr.what(file_name)
-            if self.file_type == None: raise ValueError
-        except FileNotFoundError:
+            with Image.open(file_name) as img: self.file_type = img.format.lower()
+        except (FileNotFoundError, OSError):
             raise ValueError 
 
         # load other attributes
         self.file_name = file_name
         self.loaded = False
+        self.gs_array = None
 
-    def load_pixel_grid(self) -> None:
+    def load_pixel_grid(self, min_size = None) -> None:
 
         # prevent double-loading grid
         assert self.loaded == False
         
-        # populate pixel grid attributes from PIL object
-        img = Image.open(self.file_name)
-        self.grid = img.convert('RGB')
+        # populate pixel grid buffer from image file
+        with instrument.span('pixel_grid.load'), Image.open(self.file_name) as img:
+            self.source_dimensions = (img.height, img.width)
+            if min_size is not None: img.draft('RGB', (min_size, min_size))
+            self.grid_array = np.asarray(img.convert('RGB'))
         self.loaded = True
 
         # set dimension attributes
-        self.width, self.height = self.grid.size
+        self.height, self.width = self.grid_array.shape[:2]
+        instrument.count('pixels_loaded', self.height * self.width)
+
+    @property
+    def grid(self) -> Image.Image:
+        assert self.loaded == True
+        return Image.fromarray(self.grid_array)
 
     def get_grid_dimensions(self) -> tuple:
-        self.width, self.height = self.grid.size
         return (self.height, self.width)
 
     def get_grid_pixel(self, row, col) -> tuple:
 
         # return RGB tuple
         assert self.loaded == True
-        return self.grid.getpixel((col, row))
+        return tuple(self.grid_array[row, col].tolist())
+
+    def get_grid_array(self) -> np.ndarray:
+
+        # return read-only RGB array
+        assert self.loaded == True
+        return self.grid_array
+
+    def get_gs_array(self) -> np.ndarray:
+        assert self.loaded == True
+
+        # convert RGB buffer with ITU-R 601-2 luma weights on first use
+        if self.gs_array is None:
+            self.gs_array = np.asarray(Image.fromarray(self.grid_array).convert('L'))
+        return self.gs_array
 
     def print_pixel_grid(self) -> None:
 
@@ -1,6 +1,11 @@
 import pure.imaging.graphics as graphics
 import pure.imaging.grid as grid
+import pure.imaging.pyramid as pyramid
 import pure.hash.phash as phash
+import pure.hash.region as region
+import pure.instrument as instrument
+import numpy as np
+import math
 
 class FeatureAddition:
     """
@@ -15,16 +20,19 @@ class FeatureAddition:
             on which feature is mounted
         - grid_dimensions -> tuple : height/width dimensions of 
             underlying pixel grid
-        - focal_data -> dict : pixel values for each pixel index
-            pair in focal region on original image
+        - focal_data -> ndarray : (height, width, 3) pixel values of the
+            focal region on the original image (a view when the pixel 
+            grid buffer is read-only, otherwise a compact copy)
         - focal_dimensions -> tuple : height/width dimensions of 
             focal region
+        - top_left_boundary -> tuple : row/col position of the top-left
+            corner of the focal region
         - populated -> bool : flag for whether the focal region has 
             been populated yet
         - position -> tuple : center position for feature focal region
-             in pixel grid
+             in pixel grid (set even when graphics is disabled)
         - size -> tuple : dimensionality of feature focal region in 
-            pixel grid
+            pixel grid (set even when graphics is disabled)
         - graphics -> bool : flag for whether or not the feature addition
             was drawn on the graphics image
     
@@ -34,7 +42,8 @@ class FeatureAddition:
             focal region boundaries
     """
 
-    def __init__(self, pixel_grid, title, id, graphics = True):
+    def __init__(self, pixel_grid, title, id, graphics = True, position = None, \
+        size = None):
         self.title = title
         self.id = id
         self.pixel_grid = pixel_grid
@@ -42,6 +51,10 @@ class FeatureAddition:
         self.populated = False
         self.graphics = graphics
 
+        # feature placement params
+        self.position = position
+        self.size = size
+
         # focal region data params
         self.focal_data = None
         self.focal_dimensions = None
@@ -64,16 +77,16 @@ class FeatureAddition:
         assert width % 2 == 0
 
         # populate focal region data
-        self.focal_data = {}
         height_slip_min = max(0, row - int(height / 2))
         width_slip_min = max(0, col - int(width / 2))
         height_slip_max = min(grid_height, row + int(height / 2) + 1)
         width_slip_max = min(grid_width, col + int(width / 2) + 1)
         height_range = height_slip_max - height_slip_min
         width_range = width_slip_max - width_slip_min
-        for i in range(height_slip_min, height_slip_max):
-            for j in range(width_slip_min, width_slip_max):
-                self.focal_data[i, j] = self.pixel_grid.get_grid_pixel(i, j)
+        focal_region = self.pixel_grid.get_grid_array()[height_slip_min:height_slip_max, \
+            width_slip_min:width_slip_max]
+        self.focal_data = focal_region if not focal_region.flags.writeable \
+            else focal_region.copy()
 
         # set focal region params
         self.focal_dimensions = (height_range, width_range)
@@ -84,10 +97,18 @@ class FeatureSet:
     """
     Defines the collective set of features actively applied to an
     image and the group of utilities for managing these features.
+    Features are indexed by id, and every feature with a position is
+    also bucketed into a uniform grid of square cells over the image
+    (each feature is placed in every cell its focal region overlaps),
+    so removals are O(1) and region, radius and nearest-feature
+    queries only visit the cells near the query.
 
     Attributes:
-        - feature_set -> set : the feature set containing all the 
-            current features
+        - feature_set -> dict : the feature set containing all the 
+            current features keyed by id
+        - cell_size -> int : height/width of spatial index cells
+        - cells -> dict : (cell row, cell col) -> set of ids of the
+            features whose focal region overlaps the cell
 
     Methods:
         - add_feature(feature_addition) -> None : add a feature 
@@ -95,44 +116,161 @@ class FeatureSet:
         - remove_feature(feature_id) -> FeatureAddition : remove a 
             feature from the feature set and return the removed 
             feature object
+        - get_feature(feature_id) -> FeatureAddition : fetches the
+            feature attached to the specified id
+        - query_region(position, size) -> list : fetches the features
+            whose focal region overlaps the region given by position
+            (top-left of region) and size
+        - query_radius(position, radius) -> list : fetches (feature,
+            distance) pairs for every feature centered within 'radius'
+            of position, sorted by distance
+        - nearest_feature(position, k) -> list : fetches (feature,
+            distance) pairs for the 'k' features centered nearest to
+            position, sorted by distance
         - print_feature_set() -> None : print a list of the 
             features ("id: title")
     """
     
-    def __init__(self):
-        self.feature_set = set()
+    def __init__(self, cell_size = 64):
+        self.feature_set = {}
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def __len__(self) -> int:
+        return len(self.feature_set)
+
+    def __contains__(self, feature_id) -> bool:
+        return feature_id in self.feature_set
+
+    def __iter__(self):
+        return iter(self.feature_set.values())
 
     def add_feature(self, feature_addition) -> None:
 
         # verify populated feature focal region
         assert feature_addition.populated or not feature_addition.graphics
-        assert feature_addition not in self.feature_set
-        self.feature_set.add(feature_addition)
+        assert feature_addition.id not in self.feature_set
+        self.feature_set[feature_addition.id] = feature_addition
 
-    def remove_feature(self, feature_id) -> FeatureAddition:
+        # bucket feature into spatial index
+        for cell in self.__get_feature_cells(feature_addition):
+            self.cells.setdefault(cell, set()).add(feature_addition.id)
 
-        # search for feature
-        found_feature = None
-        for feature in self.feature_set:
-            if feature.id == feature_id: 
-                found_feature = feature
-                break
+    def remove_feature(self, feature_id) -> FeatureAddition:
 
         # remove feature
-        assert found_feature != None 
-        self.feature_set.remove(found_feature)
+        assert feature_id in self.feature_set
+        found_feature = self.feature_set.pop(feature_id)
+
+        # remove feature from spatial index
+        for cell in self.__get_feature_cells(found_feature):
+            bucket = self.cells[cell]
+            bucket.discard(feature_id)
+            if not bucket: del self.cells[cell]
         return found_feature
 
+    def get_feature(self, feature_id) -> FeatureAddition:
+        return self.feature_set[feature_id]
+
+    def query_region(self, position, size) -> list:
+        row, col = position
+        height, width = size
+        if height <= 0 or width <= 0: return []
+
+        # collect candidates from overlapped cells
+        candidates = self.__get_cell_candidates(row, col, row + height - 1, \
+            col + width - 1)
+
+        # keep features whose focal region overlaps the query region
+        found_features = []
+        for feature_id in candidates:
+            feature = self.feature_set[feature_id]
+            top, left, bottom, right = _get_feature_bounds(feature)
+            if top < row + height and bottom >= row and left < col + width \
+                and right >= col: found_features.append(feature)
+        return found_features
+
+    def query_radius(self, position, radius) -> list:
+        row, col = position
+
+        # collect candidates from cells covering the query circle
+        candidates = self.__get_cell_candidates(math.floor(row - radius), \
+            math.floor(col - radius), math.ceil(row + radius), math.ceil(col + radius))
+
+        # keep features centered within radius
+        matches = []
+        for feature_id in candidates:
+            feature = self.feature_set[feature_id]
+            dist = math.hypot(feature.position[0] - row, feature.position[1] - col)
+            if dist <= radius: matches.append((feature, dist))
+        return sorted(matches, key = lambda match: match[1])
+
+    def nearest_feature(self, position, k = 1) -> list:
+        row, col = position
+        if not self.cells or k <= 0: return []
+        size = self.cell_size
+        center_row, center_col = int(row // size), int(col // size)
+
+        # get ring bound covering every occupied cell
+        cell_rows = [cell[0] for cell in self.cells]
+        cell_cols = [cell[1] for cell in self.cells]
+        max_ring = max(abs(center_row - min(cell_rows)), abs(center_row - max(cell_rows)), \
+            abs(center_col - min(cell_cols)), abs(center_col - max(cell_cols)))
+
+        # search square rings of cells outward from the query cell
+        seen, matches = set(), []
+        for ring in range(max_ring + 1):
+            for cell in _get_ring_cells(center_row, center_col, ring):
+                for feature_id in self.cells.get(cell, ()):
+                    if feature_id in seen: continue
+                    seen.add(feature_id)
+                    feature = self.feature_set[feature_id]
+                    matches.append((feature, math.hypot(feature.position[0] - row, \
+                        feature.position[1] - col)))
+
+            # stop once unvisited rings cannot hold a nearer feature
+            if len(matches) >= k:
+                matches.sort(key = lambda match: match[1])
+                del matches[k:]
+                if matches[-1][1] <= ring * size: break
+        return sorted(matches, key = lambda match: match[1])[:k]
+
     def print_feature_set(self) -> None:
-        for feature in self.feature_set:
+        for feature in self.feature_set.values():
             print("{}: {}".format(feature.id, feature.title))
 
+    def __get_feature_cells(self, feature) -> list:
+        if feature.position is None: return []
+        top, left, bottom, right = _get_feature_bounds(feature)
+        size = self.cell_size
+        return [(cell_row, cell_col) for cell_row in range(top // size, bottom // size + 1) \
+            for cell_col in range(left // size, right // size + 1)]
+
+    def __get_cell_candidates(self, top, left, bottom, right) -> set:
+        size = self.cell_size
+        candidates = set()
+
+        # visit occupied cells overlapping the bounds
+        for cell_row in range(int(top // size), int(bottom // size) + 1):
+            for cell_col in range(int(left // size), int(right // size) + 1):
+                bucket = self.cells.get((cell_row, cell_col))
+                if bucket: candidates.update(bucket)
+        return candidates
+
 class PImage:
     """
     Encapsulating imaging class that ties in grapics, pixel grids,
     and features additions/sets. A PImage object is constructed 
     from a valid image file, which is immediately converted to a 
-    pixel grid.
+    pixel grid. The graphics image is only created once a feature
+    is drawn or the image is output, and a PImage constructed with
+    'graphics' disabled (e.g. for hash-only or extraction-only runs)
+    never creates one. A PImage constructed in 'hash_only' mode also
+    skips graphics, and decodes JPEG files at the smallest scale that
+    still covers 4x the largest hash reduction size, so its pixel grid
+    may be smaller than the image file (hashes of such a decode can
+    differ by a bit from full-resolution ones, so hashes meant to be
+    compared should all come from the same decode mode).
 
     Attributes:
         - file_name -> String : absolute file path for specified  
@@ -141,41 +279,92 @@ class PImage:
         - id -> String : pimage id
         - pixel_grid -> PixelGrid : PixelGrid object associated with
             image file given by file_name
+        - graphics -> bool : flag for whether the pimage supports
+            graphics (feature drawing and image output)
         - gimage -> GraphicsImage : graphics image attached to pimage 
-            object based on image pixel grid
+            object based on image pixel grid (created lazily)
         - feature_set -> FeatureSet : collection of features associated
             with pimage and drawn onto graphics image
+        - pyramid -> ImagePyramid : shared multi-scale pyramid over the
+            decoded buffer (created lazily)
+        - region_hasher -> RegionHasher : summed-area table region hash
+            engine over the decoded buffer (created lazily)
     
     Methods:
         - add_feature(title, id, position, size, color, verbose) ->
             None : adds a feature to the pimage feature set and
             populates the graphics image with new feature parameters
+        - add_features(titles, ids, positions, size, color) -> None :
+            adds a batch of features to the pimage feature set and draws
+            all of their markers in a single pass
         - remove_feature(id) -> None : removes the feature in the 
             pimage feature set attached to the specified id
         - output_image() -> None : outputs the graphics image attached
             to the pimage
-        - get_var_grid() -> VariableGrid : converts the PImage pixel grid
+        - save_image(fp, format) -> None : writes the graphics image to
+            a file path or file object (e.g. for headless servers)
+        - get_image_bytes(format) -> bytes : encodes the graphics image
+            into an in-memory buffer (e.g. PNG or JPEG)
+        - get_var_grid(scale_ceil) -> VariableGrid : converts the PImage
+            pixel grid (or the pyramid level fitting within 'scale_ceil')
             to a variable grid
+        - hash_feature_regions(kinds, packed) -> dict : computes the
+            hashes of every feature focal region in one batch, keyed by
+            feature id
+        - get_rgb_array() -> ndarray : fetches the decoded (height, width, 3)
+            uint8 RGB buffer shared by all image consumers
+        - get_gs_array() -> ndarray : fetches the (height, width) uint8
+            grayscale view of the decoded buffer
     """
     
-    def __init__(self, file_name, title, id):
+    def __init__(self, file_name, title, id, graphics = True, hash_only = False):
         self.title = title
         self.id = id
 
-        # load pixel grid (first copy)
+        # load pixel grid (at reduced scale for hashing only)
         self.file_name = file_name
         self.pixel_grid = grid.PixelGrid(file_name)
-        self.pixel_grid.load_pixel_grid()
+        self.pixel_grid.load_pixel_grid(HASH_LOAD_SIZE if hash_only else None)
 
-        # add graphics/features data (second copy)
-        self.gimage = graphics.GraphicsImage(self.pixel_grid)
+        # add graphics/features data
+        self.graphics = graphics and not hash_only
+        self.__gimage = None
+        self.__pyramid = None
+        self.__region_hasher = None
         self.feature_set = FeatureSet()
 
+    @property
+    def gimage(self) -> graphics.GraphicsImage:
+        assert self.graphics == True
+
+        # create copy-on-write graphics image on first use
+        if self.__gimage is None:
+            self.__gimage = graphics.GraphicsImage(self.pixel_grid)
+        return self.__gimage
+
+    @property
+    def pyramid(self) -> pyramid.ImagePyramid:
+
+        # create shared image pyramid on first use
+        if self.__pyramid is None:
+            self.__pyramid = pyramid.ImagePyramid(self.pixel_grid)
+        return self.__pyramid
+
+    @property
+    def region_hasher(self) -> region.RegionHasher:
+
+        # create region hash engine (and its integral image) on first use
+        if self.__region_hasher is None:
+            self.__region_hasher = region.RegionHasher(self.pixel_grid)
+        return self.__region_hasher
+
     def add_feature(self, title, id, position, size = (30, 30), \
         color = None, verbose = False, graphics = True):
 
         # assert image exists and create feature
-        feature = FeatureAddition(self.pixel_grid, title, id, graphics = graphics)
+        graphics = graphics and self.graphics
+        feature = FeatureAddition(self.pixel_grid, title, id, graphics = graphics, \
+            position = position, size = size)
 
         # add feature and draw graphics
         if graphics:
@@ -184,26 +373,97 @@ class PImage:
                 self.gimage.draw_feature_color(position, color, size)
             else: self.gimage.draw_feature_invert(position, size)
         self.feature_set.add_feature(feature)
+        instrument.count('features_added')
         
         # print success message
         if verbose == True:
             self.feature_set.print_feature_set()
 
+    def add_features(self, titles, ids, positions, size = (30, 30), \
+        color = None, verbose = False, graphics = True):
+
+        # assert image exists and create features
+        assert len(titles) == len(ids) == len(positions)
+        graphics = graphics and self.graphics
+        features = [FeatureAddition(self.pixel_grid, title, id, graphics = graphics, \
+            position = tuple(position), size = size) for title, id, position in \
+            zip(titles, ids, positions)]
+
+        # add features and draw graphics in one pass
+        with instrument.span('pimage.add_features', graphics = graphics):
+            if graphics:
+                for feature, position in zip(features, positions):
+                    feature.populate_focal_region(position, size)
+                self.gimage.draw_features(positions, size, color)
+            for feature in features:
+                self.feature_set.add_feature(feature)
+        instrument.count('features_added', len(features))
+
+        # print success message
+        if verbose == True:
+            self.feature_set.print_feature_set()
+
     def remove_feature(self, id, verbose = False):
 
         # remove feature from feature set and gimage
         feature = self.feature_set.remove_feature(id)
         if feature.graphics:
-            self.gimage.replace_square_data(feature.position, feature.size, \
-                feature.focal_data)
+            self.gimage.replace_square_data(feature.top_left_boundary, \
+                feature.focal_dimensions, feature.focal_data)
+        instrument.count('features_removed')
 
         # print success message
         if verbose == True:
             self.feature_set.print_feature_set()
 
     def output_image(self) -> None:
-        print("Outputting image...")
-        self.gimage.output_image()
+        with instrument.span('pimage.output_image'):
+            self.gimage.output_image()
+
+    def save_image(self, fp, format = None, **params) -> None:
+        self.gimage.save_image(fp, format = format, **params)
+
+    def get_image_bytes(self, format = 'PNG', **params) -> bytes:
+        return self.gimage.get_image_bytes(format = format, **params)
+
+    def get_var_grid(self, scale_ceil = None) -> phash.VariableGrid:
+        return self.pyramid.get_level(scale_ceil).get_var_grid()
+
+    def hash_feature_regions(self, kinds = ('gs', 'dct'), packed = False) -> dict:
+        return self.region_hasher.hash_feature_set(self.feature_set, kinds, packed)
+
+    def get_rgb_array(self) -> np.ndarray:
+        return self.pixel_grid.get_grid_array()
+
+    def get_gs_array(self) -> np.ndarray:
+        return self.pixel_grid.get_gs_array()
+
+"""
+Utility function for fetching the inclusive (top, left, bottom,
+right) pixel bounds of a feature focal region from its center
+position and size.
+"""
+def _get_feature_bounds(feature) -> tuple:
+    row, col = feature.position
+    height, width = feature.size
+    return (int(row) - height // 2, int(col) - width // 2, int(row) + height // 2, \
+        int(col) + width // 2)
+
+"""
+Utility function for fetching the cells on the border of the
+square ring at Chebyshev distance 'ring' from a center cell.
+"""
+def _get_ring_cells(center_row, center_col, ring) -> list:
+    if ring == 0: return [(center_row, center_col)]
+    cells = []
+    for offset in range(-ring, ring + 1):
+        cells.append((center_row - ring, center_col + offset))
+        cells.append((center_row + ring, center_col + offset))
+    for offset in range(-ring + 1, ring):
+        cells.append((center_row + offset, center_col - ring))
+        cells.append((center_row + offset, center_col + ring))
+    return cells
 
-    def get_var_grid(self) -> phash.VariableGrid:
-        return self.pixel_grid.get_var_grid()
\ No newline at end of file
+# minimum decoded size for hashing (4x the largest default reduction size, as
+# decoding just large enough to cover the reduction size aliases the hashes)
+HASH_LOAD_SIZE = 4 * 32
@@ -0,0 +1,145 @@
+import pure.hash.phash as phash
+import numpy as np
+import cv2, math, threading
+
+class PyramidLevel:
+    """
+    Defines a single level of an image pyramid: the grayscale image
+    resized so neither dimension exceeds 'scale_ceil' (keeping the
+    aspect ratio), and the scale ratios that map level coordinates
+    back to the pixel grid. The grayscale, float32 and RGB versions of
+    the level are only computed on first use, so a level only used for
+    its dimensions or one version costs no other resizes.
+
+    Attributes:
+        - pixel_grid -> PixelGrid : underlying pixel grid
+        - scale_ceil -> int : maximum level dimension (None for the
+            full-resolution level)
+        - dimensions -> tuple : height/width dimensions of the level
+        - vert_scale -> float : pixel grid height / level height
+        - horiz_scale -> float : pixel grid width / level width
+        - img_gs -> ndarray : (height, width) uint8 grayscale level
+        - img_np -> ndarray : (height, width) float32 grayscale level
+        - img_rgb -> ndarray : (height, width, 3) uint8 RGB level
+
+    Methods:
+        - to_grid_positions(features) -> ndarray : maps (N, 2) row/col
+            level positions to rounded pixel grid positions
+        - get_var_grid() -> VariableGrid : converts the RGB level to a
+            variable grid
+    """
+
+    def __init__(self, pixel_grid, scale_ceil = None):
+        self.pixel_grid = pixel_grid
+        self.scale_ceil = scale_ceil
+        self.__img_gs = None
+        self.__img_np = None
+        self.__img_rgb = None
+
+        # get level dimensions and scale ratios
+        height, width = pixel_grid.get_grid_dimensions()
+        n_height, n_width = get_level_dimensions((height, width), scale_ceil)
+        self.dimensions = (n_height, n_width)
+        self.vert_scale = height / n_height
+        self.horiz_scale = width / n_width
+
+    @property
+    def img_gs(self) -> np.ndarray:
+
+        # resize grayscale buffer (full-resolution levels share it)
+        if self.__img_gs is None:
+            img = self.pixel_grid.get_gs_array()
+            n_height, n_width = self.dimensions
+            self.__img_gs = img if img.shape == self.dimensions else \
+                cv2.resize(img, (n_width, n_height))
+        return self.__img_gs
+
+    @property
+    def img_np(self) -> np.ndarray:
+        if self.__img_np is None: self.__img_np = np.float32(self.img_gs)
+        return self.__img_np
+
+    @property
+    def img_rgb(self) -> np.ndarray:
+        if self.__img_rgb is None:
+            img = self.pixel_grid.get_grid_array()
+            n_height, n_width = self.dimensions
+            self.__img_rgb = img if img.shape[:2] == self.dimensions else \
+                cv2.resize(img, (n_width, n_height), interpolation = cv2.INTER_AREA)
+        return self.__img_rgb
+
+    def to_grid_positions(self, features) -> np.ndarray:
+        scales = np.array([self.vert_scale, self.horiz_scale])
+        positions = np.asarray(features, dtype = float).reshape(-1, 2) * scales
+        return np.rint(positions).astype(int)
+
+    def get_var_grid(self) -> phash.VariableGrid:
+        return phash.VariableGrid.from_array(self.img_rgb)
+
+class ImagePyramid:
+    """
+    Defines a lazily-evaluated, shared multi-scale pyramid over the
+    decoded buffer of a pixel grid. Levels are keyed by their maximum
+    dimension and computed from the full-resolution buffer the first
+    time any consumer asks for them, so detectors, hashes and graphics
+    working at the same scale share one resized image. Level creation
+    is locked, so the pyramid can be shared between threads.
+
+    Attributes:
+        - pixel_grid -> PixelGrid : underlying pixel grid
+        - levels -> dict : scale_ceil -> PyramidLevel cache
+
+    Methods:
+        - get_level(scale_ceil) -> PyramidLevel : fetches (creating on
+            first use) the level whose dimensions fit within 'scale_ceil'
+            (the full-resolution level when None)
+        - get_octaves(num_octaves, min_size) -> list : fetches the
+            full-resolution level followed by successive half-size
+            levels down to 'min_size'
+    """
+
+    def __init__(self, pixel_grid):
+        assert pixel_grid.loaded == True
+        self.pixel_grid = pixel_grid
+        self.levels = {}
+        self.__lock = threading.Lock()
+
+    def get_level(self, scale_ceil = None) -> PyramidLevel:
+
+        # map oversized ceilings to the full-resolution level
+        if scale_ceil is not None and scale_ceil >= max(self.pixel_grid.get_grid_dimensions()):
+            scale_ceil = None
+
+        # create level on first use
+        level = self.levels.get(scale_ceil)
+        if level is None:
+            with self.__lock:
+                level = self.levels.get(scale_ceil)
+                if level is None:
+                    level = PyramidLevel(self.pixel_grid, scale_ceil)
+                    self.levels[scale_ceil] = level
+        return level
+
+    def get_octaves(self, num_octaves = None, min_size = 32) -> list:
+        max_size = max(self.pixel_grid.get_grid_dimensions())
+        octaves = [self.get_level()]
+
+        # halve level size until the octave or size limit
+        size = max_size // 2
+        while size >= min_size and (num_octaves is None or len(octaves) < num_octaves):
+            octaves.append(self.get_level(size))
+            size //= 2
+        return octaves
+
+"""
+Utility function for fetching the height/width dimensions of an
+image resized so neither dimension exceeds 'scale_ceil' (unchanged
+when it already fits or when 'scale_ceil' is None).
+"""
+def get_level_dimensions(dimensions, scale_ceil = None) -> tuple:
+    height, width = dimensions
+    if scale_ceil is None or (width <= scale_ceil and height <= scale_ceil):
+        return (height, width)
+    elif width > height:
+        return (math.floor(height * (scale_ceil / width)), scale_ceil)
+    return (scale_ceil, math.floor(width * (scale_ceil / height)))
@@ -0,0 +1,194 @@
+import pure.insight.merge as merge
+import numpy as np
+import warnings
+from sklearn.cluster import MiniBatchKMeans
+from pyclustering.cluster.xmeans import xmeans
+from pyclustering.cluster.center_initializer import kmeans_plusplus_initializer
+
+# pyclustering (<= 0.10.1.2) still calls numpy.warnings, removed in NumPy 2
+if not hasattr(np, 'warnings'): np.warnings = warnings
+
+class ClusterBackend:
+    """
+    Defines the interface shared by the keypoint clustering backends
+    used by FeatureExtractor. A backend takes (N, 2) row/col keypoints
+    and returns the (K, 2) cluster centers and the cluster label of
+    every keypoint (-1 for keypoints left out of every cluster).
+    Every backend is seeded, so the same keypoints always give the
+    same centers.
+
+    Attributes:
+        - seed -> int : random seed for every randomized step
+
+    Methods:
+        - cluster(points) -> (ndarray, ndarray) : clusters the points
+            and returns their centers and labels
+        - get_params() -> dict : fetches the backend name and every
+            parameter its results depend on (e.g. for cache keys)
+    """
+
+    def __init__(self, seed = 0):
+        self.seed = seed
+
+    def cluster(self, points) -> (np.ndarray, np.ndarray):
+        raise NotImplementedError
+
+    def get_params(self) -> dict:
+        return dict(vars(self), name = type(self).__name__)
+
+class XMeansBackend(ClusterBackend):
+    """
+    Defines the xmeans clustering backend, which starts from seeded
+    k-means++ centers and splits clusters by the Bayesian information
+    criterion up to a maximum number of centers.
+
+    Attributes:
+        - num_init_centers -> int : number of initial k-means++ centers
+        - max_centers -> int : maximum number of centers after splitting
+        - ccore -> bool : flag for whether to use the pyclustering C core
+            (off by default, as some builds of the 0.10.1.2 C core are
+            killed by SIGFPE even on small inputs)
+
+    Methods:
+        - cluster(points) -> (ndarray, ndarray) : clusters the points
+            and returns their centers and labels
+    """
+
+    def __init__(self, num_init_centers = 10, max_centers = 30, ccore = False, seed = 0):
+        super().__init__(seed)
+        self.num_init_centers = num_init_centers
+        self.max_centers = max_centers
+        self.ccore = ccore
+
+    def cluster(self, points) -> (np.ndarray, np.ndarray):
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        if len(points) == 0: return _get_empty_clusters()
+
+        # run seeded xmeans algorithm
+        data = points.tolist()
+        initial_centers = kmeans_plusplus_initializer(data, min(self.num_init_centers, \
+            len(data)), random_state = self.seed).initialize()
+        algo = xmeans(data, initial_centers = initial_centers, kmax = self.max_centers, \
+            ccore = self.ccore, random_state = self.seed)
+        algo.process()
+
+        # label points by cluster
+        labels = np.full(len(points), -1, dtype = np.int64)
+        for label, cluster in enumerate(algo.get_clusters()):
+            labels[cluster] = label
+        return np.array(algo.get_centers(), dtype = float).reshape(-1, 2), labels
+
+class MiniBatchKMeansBackend(ClusterBackend):
+    """
+    Defines the mini-batch k-means clustering backend for very large
+    keypoint sets, which updates the centers from fixed-size random
+    batches instead of every point on every iteration.
+
+    Attributes:
+        - n_clusters -> int : number of cluster centers
+        - batch_size -> int : number of points per mini-batch
+        - n_init -> int : number of seeded initializations (the best
+            one is kept)
+
+    Methods:
+        - cluster(points) -> (ndarray, ndarray) : clusters the points
+            and returns their centers and labels
+    """
+
+    def __init__(self, n_clusters = 30, batch_size = 1024, n_init = 3, seed = 0):
+        super().__init__(seed)
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.n_init = n_init
+
+    def cluster(self, points) -> (np.ndarray, np.ndarray):
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        if len(points) == 0: return _get_empty_clusters()
+
+        # run seeded mini-batch k-means algorithm
+        kmeans = MiniBatchKMeans(n_clusters = min(self.n_clusters, len(points)), \
+            batch_size = self.batch_size, n_init = self.n_init, random_state = self.seed)
+        labels = kmeans.fit_predict(points)
+        return kmeans.cluster_centers_.astype(float), labels.astype(np.int64)
+
+class GridDensityBackend(ClusterBackend):
+    """
+    Defines the grid-density clustering backend, which buckets points
+    into square cells, keeps the cells holding at least 'min_points'
+    points, and joins dense cells touching each other (including
+    diagonally) into clusters. It runs in linear time and has no
+    randomized steps; points in sparse cells are left unlabeled.
+
+    Attributes:
+        - cell_size -> float : height/width of grid cells
+        - min_points -> int : minimum number of points in a dense cell
+
+    Methods:
+        - cluster(points) -> (ndarray, ndarray) : clusters the points
+            and returns their centers and labels
+    """
+
+    def __init__(self, cell_size = 20, min_points = 2, seed = 0):
+        super().__init__(seed)
+        self.cell_size = cell_size
+        self.min_points = min_points
+
+    def cluster(self, points) -> (np.ndarray, np.ndarray):
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        if len(points) == 0: return _get_empty_clusters()
+
+        # bucket points into cells and find dense cells
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        cell_keys, cell_index, counts = np.unique(cells, axis = 0, \
+            return_inverse = True, return_counts = True)
+        cell_index = cell_index.reshape(-1)
+        dense = np.nonzero(counts >= self.min_points)[0]
+        lookup = {key: i for i, key in enumerate(map(tuple, cell_keys[dense].tolist()))}
+
+        # join touching dense cells
+        union_find = merge.UnionFind(len(dense))
+        for i, (row, col) in enumerate(cell_keys[dense].tolist()):
+            for d_row, d_col in _forward_neighbours:
+                j = lookup.get((row + d_row, col + d_col))
+                if j is not None: union_find.union(i, j)
+
+        # label points by dense cell cluster
+        dense_labels = np.full(len(cell_keys), -1, dtype = np.int64)
+        dense_labels[dense] = union_find.get_labels()
+        labels = dense_labels[cell_index]
+        return _get_cluster_means(points, labels), labels
+
+"""
+Utility function for fetching a clustering backend by registered
+name (e.g. 'xmeans', 'minibatch_kmeans', 'grid_density') built with
+the given parameters. Backend objects are passed through unchanged.
+"""
+def get_backend(backend, **params) -> ClusterBackend:
+    if isinstance(backend, ClusterBackend): return backend
+    return _backends[backend](**params)
+
+"""
+Utility function for computing the mean of every labeled cluster
+of points (unlabeled points are ignored).
+"""
+def _get_cluster_means(points, labels) -> np.ndarray:
+    labeled = labels >= 0
+    num_clusters = int(labels.max()) + 1 if labeled.any() else 0
+    counts = np.bincount(labels[labeled], minlength = num_clusters)
+    sums = np.stack([np.bincount(labels[labeled], weights = points[labeled, axis], \
+        minlength = num_clusters) for axis in range(2)], axis = 1)
+    return sums / np.maximum(counts, 1)[:, np.newaxis]
+
+"""
+Utility function for fetching the centers and labels of an empty
+set of points.
+"""
+def _get_empty_clusters() -> (np.ndarray, np.ndarray):
+    return np.empty((0, 2)), np.empty(0, dtype = np.int64)
+
+_backends = {
+    'xmeans': XMeansBackend,
+    'minibatch_kmeans': MiniBatchKMeansBackend,
+    'grid_density': GridDensityBackend
+}
+_forward_neighbours = [(0, 1), (1, -1), (1, 0), (1, 1)]
@@ -0,0 +1,149 @@
+import pure.insight.feature as feature
+import pure.hash.packed as packed
+import numpy as np
+
+class FocalComparator:
+    """
+    Defines a comparison interface for matching the keypoint focal
+    regions of two pimage objects by their binary ORB descriptors.
+    Descriptors are kept as (N, 32) uint8 arrays, packed into uint64
+    words, and matched by Hamming distance with a vectorized popcount,
+    a nearest/second-nearest ratio test and an optional cross-check.
+    Keypoints and descriptors are extracted once per pimage id and
+    cached, so one pimage can be compared against many others cheaply.
+
+    Attributes:
+        - ratio -> float : maximum ratio between the nearest and
+            second-nearest descriptor distances for a match (Lowe's
+            ratio test, disabled when None)
+        - cross_check -> bool : flag for whether matches must also be
+            nearest in the reverse direction
+        - max_distance -> int : maximum Hamming distance for a match
+            (unbounded when None)
+        - vector_size -> int : maximum number of ORB keypoints kept
+            per pimage
+        - scale_ceil -> int : maximum dimension of the resized image
+            the keypoints are extracted from
+        - descriptors -> dict : pimage id -> (keypoints, descriptors)
+            cache of extracted pimage keypoints
+
+    Methods:
+        - get_descriptors(pimage) -> (ndarray, ndarray) : fetches the
+            (N, 2) row/col keypoints (in pimage coordinates) and (N, 32)
+            uint8 descriptors for a pimage
+        - match(pimage_a, pimage_b) -> ndarray : matches the keypoints
+            of two pimages as (M, 3) rows of (index a, index b, distance)
+        - match_positions(pimage_a, pimage_b) -> list : matches the
+            keypoints of two pimages as ((row, col), (row, col), distance)
+            tuples in pimage coordinates
+        - similarity(pimage_a, pimage_b) -> float : fraction of the
+            smaller keypoint set that found a match
+        - clear() -> None : empties the descriptor cache
+    """
+
+    def __init__(self, ratio = 0.75, cross_check = False, max_distance = None, \
+        vector_size = 200, scale_ceil = 500):
+        self.ratio = ratio
+        self.cross_check = cross_check
+        self.max_distance = max_distance
+        self.vector_size = vector_size
+        self.scale_ceil = scale_ceil
+        self.descriptors = {}
+
+    def get_descriptors(self, pimage) -> (np.ndarray, np.ndarray):
+
+        # fetch cached keypoints
+        if pimage.id in self.descriptors: return self.descriptors[pimage.id]
+
+        # extract ORB keypoints and descriptors on the shared resized pyramid level
+        level = pimage.pyramid.get_level(self.scale_ceil)
+        kps, dsc = feature.FEAlgorithms.get_ORB_keypoint(level.img_gs, \
+            vector_size = self.vector_size)
+
+        # scale keypoint positions back to pimage coordinates
+        self.descriptors[pimage.id] = (level.to_grid_positions(kps), dsc)
+        return self.descriptors[pimage.id]
+
+    def match(self, pimage_a, pimage_b) -> np.ndarray:
+        _, dsc_a = self.get_descriptors(pimage_a)
+        _, dsc_b = self.get_descriptors(pimage_b)
+        return match_descriptors(dsc_a, dsc_b, ratio = self.ratio, \
+            cross_check = self.cross_check, max_distance = self.max_distance)
+
+    def match_positions(self, pimage_a, pimage_b) -> list:
+        positions_a, _ = self.get_descriptors(pimage_a)
+        positions_b, _ = self.get_descriptors(pimage_b)
+        matches = self.match(pimage_a, pimage_b)
+        positions_a, positions_b = positions_a.tolist(), positions_b.tolist()
+        return [(tuple(positions_a[a]), tuple(positions_b[b]), dist) \
+            for a, b, dist in matches.tolist()]
+
+    def similarity(self, pimage_a, pimage_b) -> float:
+        _, dsc_a = self.get_descriptors(pimage_a)
+        _, dsc_b = self.get_descriptors(pimage_b)
+        if len(dsc_a) == 0 or len(dsc_b) == 0: return 0.0
+        return len(self.match(pimage_a, pimage_b)) / min(len(dsc_a), len(dsc_b))
+
+    def clear(self) -> None:
+        self.descriptors = {}
+
+"""
+Utility function for packing (N, nbytes) uint8 binary descriptors
+into (N, ceil(nbytes / 8)) uint64 words for popcount distances.
+"""
+def pack_descriptors(dsc) -> np.ndarray:
+    dsc = np.asarray(dsc, dtype = np.uint8)
+    dsc = dsc.reshape(len(dsc), -1)
+
+    # pad rows to whole words
+    padding = (-dsc.shape[1]) % 8
+    if padding: dsc = np.pad(dsc, [(0, 0), (0, padding)])
+    return np.ascontiguousarray(dsc).view(np.uint64)
+
+"""
+Utility function for computing the (N, M) matrix of Hamming
+distances between two sets of binary descriptors. Distances are
+accumulated one descriptor word at a time, so memory stays at a
+single (N, M) array for large descriptor sets.
+"""
+def get_distance_matrix(dsc_a, dsc_b) -> np.ndarray:
+    words_a, words_b = pack_descriptors(dsc_a), pack_descriptors(dsc_b)
+    dists = np.zeros((len(words_a), len(words_b)), dtype = np.uint16)
+
+    # xor and popcount each word of every row against every column
+    for word in range(words_a.shape[1]):
+        dists += packed.popcount(np.bitwise_xor.outer(words_a[:, word], words_b[:, word]))
+    return dists
+
+"""
+Utility function for matching two sets of binary descriptors by
+Hamming distance. Each descriptor in 'dsc_a' is matched to its
+nearest descriptor in 'dsc_b', and the match is kept when it
+passes the ratio test against the second-nearest distance, the
+optional cross-check (nearest in both directions) and the optional
+distance bound. Returns (M, 3) int64 rows of (index a, index b,
+distance) sorted by distance.
+"""
+def match_descriptors(dsc_a, dsc_b, ratio = 0.75, cross_check = False, \
+    max_distance = None) -> np.ndarray:
+    if len(dsc_a) == 0 or len(dsc_b) == 0: return np.empty((0, 3), dtype = np.int64)
+    dists = get_distance_matrix(dsc_a, dsc_b)
+
+    # find nearest descriptor for every row
+    rows = np.arange(len(dists))
+    nearest = dists.argmin(axis = 1)
+    best = dists[rows, nearest]
+    keep = np.ones(len(dists), dtype = bool)
+
+    # apply ratio test against second-nearest distance
+    if ratio is not None and dists.shape[1] > 1:
+        second = np.partition(dists, 1, axis = 1)[:, 1]
+        keep &= best < ratio * second
+
+    # apply cross-check and distance bound
+    if cross_check: keep &= dists.argmin(axis = 0)[nearest] == rows
+    if max_distance is not None: keep &= best <= max_distance
+
+    # sort matches by distance
+    matches = np.stack([rows[keep], nearest[keep], best[keep].astype(np.int64)], axis = 1)
+    return matches[np.argsort(matches[:, 2], kind = 'stable')]
@@ -1,15 +1,11 @@
 import pure.imaging.pimage as pimage
+import pure.insight.merge as merge
+import pure.insight.cluster as cluster
+import pure.instrument as instrument
 import numpy as np
-import math, uuid, os, random, itertools
-from sklearn.cluster import AgglomerativeClustering
-from sklearn.cluster import KMeans
-from pyclustering.cluster.xmeans import xmeans
-from pyclustering.cluster.center_initializer import kmeans_plusplus_initializer
-import cv2 
-import scipy
-from scipy.misc import imread
-import _pickle as pickle
-import matplotlib.pyplot as plt
+import uuid, threading, functools, os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
 
 class FeatureExtractor:
     """
@@ -23,81 +19,120 @@ class FeatureExtractor:
             to be processed
         - num_features -> int : the number of features to be removed 
             from the image
-        - img -> NPArray : grayscale CV2Image object loaded through 
-            the cv2 imaging library converted to a numpy matrix/array
-        - img_gs -> CV2Image : grayscale CV2Image object loaded through 
-            the cv2 imaging library
-        - img_np -> npMatrix : numpy matrix of the 'img' attribute defined
-            above
+        - scale_ceil -> int : maximum dimension of the pre-processed image
+        - vector_size -> int : number of strongest ORB keypoints kept by
+            the tuned feature extraction
+        - level -> PyramidLevel : pimage pyramid level (fitting within
+            'scale_ceil') the default features are extracted from
+        - img_gs -> CV2Image : resized uint8 grayscale image of 'level'
+        - img_np -> npMatrix : float32 numpy matrix of the 'img_gs' attribute
+            defined above
         - vert_scale -> float : vertical scale change when resizing input
             image in pre-processing
         - horiz_scale -> float : horizontal scale change when resizing input
             image in pre-processing
+        - backend -> ClusterBackend : seeded clustering backend used to
+            aggregate extracted keypoints (see pure.insight.cluster)
+        - centroids -> list : (row, col) cluster centroids found by the last
+            'execute_feature_extraction_pipeline' run
 
     Methods:
+        - get_params() -> dict : fetches every parameter the pipeline
+            results depend on (e.g. for cache keys)
         - print_added_features() -> None : outputs the pimage with the 
             added feature markings
+        - save_added_features(fp, format) -> None : writes the pimage with
+            the added feature markings to a file path or file object
         - add_list_features() -> None : adds features associated with the
-            pre-processed 'img_gs' and 'img_np' given by the 'features' 
-            parameters and annotated by the 'group_name' parameter
-        - execute_feature_extraction_pipeline(graphics, ncentroids) -> list : 
-            run parameterized feature extraction tuned for best results with 
-            optional graphics and cluster centroids with kmeans for best results
+            pre-processed 'img_gs' and 'img_np' (or with any other pyramid
+            'level') given by the 'features' parameters and annotated by 
+            the 'group_name' parameter
+        - execute_feature_extraction_pipeline(graphics, ncentroids, output, 
+            detectors, format) -> list : run parameterized feature extraction
+            tuned for best results (or fused extraction with 'detectors') with
+            optional graphics (shown, or written to 'output' in 'format' if
+            given) and cluster centroids with the clustering backend for best
+            results (kept in 'centroids')
+        - execute_fused_feature_extraction(detectors, weights, radius, min_score,
+            workers, graphics, output, format) -> list : run several detectors at the
+            same time on a thread pool and return their spatially merged
+            (row, col, score) features in pre-processed image coordinates
+        - execute_tiled_feature_extraction(detector, tile_size, overlap, workers,
+            seam_radius, graphics, output, format) -> list : run a detector over
+            overlapping tiles of the full-resolution grayscale image on a
+            thread pool and return the merged features in pimage coordinates
+
+    Static Methods:
+        - get_pipeline_params(scale_ceil, backend, vector_size, **backend_params)
+            -> dict : fetches the parameters 'get_params' returns for an
+            extractor built with the same arguments, without loading an image
     """
 
-    def __init__(self, pimage, num_features = 30, scale_ceil = 500):
+    def __init__(self, pimage, num_features = 30, scale_ceil = 500, backend = 'xmeans', \
+        vector_size = 250, **backend_params):
 
         # store relevant parameters
         self.file_name = pimage.file_name
         self.pimage = pimage
         self.num_features = num_features
+        self.scale_ceil = scale_ceil
+        self.vector_size = vector_size
+        self.backend = cluster.get_backend(backend, **backend_params)
+        self.centroids = []
 
-        # load image
-        img = cv2.imread(self.file_name)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # re-scale image for processing
-        height, width = img.shape
-        if width <= scale_ceil and height <= scale_ceil:
-            n_width = width
-            n_height = height
-        elif width > height:
-            n_width = scale_ceil
-            n_height = math.floor(height * (n_width / width))
-        else:
-            n_height = scale_ceil
-            n_width = math.floor(width * (n_height / height))
+        # fetch pre-processed image from the shared pimage pyramid
+        self.level = pimage.pyramid.get_level(scale_ceil)
+        self.img_gs = self.level.img_gs
+        self.img_np = self.level.img_np
 
         # get scale ratios
-        self.vert_scale = height / n_height
-        self.horiz_scale = width / n_width
-
-        # pre-process image
-        self.img_gs = cv2.resize(img, (n_width, n_height))
-        self.img_np = np.float32(self.img_gs)
-        
-    def print_added_features(self) -> None:
-        self.pimage.output_image()
+        self.vert_scale = self.level.vert_scale
+        self.horiz_scale = self.level.horiz_scale
 
-    def add_list_features(self, group_name, features, size = (4, 4), \
-        color = (0, 255, 0)) -> None:
-        v = 0
+    @staticmethod
+    def get_pipeline_params(scale_ceil = 500, backend = 'xmeans', vector_size = 250, \
+        **backend_params) -> dict:
+        backend = cluster.get_backend(backend, **backend_params)
+        return {'scale_ceil': scale_ceil, 'vector_size': vector_size, \
+            'backend': backend.get_params()}
 
-        # iteratively add features to pimage
-        for feature in features:
-            height = int(round(float(feature[0]) * self.vert_scale))
-            width = int(round(float(feature[1]) * self.horiz_scale))
-            self.pimage.add_feature("{} {}".format(group_name, v), \
-                str(uuid.uuid1()), (height, width), size, color)
-            v += 1
+    def get_params(self) -> dict:
+        return FeatureExtractor.get_pipeline_params(self.scale_ceil, self.backend, \
+            self.vector_size)
 
-    def execute_feature_extraction_pipeline(self, graphics = False, ncentroids = 50) -> set:
+    def print_added_features(self) -> None:
+        self.pimage.output_image()
 
-        # extract features
-        bulk_features = self.__run_tuned_feature_extraction()
+    def save_added_features(self, fp, format = None) -> None:
+        self.pimage.save_image(fp, format = format)
 
-        # run kmeans on extracted features
-        centroids = self.__run_feature_xmeans(bulk_features)
+    def add_list_features(self, group_name, features, size = (4, 4), \
+        color = (0, 255, 0), level = None) -> None:
+        if len(features) == 0: return
+
+        # scale feature positions back to pimage coordinates
+        level = self.level if level is None else level
+        features = np.asarray(features, dtype = float)[:, :2]
+        positions = level.to_grid_positions(features).tolist()
+
+        # add features to pimage in one batch
+        titles = ["{} {}".format(group_name, v) for v in range(len(positions))]
+        ids = [str(uuid.uuid1()) for _ in positions]
+        self.pimage.add_features(titles, ids, positions, size, color)
+
+    def execute_feature_extraction_pipeline(self, graphics = False, ncentroids = 50, \
+        output = None, detectors = None, format = None) -> set:
+
+        # extract features (fusing several detectors when given)
+        with instrument.span('features.extract'):
+            if detectors is None: bulk_features = self.__run_tuned_feature_extraction()
+            else: bulk_features = [(row, col) for row, col, _ in \
+                self.execute_fused_feature_extraction(detectors)]
+
+        # cluster extracted features
+        with instrument.span('features.cluster', backend = type(self.backend).__name__):
+            centroids = self.__run_feature_clustering(bulk_features)
+        self.centroids = centroids
         
         # add graphics 
         if graphics:
@@ -105,79 +140,72 @@ class FeatureExtractor:
             self.add_list_features('Feature Centroids', centroids, \
                 color = (255, 0, 0), size = (20, 20))
             
-            # print graphics
-            self.print_added_features()
+            # print (or write) graphics
+            if output is None: self.print_added_features()
+            else: self.save_added_features(output, format)
 
         return bulk_features
 
-    def __run_feature_agglomerative_clustering(self, features) -> set:
-
-        # run agglomerative clustering algorithm
-        agglo = AgglomerativeClustering(n_clusters = 10).fit(np.array(features))
-        return agglo.labels_
-
-    def __run_feature_kmeans(self, features, n_clusters) -> list:
-
-        # run kmeans algorithm
-        kmeans = KMeans(n_clusters = n_clusters).fit(np.array(features))
-        centroids = kmeans.cluster_centers_.astype(int)
-        return centroids.tolist()
-
-    def __run_feature_xmeans(self, features, num_init_centers = 10, max_centers = 30, \
-        clust_size_threshold = 1, dist_threshold = 10) -> list:
-
-        # run xmeans algorithm
-        initial_centers = kmeans_plusplus_initializer(features, num_init_centers).initialize()
-        algo = xmeans(features, initial_centers = initial_centers, kmax = max_centers)
-        algo.process()
-        centroids, clusters = algo.get_centers(), algo.get_clusters()
- 
-        # pre-process centroids
-        p_centroids = []
-        for coord in centroids:
-            row, col = coord[0], coord[1]
-            p_centroids.append((int(round(row)), int(round(col))))
-
-        # determine close centroids
-        comb_indices = set()
-        for comb in itertools.combinations(range(len(p_centroids)), 2):
-            cen, c_cen = p_centroids[comb[0]], p_centroids[comb[1]]
-            dist = math.sqrt((cen[0] - c_cen[0]) ** 2 + (cen[1] - c_cen[1]) ** 2)
-            if dist <= dist_threshold: comb_indices.add(frozenset(comb))
-        
-        # find transitive centroid clusters
-        trans_centroids = []
-        for comb in comb_indices:
-            addedFlag = False
-            for i in range(len(trans_centroids)):
-                if len(trans_centroids[i].intersection(comb)):
-                    trans_centroids[i] = trans_centroids[i].union(comb)
-                    addedFlag = True
-                    break
-            if not addedFlag: trans_centroids.append(frozenset(comb))
-
-        # combine close transitive centroids sets
-        c_centroids, added_indices = [], set()
-        for combs in trans_centroids:
-            n_centroid = [0, 0]
-            for c_idx in combs:
-                added_indices.add(c_idx)
-                n_centroid[0] += centroids[c_idx][0]
-                n_centroid[1] += centroids[c_idx][1]
-            n_centroid[0] /= len(combs)
-            n_centroid[1] /= len(combs)
-            c_centroids.append(n_centroid)
-
-        # purge under-sized clusters
-        for c_idx in range(len(centroids)):
-            if c_idx in added_indices or len(clusters[c_idx]) \
-                <= clust_size_threshold: continue
-            c_centroids.append(centroids[c_idx])
-        return c_centroids
+    def execute_fused_feature_extraction(self, detectors = None, weights = None, radius = 3, \
+        min_score = 0, workers = None, graphics = False, output = None, format = None) -> list:
+
+        # run detectors concurrently and merge their features
+        features = fuse_features(self.img_gs, detectors, weights, radius, min_score, \
+            workers, img_np = self.img_np)
+
+        # add graphics
+        if graphics:
+            self.add_list_features('Fused Features', features, size = (10, 10))
+
+            # print (or write) graphics
+            if output is None: self.print_added_features()
+            else: self.save_added_features(output, format)
+
+        return features
+
+    def execute_tiled_feature_extraction(self, detector = None, tile_size = 1024, \
+        overlap = 32, workers = None, seam_radius = 2, graphics = False, output = None, \
+        format = None) -> list:
+
+        # extract features from full-resolution tiles
+        level = self.pimage.pyramid.get_level()
+        features = extract_tiled_features(level.img_gs, detector, tile_size, overlap, \
+            workers, seam_radius)
+
+        # add graphics
+        if graphics:
+            self.add_list_features('Tiled Features', features, size = (10, 10), \
+                level = level)
+
+            # print (or write) graphics
+            if output is None: self.print_added_features()
+            else: self.save_added_features(output, format)
+
+        return features
+
+    def __run_feature_clustering(self, features, clust_size_threshold = 1, \
+        dist_threshold = 10) -> list:
+
+        # run clustering backend
+        centroids, labels = self.backend.cluster(features)
+        if len(centroids) == 0: return []
+        sizes = np.bincount(labels[labels >= 0], minlength = len(centroids)).astype(float)
+
+        # merge transitively close centroids weighted by cluster size
+        merged, labels, _ = merge.merge_points(centroids, dist_threshold, sizes)
+        instrument.count('clusters_found', len(centroids))
+        instrument.count('clusters_merged', len(centroids) - len(merged))
+
+        # purge under-sized unmerged clusters
+        members = np.bincount(labels)
+        keep = (members > 1) | (np.bincount(labels, weights = sizes) > clust_size_threshold)
+        return merged[keep].tolist()
 
     def __run_tuned_feature_extraction(self) -> list:
 
-        features, _ = FEAlgorithms.get_ORB_keypoint(self.img_gs, vector_size = 250)
+        features, _ = FEAlgorithms.get_ORB_keypoint(self.img_gs, \
+            vector_size = self.vector_size)
+        instrument.count('keypoints_found', len(features), detector = 'ORB')
         return features
 
     def __find_lcd(self, a, b, ceil) -> int:
@@ -193,6 +221,11 @@ class FEAlgorithms:
     Defines a set of static method algorithms that take
     in a numpy matrix of pixel values representing a grayscale
     image and return feature points as a list of row/col tuples. 
+    OpenCV detectors are fetched from a registry that caches one
+    configured instance per parameter set in each thread (see
+    get_detector), so repeated calls on many small images do not
+    rebuild detectors, and keypoints are converted to row/col
+    tuples in bulk.
 
     Static Methods:
         - get_harris_corner -> set : selects corners using harris corner
@@ -206,8 +239,9 @@ class FEAlgorithms:
         - get_AKAZE_keypoint -> set : selects corners using AKAZE feature extraction algorithm
         - get_BRISK_keypoint -> set : selects corners using BRISK feature extraction algorithm
         - get_BRIEF_keypoint -> set : selects corners using BRIEF feature extraction algorithm
-        - get_ORB_keypoint -> (list, list) : selects corners using ORB feature extraction algorithm 
-            and returns reduced list of features and feature descriptors
+        - get_ORB_keypoint -> (list, ndarray) : selects corners using ORB feature extraction 
+            algorithm and returns reduced list of features and an (N, 32) uint8 array of 
+            binary feature descriptors (one row per feature)
     """
 
     @staticmethod
@@ -220,8 +254,11 @@ class FEAlgorithms:
         _, dst = cv2.threshold(dst, 0.01 * dst.max(), 255, 0)
         dst = np.uint8(dst) 
 
-        # find centroids
+        # find centroids (empty components, e.g. the background of a fully
+        # textured image, have NaN centroids)
         _, _, _, centroids = cv2.connectedComponentsWithStats(dst)
+        centroids = centroids[np.isfinite(centroids).all(axis = 1)]
+        if len(centroids) == 0: return set()
 
         # define sub-pix refinement criteria
         criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, \
@@ -239,16 +276,16 @@ class FEAlgorithms:
         # find shi-tomasi corners
         corners = cv2.goodFeaturesToTrack(img_np, max_corners, quality_level, \
             min_dist)
-        corners = np.int0(corners)
+        if corners is None: return set()
 
         # convert matrix to list tuples
-        return FEAlgorithms.__get_bound_matrix_set_tuples(corners)
+        return FEAlgorithms.__get_bound_matrix_set_tuples(corners.astype(np.intp))
 
     @staticmethod
     def get_FAST_corner(img_gs, threshold = 50) -> set:
 
         # find FAST corners
-        fast = cv2.FastFeatureDetector_create(threshold)
+        fast = get_detector('FAST', threshold)
         kps = fast.detect(img_gs, None)
 
         # format keypoint objects
@@ -258,7 +295,7 @@ class FEAlgorithms:
     def get_SIFT_keypoint(img_gs, n_features = 400) -> set:
 
         # find shift keypoints
-        sift = cv2.xfeatures2d.SIFT_create(n_features)
+        sift = get_detector('SIFT', n_features)
         kps, _ = sift.detectAndCompute(img_gs, None)
 
         # format keypoint objects
@@ -268,7 +305,7 @@ class FEAlgorithms:
     def get_SURF_keypoint(img_gs, n_features = 400) -> set:
 
         # find surf keypoints
-        surf = cv2.xfeatures2d.SURF_create(n_features)
+        surf = get_detector('SURF', n_features)
         kps, _ = surf.detectAndCompute(img_gs, None)
 
         # format keypoint objects
@@ -278,7 +315,7 @@ class FEAlgorithms:
     def get_KAZE_keypoint(img_gs) -> set:
 
         # find surf keypoints
-        surf = cv2.KAZE_create()
+        surf = get_detector('KAZE')
         kps, _ = surf.detectAndCompute(img_gs, None)
 
         # format keypoint objects
@@ -288,7 +325,7 @@ class FEAlgorithms:
     def get_AKAZE_keypoint(img_gs) -> set:
 
         # find surf keypoints
-        surf = cv2.AKAZE_create()
+        surf = get_detector('AKAZE')
         kps, _ = surf.detectAndCompute(img_gs, None)
 
         # format keypoint objects
@@ -298,7 +335,7 @@ class FEAlgorithms:
     def get_BRISK_keypoint(img_gs) -> set:
 
         # find surf keypoints
-        surf = cv2.BRISK_create()
+        surf = get_detector('BRISK')
         kps, _ = surf.detectAndCompute(img_gs, None)
 
         # format keypoint objects
@@ -308,8 +345,8 @@ class FEAlgorithms:
     def get_BRIEF_keypoint(img_gs) -> set:
 
         # find BRIEF keypoints
-        star = cv2.xfeatures2d.StarDetector_create()
-        brief = cv2.xfeatures2d.BriefDescriptorExtractor_create()
+        star = get_detector('STAR')
+        brief = get_detector('BRIEF')
         kps = star.detect(img_gs, None)
         kps, _ = brief.compute(img_gs, kps)
 
@@ -317,46 +354,253 @@ class FEAlgorithms:
         return FEAlgorithms.__get_keypoint_set_tuples(kps)
     
     @staticmethod
-    def get_ORB_keypoint(img_gs, nfeatures = 1000, vector_size = 200) -> (list, list):
+    def get_ORB_keypoint(img_gs, nfeatures = 1000, vector_size = 200) -> (list, np.ndarray):
 
         # find ORB keypoints
-        alg = cv2.ORB_create(nfeatures = nfeatures)
+        alg = get_detector('ORB', nfeatures)
         o_kps = alg.detect(img_gs)
         kps = sorted(o_kps, key = lambda x: -x.response)[:vector_size]
         kps, dsc = alg.compute(img_gs, kps)
-        dsc = dsc.flatten()
+        if dsc is None: dsc = np.empty((0, 32), dtype = np.uint8)
 
-        # format keypoint objects
-        return FEAlgorithms.__get_keypoint_list_tuples(kps), dsc.tolist()
+        # format keypoint objects (descriptor rows stay aligned with keypoints)
+        return FEAlgorithms.__get_keypoint_list_tuples(kps), dsc
 
     @staticmethod
     def __get_keypoint_list_tuples(kps) -> list:
-        list_tuples = []
-        for kp in kps:
-            x, y = kp.pt
-            list_tuples.append((int(y), int(x)))
-        return list_tuples  
+        if len(kps) == 0: return []
+
+        # convert keypoint (x, y) coordinates in bulk
+        coords = cv2.KeyPoint_convert(kps)
+        return list(map(tuple, coords[:, ::-1].astype(int).tolist()))
 
     @staticmethod
     def __get_keypoint_set_tuples(kps) -> set:
-        set_tuples = set()
-        for kp in kps:
-            x, y = kp.pt
-            set_tuples.add((int(y), int(x)))
-        return set_tuples  
+        return set(FEAlgorithms.__get_keypoint_list_tuples(kps))
 
     @staticmethod
     def __get_bound_matrix_set_tuples(np_matrix) -> set:
-        set_tuples = set()
-        for i in np_matrix:
-            x, y = i.ravel()
-            set_tuples.add((int(y), int(x)))
-        return set_tuples
+        coords = np.asarray(np_matrix).reshape(-1, 2)
+        return set(map(tuple, coords[:, ::-1].astype(int).tolist()))
 
     @staticmethod
     def __get_matrix_set_tuples(np_matrix) -> set:
-        set_tuples = set()
-        shape = np_matrix.shape
-        for row in range(shape[0]):
-            set_tuples.add((int(np_matrix[row][1]), int(np_matrix[row][0])))
-        return set_tuples
\ No newline at end of file
+        coords = np.asarray(np_matrix)[:, :2]
+        return set(map(tuple, coords[:, ::-1].astype(int).tolist()))
+
+"""
+Utility function for fetching a configured OpenCV detector by
+registered name and constructor parameters. Detector instances
+are not safe to share between threads, so each thread keeps its
+own cache of one instance per (name, parameters) key, and an
+instance is only constructed the first time a thread asks for it.
+"""
+def get_detector(name, *params) -> object:
+    detectors = getattr(_detector_pool, 'detectors', None)
+    if detectors is None: detectors = _detector_pool.detectors = {}
+
+    # construct detector on first use in this thread
+    key = (name,) + params
+    detector = detectors.get(key)
+    if detector is None:
+        detector = _detector_factories[name](*params)
+        detectors[key] = detector
+    return detector
+
+"""
+Utility function for fetching the long-lived thread pool shared by
+tiled and fused feature extraction (one pool per worker count, with
+the default ThreadPoolExecutor size when 'workers' is None, created
+on first use). Pool threads outlive each call, so the detectors every
+thread caches through get_detector are reused instead of rebuilt.
+Callables run on the pool must not wait on other pool tasks.
+"""
+def get_executor(workers = None) -> ThreadPoolExecutor:
+    executor = _executors.get(workers)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(workers)
+            if executor is None:
+                executor = ThreadPoolExecutor(workers, thread_name_prefix = 'feature')
+                _executors[workers] = executor
+    return executor
+
+"""
+Utility function for registering a detector factory (a callable
+building a detector from its parameters) under a name, so it can
+be fetched and cached through get_detector.
+"""
+def register_detector(name, factory) -> None:
+    _detector_factories[name] = factory
+
+"""
+Utility function for running several registered fusion detectors
+(e.g. 'ORB', 'FAST', 'shi_tomasi', 'harris') at the same time on the
+shared thread pool (see get_executor) over one grayscale image, so
+total latency is close to the slowest detector. Every feature votes
+with its detector weight (1 when not given in 'weights'), features
+within 'radius' of the strongest remaining feature are merged into
+their weighted mean position (without chaining, so dense corners do
+not collapse into one wide feature), and merged features scoring
+below 'min_score' are dropped. Returns (row, col,
+score) features sorted by descending score.
+"""
+def fuse_features(img_gs, detectors = None, weights = None, radius = 3, min_score = 0, \
+    workers = None, img_np = None) -> list:
+    detectors = list(_default_fusion_detectors if detectors is None else detectors)
+    weights = weights or {}
+    assert len(detectors) > 0
+    if img_np is None: img_np = np.float32(img_gs)
+
+    # run detectors concurrently
+    run_detector = functools.partial(_run_fusion_detector, img_gs, img_np)
+    detector_features = list(get_executor(workers).map(run_detector, detectors))
+
+    # gather weighted votes
+    points = [np.array(list(features), dtype = float).reshape(-1, 2) for features \
+        in detector_features]
+    votes = [np.full(len(p), float(weights.get(name, 1.0))) for name, p in \
+        zip(detectors, points)]
+    points, votes = np.concatenate(points), np.concatenate(votes)
+    if len(points) == 0: return []
+
+    # merge nearby features across detectors
+    merged, _, scores = merge.merge_points(points, radius, votes, transitive = False)
+    instrument.count('keypoints_merged', len(points) - len(merged))
+    keep = scores >= min_score
+    positions = np.rint(merged[keep]).astype(int).tolist()
+    fused = [(row, col, score) for (row, col), score in zip(positions, scores[keep].tolist())]
+    return sorted(fused, key = lambda feature: (-feature[2], feature[0], feature[1]))
+
+"""
+Utility function for registering a fusion detector under a name.
+The detector is a callable taking a grayscale image and returning
+row/col features (or a (features, descriptors) tuple), and 'float_input'
+selects whether it is given the float32 image instead of the uint8 one.
+"""
+def register_fusion_detector(name, detector, float_input = False) -> None:
+    _fusion_detectors[name] = (detector, float_input)
+
+"""
+Utility function for running one registered fusion detector on the
+uint8 or float32 version of an image and returning its features
+(descriptors are dropped).
+"""
+def _run_fusion_detector(img_gs, img_np, name) -> list:
+    detector, float_input = _fusion_detectors[name]
+    with instrument.span('detector.' + name):
+        features = detector(img_np if float_input else img_gs)
+    if isinstance(features, tuple): features = features[0]
+    instrument.count('keypoints_found', len(features), detector = name)
+    return features
+
+"""
+Utility function for running a detector (a callable taking a
+grayscale image and returning row/col features, e.g. an FEAlgorithms
+static method) over overlapping tiles of a large grayscale image on
+the shared thread pool (see get_executor; OpenCV releases the GIL
+while detecting). Each tile
+is padded by 'overlap' pixels of context but only keeps the features
+inside its own core, so every feature is reported by exactly one
+tile; features within 'seam_radius' of a seam are then merged across
+tiles. Returns sorted (row, col) features in image coordinates.
+"""
+def extract_tiled_features(img_gs, detector = None, tile_size = 1024, overlap = 32, \
+    workers = None, seam_radius = 2) -> list:
+    if detector is None:
+        detector = functools.partial(FEAlgorithms.get_ORB_keypoint, vector_size = 250)
+
+    # run detector on padded tiles
+    tiles = get_tiles(img_gs.shape, tile_size, overlap)
+    run_tile = functools.partial(_detect_tile, img_gs, detector)
+    tile_features = list(get_executor(workers).map(run_tile, tiles))
+    features = np.concatenate(tile_features) if tile_features else np.empty((0, 2), int)
+
+    # merge duplicate features along tile seams
+    if seam_radius > 0 and len(features):
+        offsets = features % tile_size
+        near_seam = ((offsets < seam_radius) | (offsets >= tile_size - seam_radius)).any(axis = 1)
+        seam_features = merge.dedup_keypoints(features[near_seam], seam_radius)
+        instrument.count('keypoints_merged', int(near_seam.sum()) - len(seam_features))
+        features = np.concatenate([features[~near_seam], \
+            np.array(seam_features, dtype = int).reshape(-1, 2)])
+    return sorted(map(tuple, features.tolist()))
+
+"""
+Utility function for splitting an image of the given shape into
+square tiles. Returns ((top, left, bottom, right) core bounds,
+(top, left, bottom, right) padded bounds) pairs, where the core
+bounds partition the image and the padded bounds extend each core
+by 'overlap' pixels (clipped to the image).
+"""
+def get_tiles(shape, tile_size = 1024, overlap = 32) -> list:
+    height, width = shape[:2]
+    tiles = []
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            bottom, right = min(top + tile_size, height), min(left + tile_size, width)
+            tiles.append(((top, left, bottom, right), (max(0, top - overlap), \
+                max(0, left - overlap), min(height, bottom + overlap), \
+                min(width, right + overlap))))
+    return tiles
+
+"""
+Utility function for running a detector on one padded tile and
+returning the (N, 2) features inside the tile core in image
+coordinates. Only the padded tile is copied, so memory per tile
+stays bounded.
+"""
+def _detect_tile(img_gs, detector, tile) -> np.ndarray:
+    (top, left, bottom, right), (p_top, p_left, p_bottom, p_right) = tile
+    tile_img = np.ascontiguousarray(img_gs[p_top:p_bottom, p_left:p_right])
+
+    # detect features (dropping descriptors) and shift to image coordinates
+    with instrument.span('tiled.detect_tile', tile = (top, left)):
+        features = detector(tile_img)
+    if isinstance(features, tuple): features = features[0]
+    features = np.array(list(features), dtype = int).reshape(-1, 2) + (p_top, p_left)
+
+    # keep features inside the tile core
+    inside = (features[:, 0] >= top) & (features[:, 0] < bottom) & \
+        (features[:, 1] >= left) & (features[:, 1] < right)
+    instrument.count('keypoints_found', int(inside.sum()), detector = 'tiled')
+    return features[inside]
+
+"""
+Utility function for fetching the SIFT constructor, which moved
+from the contrib module into the main OpenCV module.
+"""
+def _create_SIFT(n_features) -> object:
+    if hasattr(cv2, 'SIFT_create'): return cv2.SIFT_create(n_features)
+    return cv2.xfeatures2d.SIFT_create(n_features)
+
+_detector_pool = threading.local()
+_executors = {}
+_executors_lock = threading.Lock()
+_detector_factories = {
+    'FAST': lambda threshold: cv2.FastFeatureDetector_create(threshold),
+    'SIFT': _create_SIFT,
+    'SURF': lambda n_features: cv2.xfeatures2d.SURF_create(n_features),
+    'KAZE': lambda: cv2.KAZE_create(),
+    'AKAZE': lambda: cv2.AKAZE_create(),
+    'BRISK': lambda: cv2.BRISK_create(),
+    'STAR': lambda: cv2.xfeatures2d.StarDetector_create(),
+    'BRIEF': lambda: cv2.xfeatures2d.BriefDescriptorExtractor_create(),
+    'ORB': lambda nfeatures: cv2.ORB_create(nfeatures = nfeatures)
+}
+_fusion_detectors = {
+    'harris': (FEAlgorithms.get_harris_corner, True),
+    'shi_tomasi': (FEAlgorithms.get_shi_tomasi_corner, False),
+    'FAST': (FEAlgorithms.get_FAST_corner, False),
+    'SIFT': (FEAlgorithms.get_SIFT_keypoint, False),
+    'SURF': (FEAlgorithms.get_SURF_keypoint, False),
+    'KAZE': (FEAlgorithms.get_KAZE_keypoint, False),
+    'AKAZE': (FEAlgorithms.get_AKAZE_keypoint, False),
+    'BRISK': (FEAlgorithms.get_BRISK_keypoint, False),
+    'BRIEF': (FEAlgorithms.get_BRIEF_keypoint, False),
+    'ORB': (FEAlgorithms.get_ORB_keypoint, False)
+}
+_default_fusion_detectors = ['ORB', 'FAST', 'shi_tomasi', 'harris']
+
+# pool threads do not survive a fork, so forked workers start new pools
+os.register_at_fork(after_in_child = _executors.clear)
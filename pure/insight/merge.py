@@ -0,0 +1,132 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+class UnionFind:
+    """
+    Defines a disjoint-set forest over the integers [0, size) with
+    union by size and path halving, so a sequence of unions and finds
+    runs in near-linear time. Used to group points into transitive
+    clusters from their pairwise neighbour links.
+
+    Attributes:
+        - parent -> ndarray : parent index of every element (roots
+            are their own parent)
+        - sizes -> ndarray : number of elements under every root
+
+    Methods:
+        - find(x) -> int : fetches the root of the set holding x
+        - union(x, y) -> bool : joins the sets holding x and y and
+            returns whether they were separate
+        - union_pairs(pairs) -> None : joins the sets of every (x, y)
+            row of an (P, 2) array
+        - get_labels() -> ndarray : fetches a compact set label for
+            every element, numbered in order of first appearance
+    """
+
+    def __init__(self, size):
+        self.parent = np.arange(size)
+        self.sizes = np.ones(size, dtype = np.int64)
+
+    def find(self, x) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return int(x)
+
+    def union(self, x, y) -> bool:
+        root_x, root_y = self.find(x), self.find(y)
+        if root_x == root_y: return False
+
+        # attach smaller tree under larger tree
+        if self.sizes[root_x] < self.sizes[root_y]: root_x, root_y = root_y, root_x
+        self.parent[root_y] = root_x
+        self.sizes[root_x] += self.sizes[root_y]
+        return True
+
+    def union_pairs(self, pairs) -> None:
+        for x, y in np.asarray(pairs).reshape(-1, 2).tolist():
+            self.union(x, y)
+
+    def get_labels(self) -> np.ndarray:
+        roots = np.array([self.find(x) for x in range(len(self.parent))], dtype = np.int64)
+
+        # number roots in order of first appearance
+        _, first, inverse = np.unique(roots, return_index = True, return_inverse = True)
+        order = np.argsort(np.argsort(first))
+        return order[inverse.reshape(-1)]
+
+"""
+Utility function for fetching every (i, j) index pair (i < j) of
+points lying within 'radius' of each other, using a KD-tree radius
+query instead of checking every pair.
+"""
+def get_radius_pairs(points, radius) -> np.ndarray:
+    points = np.asarray(points, dtype = float).reshape(-1, 2)
+    if len(points) < 2: return np.empty((0, 2), dtype = np.int64)
+    return cKDTree(points).query_pairs(radius, output_type = 'ndarray')
+
+"""
+Utility function for grouping points around seeds without chaining.
+Points are visited by descending weight (then index), and every
+point not yet grouped becomes a seed claiming the ungrouped points
+within 'radius' of it, so no group spans more than 2 * 'radius'.
+Returns the group label of every point, numbered in seed order.
+"""
+def get_seed_labels(points, radius, weights) -> np.ndarray:
+    neighbours = cKDTree(points).query_ball_point(points, radius)
+    labels = np.full(len(points), -1, dtype = np.int64)
+
+    # claim ungrouped neighbours of every remaining seed
+    num_groups = 0
+    for seed in np.lexsort((np.arange(len(points)), -weights)).tolist():
+        if labels[seed] >= 0: continue
+        members = np.asarray(neighbours[seed], dtype = np.int64)
+        labels[members[labels[members] < 0]] = num_groups
+        num_groups += 1
+    return labels
+
+"""
+Utility function for merging points that lie within 'radius' of
+each other. With 'transitive' set, points linked by chains of
+neighbours merge into one cluster (which may grow arbitrarily wide);
+otherwise points are grouped around the heaviest remaining seeds
+(see get_seed_labels), so each cluster stays within 2 * 'radius'.
+Each cluster is replaced by the mean of its points weighted by
+'weights' (unweighted when None). Returns the (K, 2) merged points,
+the cluster label of every input point, and the summed weight of
+every cluster.
+"""
+def merge_points(points, radius, weights = None, transitive = True) -> (np.ndarray, \
+    np.ndarray, np.ndarray):
+    points = np.asarray(points, dtype = float).reshape(-1, 2)
+    weights = np.ones(len(points)) if weights is None else \
+        np.asarray(weights, dtype = float).reshape(-1)
+    assert len(weights) == len(points)
+    if len(points) == 0: return np.empty((0, 2)), np.empty(0, dtype = np.int64), np.empty(0)
+
+    # group transitive neighbours (or neighbours of seeds)
+    if transitive:
+        union_find = UnionFind(len(points))
+        union_find.union_pairs(get_radius_pairs(points, radius))
+        labels = union_find.get_labels()
+    else: labels = get_seed_labels(points, radius, weights)
+
+    # compute weighted cluster means
+    num_clusters = int(labels.max()) + 1
+    totals = np.bincount(labels, weights = weights, minlength = num_clusters)
+    merged = np.stack([np.bincount(labels, weights = weights * points[:, axis], \
+        minlength = num_clusters) for axis in range(2)], axis = 1)
+    merged /= np.where(totals > 0, totals, 1)[:, np.newaxis]
+    return merged, labels, totals
+
+"""
+Utility function for deduplicating row/col keypoints, merging
+every transitive group of keypoints within 'radius' into its
+(optionally weighted) mean position. Returns a list of rounded
+(row, col) tuples.
+"""
+def dedup_keypoints(keypoints, radius, weights = None) -> list:
+    if len(keypoints) == 0: return []
+    merged, _, _ = merge_points(keypoints, radius, weights)
+    return list(map(tuple, np.rint(merged).astype(int).tolist()))
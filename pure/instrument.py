@@ -0,0 +1,221 @@
+import logging, threading, json, time, os
+
+class Sink:
+    """
+    Defines the interface shared by instrumentation sinks. A sink
+    receives every event emitted while it is registered (see
+    add_sink): span events, with the 'name', 'start' and 'elapsed'
+    (seconds) of a timed stage, its enclosing 'parent' span, its
+    'thread' and whether it raised an 'error', and count events,
+    with the 'name' and 'amount' of a counter increment. Any keyword
+    fields passed to the span or count are added to the event.
+
+    Methods:
+        - record(event) -> None : handles one span or count event
+        - close() -> None : releases resources held by the sink
+    """
+
+    def record(self, event) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+class LoggingSink(Sink):
+    """
+    Defines a sink writing one log record per event, so stage timings
+    and counters go wherever the application's logging configuration
+    sends them.
+
+    Attributes:
+        - logger -> Logger : logger receiving the records
+        - level -> int : level of every record
+
+    Methods:
+        - record(event) -> None : logs one span or count event
+    """
+
+    def __init__(self, logger = None, level = logging.DEBUG):
+        self.logger = logging.getLogger('pure') if logger is None else logger
+        self.level = level
+
+    def record(self, event) -> None:
+        if not self.logger.isEnabledFor(self.level): return
+        if event['type'] == 'span':
+            self.logger.log(self.level, "%s took %.3f ms%s", event['name'], \
+                1000 * event['elapsed'], ' (error)' if event['error'] else '')
+        else: self.logger.log(self.level, "%s += %s", event['name'], event['amount'])
+
+class MemorySink(Sink):
+    """
+    Defines a thread-safe sink aggregating events in memory: the call
+    count, total and maximum time of every span name, and the total of
+    every counter. Raw events are only kept when 'keep_events' is set.
+
+    Attributes:
+        - spans -> dict : span name -> {'calls', 'total', 'max'} times
+            in seconds
+        - counters -> dict : counter name -> total amount
+        - events -> list : raw events (when 'keep_events' is set)
+
+    Methods:
+        - record(event) -> None : aggregates one span or count event
+        - get_summary() -> dict : fetches a copy of the span and counter
+            aggregates, with spans sorted by total time
+        - reset() -> None : clears every aggregate and event
+    """
+
+    def __init__(self, keep_events = False):
+        self.keep_events = keep_events
+        self.spans, self.counters, self.events = {}, {}, []
+        self.__lock = threading.Lock()
+
+    def record(self, event) -> None:
+        with self.__lock:
+            if self.keep_events: self.events.append(event)
+
+            # aggregate span times or counter amounts
+            name = event['name']
+            if event['type'] == 'span':
+                stats = self.spans.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+                stats['calls'] += 1
+                stats['total'] += event['elapsed']
+                stats['max'] = max(stats['max'], event['elapsed'])
+            else: self.counters[name] = self.counters.get(name, 0) + event['amount']
+
+    def get_summary(self) -> dict:
+        with self.__lock:
+            spans = sorted(self.spans.items(), key = lambda item: -item[1]['total'])
+            return {'spans': {name: dict(stats) for name, stats in spans}, \
+                'counters': dict(self.counters)}
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.spans, self.counters, self.events = {}, {}, []
+
+class JSONSink(Sink):
+    """
+    Defines a sink appending one JSON object per event to a file
+    (JSON lines). Every event is written with a single write call on
+    a line-buffered file opened in append mode, so several processes
+    can trace to the same file.
+
+    Attributes:
+        - path -> str : path to the trace file
+
+    Methods:
+        - record(event) -> None : appends one span or count event
+        - close() -> None : closes the trace file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__file = open(path, 'a', buffering = 1)
+        self.__lock = threading.Lock()
+
+    def record(self, event) -> None:
+        line = json.dumps(event, default = str) + '\n'
+        with self.__lock:
+            self.__file.write(line)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
+
+class _Span:
+    """
+    Defines a timed span context manager emitting one span event to
+    every registered sink on exit. Enclosing spans are tracked per
+    thread, so every event names its parent.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self) -> '_Span':
+        stack = _get_span_stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.start = time.time()
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        elapsed = time.perf_counter() - self.start_time
+        _get_span_stack().pop()
+        _emit({'type': 'span', 'name': self.name, 'start': self.start, 'elapsed': elapsed, \
+            'parent': self.parent, 'thread': threading.current_thread().name, \
+            'pid': os.getpid(), 'error': exc_type is not None, **self.fields})
+
+class _NullSpan:
+    """
+    Defines the shared no-op span returned while no sink is registered.
+    """
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+"""
+Utility function for timing a pipeline stage as a span, used as
+'with instrument.span(name, **fields): ...'. While no sink is
+registered, a shared no-op span is returned, so disabled
+instrumentation costs one function call and one check.
+"""
+def span(name, **fields) -> _Span:
+    if not _sinks: return _null_span
+    return _Span(name, fields)
+
+"""
+Utility function for adding an amount to a named counter (e.g.
+pixels processed, keypoints found, clusters merged). Does nothing
+while no sink is registered.
+"""
+def count(name, amount = 1, **fields) -> None:
+    if not _sinks: return
+    _emit({'type': 'count', 'name': name, 'amount': amount, **fields})
+
+"""
+Utility function for registering a sink, enabling instrumentation
+in every thread of the current process.
+"""
+def add_sink(sink) -> Sink:
+    global _sinks
+    with _sinks_lock:
+        _sinks = _sinks + (sink,)
+    return sink
+
+"""
+Utility function for unregistering a sink (instrumentation is
+disabled again once no sink is left). The sink is not closed.
+"""
+def remove_sink(sink) -> None:
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+"""
+Utility function for sending an event to every registered sink
+(the sink tuple is replaced, never mutated, so it is read without
+locking).
+"""
+def _emit(event) -> None:
+    for sink in _sinks:
+        sink.record(event)
+
+"""
+Utility function for fetching the stack of open span names of the
+current thread.
+"""
+def _get_span_stack() -> list:
+    stack = getattr(_span_stacks, 'stack', None)
+    if stack is None: stack = _span_stacks.stack = []
+    return stack
+
+_sinks = ()
+_sinks_lock = threading.Lock()
+_span_stacks = threading.local()
+_null_span = _NullSpan()
@@ -0,0 +1,26 @@
+import pure.bench.stages as stages
+
+def test_every_stage_runs(tmp_path):
+    (name, file_name), = stages.get_images(None, [128], str(tmp_path))
+    results = stages.run_benchmark([(name, file_name)], repeats = 1)
+    assert stages.get_errors(results) == []
+
+    # every requested stage is reported on its own
+    expected = {'load', 'convert_pixel_to_var', 'reduce_grid', 'average_hash', 'dct_hash', \
+        'pyramid_level', 'xmeans', 'graphics'}
+    assert expected <= set(results[name])
+    assert all('ms' in results[name][stage] for stage in expected)
+    assert all(stage in results[name] for stage in ['detector:ORB', 'detector:FAST'])
+
+def test_failed_stage_is_reported_alone():
+    res = stages.measure(lambda: 1 / 0, repeats = 1)
+    assert res['error'].startswith('ZeroDivisionError')
+
+def test_compare_flags_missing_and_slower_stages():
+    baseline = {'results': {'img': {'load': {'ms': 10.0, 'peak_kb': 100.0}, \
+        'graphics': {'ms': 10.0, 'peak_kb': 100.0}, 'dct_hash': {'ms': 10.0, 'peak_kb': 100.0}}}}
+    results = {'img': {'load': {'ms': 20.0, 'peak_kb': 100.0}, \
+        'graphics': {'error': 'ValueError: broken'}, 'dct_hash': {'ms': 10.0, 'peak_kb': 100.0}}}
+    regressions = stages.compare_results(results, baseline)
+    assert {(reg['stage'], reg['metric']) for reg in regressions} == \
+        {('load', 'ms'), ('graphics', 'missing')}
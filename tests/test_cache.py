@@ -0,0 +1,41 @@
+import pure.db.cache as cache
+import sqlite3, time
+
+def test_get_does_not_take_write_lock(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    result_cache = cache.ResultCache(path, timeout = 0.1)
+    result_cache.put('a', [1, 2, 3])
+
+    # hold the write lock from another connection while reading
+    writer = sqlite3.connect(path, isolation_level = None)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        for idx in range(result_cache.flush_size - 1):
+            if idx % 2: assert result_cache.get('a') == [1, 2, 3]
+            else: assert result_cache.get('b') is None
+    finally: writer.execute('ROLLBACK')
+    result_cache.close()
+
+def test_counters_are_flushed(tmp_path):
+    with cache.ResultCache(str(tmp_path / 'cache.db'), flush_size = 4) as result_cache:
+        result_cache.put('a', 1)
+        for _ in range(3): result_cache.get('a')
+        result_cache.get('b')
+        assert (result_cache.hits, result_cache.misses) == (3, 1)
+        stats = result_cache.get_stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (3, 1, 1)
+
+def test_lru_eviction_uses_deferred_touches(tmp_path):
+    with cache.ResultCache(str(tmp_path / 'cache.db'), max_bytes = 300, \
+        touch_interval = 0.0) as result_cache:
+        result_cache.put('a', b'x' * 100)
+        time.sleep(0.01)
+        result_cache.put('b', b'x' * 100)
+        time.sleep(0.01)
+
+        # a hit on 'a' is flushed with the next put, so 'b' is evicted first
+        assert result_cache.get('a') == b'x' * 100
+        result_cache.put('c', b'x' * 100)
+        assert result_cache.get('b') is None
+        assert result_cache.get('a') == b'x' * 100
+        assert result_cache.evictions == 1
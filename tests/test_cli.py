@@ -0,0 +1,69 @@
+import pure.cli as cli
+import pure.db.cache as cache
+import io, json, os, pytest
+
+samples_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'samples')
+sample_files = [os.path.join(samples_dir, name) for name in \
+    ('horse.jpg', 'landscape-crop.jpg')]
+original_process_image = cli.process_image
+
+"""
+Utility function for running the batch CLI on the sample images
+and returning the parsed JSONL results keyed by file name.
+"""
+def run_samples(**params) -> dict:
+    out = io.StringIO()
+    summary = cli.run_batch(sample_files, out, 1, 1, **params)
+    assert summary['images'] == len(sample_files)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    return {result['file']: result for result in results}
+
+"""
+Stand-in for cli.process_image that kills its worker process on the
+horse sample (the pool forks, so workers see the patched function).
+"""
+def crash_on_horse(file_name, **params) -> dict:
+    if os.path.basename(file_name) == 'horse.jpg': os._exit(1)
+    return original_process_image(file_name, **params)
+
+@pytest.mark.parametrize('backend', ['xmeans', 'minibatch_kmeans', 'grid_density'])
+def test_features_smoke(backend):
+    results = run_samples(features = True, backend = backend)
+    for file_name, result in results.items():
+        assert 'error' not in result, result['error']
+        assert set(result['hashes']) == {'gs', 'lum', 'dct'}
+        assert len(result['features']['keypoints']) > 0
+        assert len(result['features']['centroids']) > 0
+        assert all(len(point) == 2 for point in result['features']['centroids'])
+
+def test_features_cached(tmp_path):
+    cache_path = str(tmp_path / 'cache.db')
+    first = run_samples(features = True, backend = 'grid_density', cache_path = cache_path)
+    second = run_samples(features = True, backend = 'grid_density', cache_path = cache_path)
+    for file_name, result in second.items():
+        assert result['cached'] == ['features', 'hashes']
+        assert result['features'] == first[file_name]['features']
+        assert result['hashes'] == first[file_name]['hashes']
+
+    # lookups counted by the workers are stored in the cache file
+    with cache.ResultCache(cache_path) as result_cache:
+        stats = result_cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (4, 4, 4)
+
+def test_hashes_do_not_depend_on_features():
+    hashes_only = run_samples()
+    with_features = run_samples(features = True, backend = 'grid_density')
+    for file_name, result in hashes_only.items():
+        assert result['hashes'] == with_features[file_name]['hashes']
+
+@pytest.mark.parametrize('chunk_size', [1, 2])
+def test_dead_worker_is_reported(monkeypatch, chunk_size):
+    monkeypatch.setattr(cli, 'process_image', crash_on_horse)
+    out = io.StringIO()
+    summary = cli.run_batch(sample_files * 2, out, 2, chunk_size)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert summary['images'] == 4 and summary['errors'] == 2
+    for result in results:
+        if os.path.basename(result['file']) == 'horse.jpg':
+            assert result['error'].startswith('BrokenProcessPool')
+        else: assert 'error' not in result and len(result['hashes']) == 3
@@ -0,0 +1,74 @@
+import pure.hash.phash as phash
+import pure.hash.dct as dct
+import numpy as np
+import math, pytest
+
+"""
+Reference O(N^4) 2D DCT, as computed term by term by the original
+DCTHash implementation.
+"""
+def reference_2d_dct(array) -> np.ndarray:
+    size = len(array)
+    lambdas = [1.0 / math.sqrt(2.0) if x == 0 else 1.0 for x in range(size)]
+    res = np.zeros((size, size))
+    for u in range(size):
+        for v in range(size):
+            iter_sum = 0
+            for i in range(size):
+                for j in range(size):
+                    iter_sum += lambdas[i] * lambdas[j] * array[i][j] * \
+                        math.cos((math.pi * u) / (2.0 * size) * (2 * i + 1)) * \
+                        math.cos((math.pi * v) / (2.0 * size) * (2 * j + 1))
+            res[u, v] = (2.0 / size) * iter_sum
+    return res
+
+"""
+Reference DCT hash bits: the 8x8 low frequency block (DC term
+excluded) thresholded against its mean.
+"""
+def reference_bit_hash(dct_res) -> list:
+    block = [[dct_res[row][col] for col in range(8)] for row in range(8)]
+    block[0][0] = 0
+    mean_val = sum(map(sum, block)) / ((8 ** 2) - 1)
+    return [1 if block[row][col] > mean_val else 0 for row in range(8) for col in range(8)]
+
+@pytest.mark.parametrize('size', [8, 16, 32])
+def test_calc_2d_dct_matches_reference(size):
+    array = np.random.default_rng(size).uniform(0, 255, (size, size))
+    expected = reference_2d_dct(array)
+    np.testing.assert_allclose(dct.calc_2d_dct(array), expected, atol = 1e-9)
+
+    # low frequency block only
+    np.testing.assert_allclose(dct.calc_2d_dct(array, 8), expected[:8, :8], atol = 1e-9)
+
+def test_calc_2d_dct_batch():
+    arrays = np.random.default_rng(0).uniform(0, 255, (4, 16, 16))
+    batch = dct.calc_2d_dct(arrays, 8)
+    for array, res in zip(arrays, batch):
+        np.testing.assert_allclose(res, reference_2d_dct(array)[:8, :8], atol = 1e-9)
+
+@pytest.mark.parametrize('low_freq_only', [False, True])
+def test_compute_hash_matches_reference(low_freq_only):
+    image = np.random.default_rng(1).uniform(0, 255, (64, 48, 3)).astype(np.float32)
+    dct_hash = dct.DCTHash(phash.VariableGrid.from_array(image))
+    dct_hash.compute_hash(low_freq_only = low_freq_only)
+
+    # recompute reduced grayscale grid and its reference transform
+    reduced = phash.reduce_array(image, 32)
+    gs_data = np.floor(reduced.sum(axis = -1) / 3)
+    expected = reference_2d_dct(gs_data)
+
+    # check coefficients (only the 8x8 block for low_freq_only) and hash bits
+    block = 8 if low_freq_only else 32
+    dct_res = dct_hash.dct_grid.get_grid_array().reshape(block, block)
+    np.testing.assert_allclose(dct_res, expected[:block, :block], atol = 1e-9)
+    assert dct_hash.hash_res == reference_bit_hash(expected)
+
+def test_low_freq_only_gives_same_hash():
+    image = np.random.default_rng(2).uniform(0, 255, (40, 40, 3)).astype(np.float32)
+    hashes = []
+    for low_freq_only in (False, True):
+        dct_hash = dct.DCTHash(phash.VariableGrid.from_array(image))
+        dct_hash.compute_hash(low_freq_only = low_freq_only)
+        hashes.append(dct_hash.hash_res)
+    assert hashes[0] == hashes[1]
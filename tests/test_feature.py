@@ -0,0 +1,83 @@
+import pure.imaging.pimage as pimage
+import pure.insight.feature as feature
+import pure.cli as cli
+import io, os, threading
+
+sample_file = os.path.join(os.path.dirname(__file__), os.pardir, 'samples', 'horse.jpg')
+
+def test_pipeline_xmeans_centroids():
+    p_image = pimage.PImage(sample_file, 'horse', 'horse', graphics = False)
+    extractor = feature.FeatureExtractor(p_image, backend = 'xmeans')
+    bulk_features = extractor.execute_feature_extraction_pipeline()
+    assert len(bulk_features) > 0
+    assert 0 < len(extractor.centroids) <= len(bulk_features)
+
+    # centroids lie within the pre-processed image
+    height, width = extractor.img_gs.shape
+    assert all(0 <= row < height and 0 <= col < width for row, col in extractor.centroids)
+
+def test_pipeline_default_backend():
+    p_image = pimage.PImage(sample_file, 'horse', 'horse', graphics = False)
+    extractor = feature.FeatureExtractor(p_image)
+    assert extractor.backend.ccore == False
+    bulk_features = extractor.execute_feature_extraction_pipeline()
+    assert 0 < len(extractor.centroids) <= len(bulk_features)
+
+def test_pipeline_is_reproducible():
+    centroids = []
+    for _ in range(2):
+        p_image = pimage.PImage(sample_file, 'horse', 'horse', graphics = False)
+        extractor = feature.FeatureExtractor(p_image, backend = 'xmeans')
+        extractor.execute_feature_extraction_pipeline()
+        centroids.append(extractor.centroids)
+    assert centroids[0] == centroids[1]
+
+def test_pipeline_graphics_in_memory():
+    p_image = pimage.PImage(sample_file, 'horse', 'horse')
+    extractor = feature.FeatureExtractor(p_image, backend = 'grid_density')
+    buffer = io.BytesIO()
+    extractor.execute_feature_extraction_pipeline(graphics = True, output = buffer)
+    assert buffer.getvalue().startswith(b'\x89PNG')
+
+    # explicit formats and encoded bytes
+    buffer = io.BytesIO()
+    extractor.execute_tiled_feature_extraction(tile_size = 256, graphics = True, \
+        output = buffer, format = 'JPEG')
+    assert buffer.getvalue().startswith(b'\xff\xd8')
+    assert p_image.get_image_bytes().startswith(b'\x89PNG')
+
+def test_pipeline_params_match_extractor():
+    p_image = pimage.PImage(sample_file, 'horse', 'horse', graphics = False)
+    extractor = feature.FeatureExtractor(p_image, backend = 'xmeans', vector_size = 100)
+    params = extractor.get_params()
+    assert params == feature.FeatureExtractor.get_pipeline_params(backend = 'xmeans', \
+        vector_size = 100)
+    assert (params['scale_ceil'], params['vector_size']) == (500, 100)
+    assert params['backend']['name'] == 'XMeansBackend'
+
+    # the CLI cache key follows the extractor defaults and backend parameters
+    default_params = feature.FeatureExtractor(p_image).get_params()
+    assert cli.get_feature_params() == default_params
+    assert cli.get_feature_params(ccore = True) != default_params
+    assert cli.get_feature_params('grid_density')['backend']['cell_size'] == 20
+
+def test_tiled_extraction_reuses_pool_threads():
+    p_image = pimage.PImage(sample_file, 'horse', 'horse', graphics = False)
+    img_gs = p_image.pyramid.get_level().img_gs
+    get_threads = lambda: {thread.ident for thread in threading.enumerate() \
+        if thread.name.startswith('feature')}
+
+    # the second call runs on the same threads (and their cached detectors)
+    first = feature.extract_tiled_features(img_gs, tile_size = 128, workers = 2)
+    threads = get_threads()
+    assert feature.extract_tiled_features(img_gs, tile_size = 128, workers = 2) == first
+    assert get_threads() == threads
+    assert feature.get_executor(2) is feature.get_executor(2)
+
+def test_fused_extraction_reuses_pool_threads():
+    p_image = pimage.PImage(sample_file, 'horse', 'horse', graphics = False)
+    img_gs = p_image.pyramid.get_level(500).img_gs
+    first = feature.fuse_features(img_gs)
+    threads = {thread.ident for thread in threading.enumerate()}
+    assert feature.fuse_features(img_gs) == first
+    assert {thread.ident for thread in threading.enumerate()} == threads
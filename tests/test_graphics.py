@@ -0,0 +1,49 @@
+import pure.imaging.grid as grid
+import pure.imaging.graphics as graphics
+import numpy as np
+import os, pytest
+
+sample_file = os.path.join(os.path.dirname(__file__), os.pardir, 'samples', 'horse.jpg')
+
+"""
+Reference marker painting: one draw_feature_color or draw_feature_invert
+call per marker, in order.
+"""
+def draw_reference(pixel_grid, positions, sizes, colors) -> np.ndarray:
+    g_image = graphics.GraphicsImage(pixel_grid, tile_size = 50)
+    for k, position in enumerate(positions):
+        size = tuple(sizes[k]) if np.ndim(sizes) == 2 else sizes
+        if colors is None: g_image.draw_feature_invert(tuple(position), size)
+        else:
+            color = tuple(colors[k]) if np.ndim(colors) == 2 else colors
+            g_image.draw_feature_color(tuple(position), color, size)
+    return np.asarray(g_image.get_image())
+
+@pytest.fixture(scope = 'module')
+def pixel_grid():
+    pixel_grid = grid.PixelGrid(sample_file)
+    pixel_grid.load_pixel_grid()
+    return pixel_grid
+
+@pytest.mark.parametrize('sizes, colors', [
+    ((10, 10), (0, 255, 0)),
+    ((1, 1), (255, 0, 0)),
+    ('random', (0, 0, 255)),
+    ((10, 10), 'random'),
+    ((20, 20), None)])
+def test_draw_features_matches_reference(pixel_grid, sizes, colors):
+    rng = np.random.default_rng(0)
+    height, width = pixel_grid.get_grid_dimensions()
+
+    # include markers clipped at (or, when colored, centered past) the image edges
+    positions = np.concatenate([rng.integers(0, (height, width), (300, 2)), \
+        [[0, 0], [height - 1, width - 1]]])
+    if colors is not None:
+        positions = np.concatenate([positions, [[height + 3, 5], [-3, width // 2]]])
+    if sizes == 'random': sizes = rng.integers(1, 120, (len(positions), 2))
+    if colors == 'random': colors = rng.integers(0, 256, (len(positions), 3))
+
+    g_image = graphics.GraphicsImage(pixel_grid, tile_size = 50)
+    g_image.draw_features(positions, sizes, colors)
+    assert np.array_equal(np.asarray(g_image.get_image()), \
+        draw_reference(pixel_grid, positions.tolist(), sizes, colors))
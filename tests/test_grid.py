@@ -0,0 +1,16 @@
+import pure.imaging.grid as grid
+import os, pytest
+
+sample_file = os.path.join(os.path.dirname(__file__), os.pardir, 'samples', 'horse.jpg')
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason = 'needs /proc/self/fd')
+def test_unloaded_grids_hold_no_files():
+    open_files = len(os.listdir('/proc/self/fd'))
+    pixel_grids = [grid.PixelGrid(sample_file) for _ in range(20)]
+    assert len(os.listdir('/proc/self/fd')) == open_files
+
+    # loading reopens and closes the file
+    pixel_grids[0].load_pixel_grid()
+    assert len(os.listdir('/proc/self/fd')) == open_files
+    assert pixel_grids[0].file_type == 'jpeg'
+    assert pixel_grids[0].get_grid_dimensions() == pixel_grids[0].source_dimensions
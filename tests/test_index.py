@@ -0,0 +1,108 @@
+import pure.hash.index as index
+import pure.hash.packed as packed
+import numpy as np
+import pytest
+
+"""
+Reference radius query: a linear scan over every stored hash,
+sorted by distance and then by insertion order.
+"""
+def linear_scan(stored, word, radius) -> list:
+    matches = []
+    for order, (id, other) in enumerate(stored.items()):
+        dist = bin(other ^ word).count('1')
+        if dist <= radius: matches.append((dist, order, id))
+    return [(id, dist) for dist, _, id in sorted(matches)]
+
+"""
+Hashes at exact distances around a query, with the flipped bits
+spread evenly across the bands so every band sits right at (or just
+past) the pigeonhole sub-radius for the tested radii.
+"""
+def get_boundary_hashes(word, bands = 4, band_bits = 16) -> list:
+    hashes = []
+    for per_band in range(3):
+        for extra in range(bands):
+            flips = 0
+            for band in range(bands):
+                count = per_band + (band < extra)
+                for bit in range(count):
+                    flips |= 1 << (band * band_bits + bit)
+            hashes.append(word ^ flips)
+    return hashes
+
+"""
+A random query word with its boundary hashes followed by 'count'
+random hashes.
+"""
+def get_hashes(seed, count = 200) -> tuple:
+    rng = np.random.default_rng(seed)
+    query = int(rng.integers(0, 1 << 63)) << 1 | 1
+    hashes = get_boundary_hashes(query)
+    hashes += [int(word) for word in rng.integers(0, 1 << 63, count, dtype = np.uint64)]
+    return query, hashes
+
+"""
+Checks index queries against the linear scan over a range of radii.
+"""
+def assert_matches_scan(hash_index, stored, query, radii = range(0, 13)):
+    for radius in radii:
+        assert sorted(hash_index.query(query, radius)) == \
+            sorted(linear_scan(stored, query, radius)), radius
+
+def test_build_and_boundary_queries():
+    query, hashes = get_hashes(0)
+    hash_index = index.HashIndex()
+    hash_index.build(list(range(len(hashes))), hashes)
+    stored = dict(enumerate(hashes))
+    assert len(hash_index) == len(stored)
+
+    # radii 3/4 and 7/8 cross the pigeonhole sub-radius of 4 bands
+    assert_matches_scan(hash_index, stored, query)
+    assert [dist for _, dist in hash_index.query(query, 4)] == \
+        sorted(dist for _, dist in hash_index.query(query, 4))
+
+def test_insert_remove_compact():
+    query, hashes = get_hashes(1)
+    hash_index, stored = index.HashIndex(), {}
+
+    # bulk load half and insert the rest
+    half = len(hashes) // 2
+    hash_index.build(['b{}'.format(idx) for idx in range(half)], hashes[:half])
+    stored.update(('b{}'.format(idx), hash) for idx, hash in enumerate(hashes[:half]))
+    for idx, hash in enumerate(hashes[half:]):
+        hash_index.insert('i{}'.format(idx), hash)
+        stored['i{}'.format(idx)] = hash
+    assert_matches_scan(hash_index, stored, query)
+
+    # remove from both the sorted and the inserted tables
+    for id in list(stored)[::3]:
+        hash_index.remove(id)
+        del stored[id]
+    assert len(hash_index) == len(stored)
+    assert all((id in hash_index) == (id in stored) for id in ['b0', 'b1', 'i0', 'i1'])
+    assert_matches_scan(hash_index, stored, query)
+
+    # compact rebuilds without removed slots, and inserts still work afterwards
+    hash_index.compact()
+    assert len(hash_index.slot_ids) == len(stored)
+    assert_matches_scan(hash_index, stored, query)
+    hash_index.insert('new', query)
+    stored['new'] = query
+    assert_matches_scan(hash_index, stored, query)
+    assert hash_index.get_hash('new') == query
+
+def test_packed_hashes_and_duplicates():
+    query, hashes = get_hashes(2, count = 20)
+    hashes = hashes + hashes[:5]
+    packed_hashes = [packed.PackedHash.from_bits(np.array(list(np.binary_repr(hash, 64)), \
+        dtype = np.uint8)) for hash in hashes]
+    hash_index = index.HashIndex()
+    for id, p_hash in enumerate(packed_hashes): hash_index.insert(id, p_hash)
+    assert_matches_scan(hash_index, dict(enumerate(hashes)), query)
+
+@pytest.mark.parametrize('radius', [0, 1, 2, 3, 4])
+def test_flip_masks(radius):
+    masks = index.get_flip_masks(8, radius).tolist()
+    expected = [mask for mask in range(256) if bin(mask).count('1') <= radius]
+    assert sorted(masks) == expected
@@ -0,0 +1,32 @@
+import pure.insight.merge as merge
+import numpy as np
+
+def test_transitive_merge_chains_points():
+    chain = np.stack([np.zeros(10), 2.0 * np.arange(10)], axis = 1)
+    merged, labels, totals = merge.merge_points(chain, 3)
+    assert len(merged) == 1 and totals.tolist() == [10.0]
+    assert np.allclose(merged[0], chain.mean(axis = 0))
+
+def test_seed_merge_caps_cluster_extent():
+    rng = np.random.default_rng(0)
+    points = np.concatenate([np.stack([np.zeros(10), 2.0 * np.arange(10)], axis = 1), \
+        rng.uniform(0, 60, (400, 2))])
+    weights = rng.integers(1, 4, len(points)).astype(float)
+    merged, labels, totals = merge.merge_points(points, 3, weights, transitive = False)
+
+    # every point is within the radius of its group seed, so groups span at most 2 radii
+    for label in range(len(merged)):
+        members = points[labels == label]
+        assert np.ptp(members, axis = 0).max() <= 6
+    assert np.allclose(totals, np.bincount(labels, weights = weights))
+
+    # seeds are taken by descending weight, so the heaviest point keeps its neighbours
+    heaviest = int(np.argmax(weights))
+    near = np.linalg.norm(points - points[heaviest], axis = 1) <= 3
+    assert (labels[near] == labels[heaviest]).all()
+
+def test_seed_merge_joins_duplicates():
+    points = [(5, 5), (5, 5), (6, 5), (40, 40), (40, 41)]
+    merged, labels, totals = merge.merge_points(points, 3, [2, 1, 1, 1, 1], transitive = False)
+    assert labels.tolist() == [0, 0, 0, 1, 1]
+    assert np.allclose(merged, [[5.25, 5], [40, 40.5]]) and totals.tolist() == [4, 2]
@@ -0,0 +1,64 @@
+import pure.hash.packed as packed
+import numpy as np
+import pytest
+
+sizes = [1, 7, 63, 64, 65, 100, 128, 200, 1024]
+
+"""
+Reference word packing: each run of 64 bits (zero padded at the end)
+read as a most significant bit first integer.
+"""
+def reference_words(bits) -> list:
+    bits = list(bits) + [0] * ((-len(bits)) % 64)
+    return [int(''.join(map(str, bits[idx:idx + 64])), 2) for idx in range(0, len(bits), 64)]
+
+"""
+Reproducible random 0/1 bits of the given shape.
+"""
+def random_bits(size, seed) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 2, size, dtype = np.uint8)
+
+@pytest.mark.parametrize('size', sizes)
+def test_pack_bits_matches_reference(size):
+    bits = random_bits(size, size)
+    assert [int(word) for word in packed.pack_bits(bits)] == reference_words(bits)
+
+    # batches pack row by row
+    batch = np.stack([bits, 1 - bits])
+    words = packed.pack_bits(batch)
+    assert words.shape == (2, -(-size // 64))
+    assert [int(word) for word in words[1]] == reference_words(1 - bits)
+
+@pytest.mark.parametrize('size', sizes)
+def test_hamming_distance_matches_reference(size):
+    bits_a, bits_b = random_bits(size, size), random_bits(size, size + 1)
+    hash_a, hash_b = packed.PackedHash.from_bits(bits_a), packed.PackedHash.from_bits(bits_b)
+    expected = int(np.count_nonzero(bits_a != bits_b))
+    assert hash_a.hamming_distance(hash_b) == expected
+    assert hash_a.similarity(hash_b) == pytest.approx(1.0 - expected / size)
+    assert hash_a.hamming_distance(hash_a) == 0
+
+def test_popcount_fallback_matches_bitwise_count(monkeypatch):
+    words = packed.pack_bits(random_bits((50, 200), 0))
+    expected = [[bin(int(word)).count('1') for word in row] for row in words]
+    monkeypatch.delattr(np, 'bitwise_count', raising = False)
+    assert packed.popcount(words).tolist() == expected
+
+@pytest.mark.parametrize('size', sizes)
+def test_round_trips(size):
+    bits = random_bits(size, size)
+    p_hash = packed.PackedHash.from_bits(bits)
+    assert np.array_equal(p_hash.to_bits(), bits)
+    assert len(p_hash) == size
+
+    # hex and bytes serialize whole words
+    assert len(p_hash.to_hex()) == 16 * -(-size // 64)
+    assert packed.PackedHash.from_hex(p_hash.to_hex(), size) == p_hash
+    assert packed.PackedHash.from_bytes(p_hash.to_bytes(), size) == p_hash
+    assert hash(packed.PackedHash.from_hex(p_hash.to_hex(), size)) == hash(p_hash)
+
+def test_short_hex_is_padded():
+    p_hash = packed.PackedHash.from_hex('f0')
+    assert len(p_hash) == 8
+    assert p_hash.to_bits().tolist() == [1, 1, 1, 1, 0, 0, 0, 0]
+    assert p_hash.to_hex() == 'f0' + '0' * 14
@@ -0,0 +1,32 @@
+import pure.hash.phash as phash
+import numpy as np
+import pytest
+
+"""
+Reference exact area average: every pixel is split into 'size' equal
+sub-pixels along each axis, so each output cell is the plain mean of
+'length' sub-pixels.
+"""
+def reference_area_average(array, size) -> np.ndarray:
+    height, width = array.shape[:2]
+    fine = np.repeat(np.repeat(array.astype(float), size, axis = 0), size, axis = 1)
+    return fine.reshape(size, height, size, width, -1).mean(axis = (1, 3))
+
+@pytest.mark.parametrize('shape', [(37, 53), (33, 32), (100, 41), (64, 64), (8, 8)])
+def test_reduce_array_matches_area_average(shape):
+    array = np.random.default_rng(sum(shape)).uniform(0, 255, shape + (3,))
+    np.testing.assert_allclose(phash.reduce_array(array, 8), \
+        reference_area_average(array, 8), atol = 1e-9)
+
+def test_reduce_array_other_axes():
+    batch = np.random.default_rng(0).uniform(0, 255, (3, 45, 70, 3))
+    reduced = phash.reduce_array(batch, 32, axes = (1, 2))
+    for array, res in zip(batch, reduced):
+        np.testing.assert_allclose(res, reference_area_average(array, 32), atol = 1e-9)
+
+def test_reduce_batch_mixed_shapes():
+    rng = np.random.default_rng(1)
+    grids = [rng.uniform(0, 255, shape) for shape in [(20, 30, 3), (41, 41, 3), (20, 30, 3)]]
+    reduced = phash.reduce_batch(grids, 8)
+    for array, res in zip(grids, reduced):
+        np.testing.assert_allclose(res, reference_area_average(array, 8), atol = 1e-9)
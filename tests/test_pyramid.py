@@ -0,0 +1,22 @@
+import pure.imaging.pimage as pimage
+import numpy as np
+import os
+
+sample_file = os.path.join(os.path.dirname(__file__), os.pardir, 'samples', 'horse.jpg')
+
+def test_level_versions_are_lazy():
+    p_image = pimage.PImage(sample_file, 'horse', 'horse', graphics = False)
+    level = p_image.pyramid.get_level(100)
+
+    # an RGB-only consumer never builds the grayscale buffers
+    level.get_var_grid()
+    assert p_image.pixel_grid.gs_array is None
+    assert max(level.dimensions) == 100
+
+    # grayscale versions are built on first use and kept
+    assert level.img_gs.shape == level.dimensions
+    assert level.img_gs is level.img_gs
+    assert np.array_equal(level.img_np, np.float32(level.img_gs))
+
+    # the full-resolution level shares the pixel grid buffer
+    assert p_image.pyramid.get_level().img_gs is p_image.pixel_grid.get_gs_array()
@@ -0,0 +1,83 @@
+import pure.db.store as store
+import pure.hash.packed as packed
+import numpy as np
+
+radii = [0, 1, 3, 4, 7, 8, 16]
+
+"""
+Reference radius query: a linear scan over every stored hash of a kind,
+sorted by distance and then by id.
+"""
+def linear_scan(stored, kind, word, radius) -> list:
+    matches = [(id, bin(hashes[kind] ^ word).count('1')) for id, hashes in stored.items()]
+    return sorted([match for match in matches if match[1] <= radius], \
+        key = lambda match: (match[1], match[0]))
+
+"""
+Random 'dct' and 'gs' hashes (with the sign bit set on some) plus
+hashes at growing distances from a query word, with the flipped bits
+spread across the bands.
+"""
+def get_records(seed, count = 150) -> tuple:
+    rng = np.random.default_rng(seed)
+    query = int(rng.integers(0, 1 << 64, dtype = np.uint64))
+    stored = {}
+    for idx in range(count):
+        words = rng.integers(0, 1 << 64, 2, dtype = np.uint64)
+        stored['r{}'.format(idx)] = {'dct': int(words[0]), 'gs': int(words[1])}
+    for dist in range(18):
+        flips = sum(1 << (16 * (bit % 4) + bit // 4) for bit in range(dist))
+        stored['q{}'.format(dist)] = {'dct': query ^ flips, 'gs': query ^ flips ^ (1 << 63)}
+    return query, stored
+
+"""
+Bulk inserts image records and every hash of the given records.
+"""
+def insert_records(database, stored) -> None:
+    database.insert_images([(id, id + '.jpg', id, {'n': idx}) for idx, id in \
+        enumerate(stored)])
+    database.insert_hashes([(id, kind, hash) for id, hashes in stored.items() for \
+        kind, hash in hashes.items()])
+
+"""
+Checks database queries of both kinds against the linear scan.
+"""
+def assert_matches_scan(database, stored, query):
+    for kind in ['dct', 'gs']:
+        for radius in radii:
+            assert database.query_radius(kind, query, radius) == \
+                linear_scan(stored, kind, query, radius), (kind, radius)
+
+def test_query_radius_matches_scan(tmp_path):
+    query, stored = get_records(0)
+    with store.HashDatabase(str(tmp_path / 'hashes.db')) as database:
+        insert_records(database, stored)
+        assert_matches_scan(database, stored, query)
+
+        # packed hashes query the same rows as words
+        p_hash = packed.PackedHash(np.array([query], dtype = np.uint64), 64)
+        assert database.query_radius('dct', p_hash, 8) == database.query_radius('dct', query, 8)
+
+def test_remove_and_reopen(tmp_path):
+    path = str(tmp_path / 'hashes.db')
+    query, stored = get_records(1)
+    with store.HashDatabase(path) as database:
+        insert_records(database, stored)
+        for id in list(stored)[::4] + ['q4', 'q8']:
+            database.remove_image(id)
+            stored.pop(id, None)
+        assert database.get_image('q4') is None and database.get_hashes('q4') == {}
+        assert_matches_scan(database, stored, query)
+
+    # reopening keeps records and the stored band layout
+    with store.HashDatabase(path, bands = 8) as database:
+        assert (database.bands, database.band_bits) == (4, 16)
+        assert_matches_scan(database, stored, query)
+        record = database.get_image('q5')
+        assert (record['file_name'], record['title']) == ('q5.jpg', 'q5')
+        hashes = database.get_hashes('q5')
+        assert {kind: int(p_hash.words[0]) for kind, p_hash in hashes.items()} == stored['q5']
+
+        # hashes added after reopening are indexed too
+        database.insert_hashes([('q4', 'dct', query)])
+        assert database.query_radius('dct', query, 0) == [('q0', 0), ('q4', 0)]